@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 from pathlib import Path
+import json
 import os
 from dotenv import load_dotenv
 from datetime import timedelta
@@ -181,7 +182,26 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Rows per ProcessedDataChunk
+PROCESSED_DATA_CHUNK_ROWS = int(os.getenv('PROCESSED_DATA_CHUNK_ROWS', '500'))
+
 # Kafka settings
 KAFKA_ENABLED = os.getenv('KAFKA_ENABLED', 'False').lower() == 'true'
 KAFKA_BOOTSTRAP_SERVERS = os.getenv('KAFKA_BOOTSTRAP_SERVERS', 'localhost:9092')
 KAFKA_TOPIC = os.getenv('KAFKA_TOPIC', 'excel_data')
+KAFKA_LINGER_MS = int(os.getenv('KAFKA_LINGER_MS', '20'))
+KAFKA_BATCH_SIZE = int(os.getenv('KAFKA_BATCH_SIZE', str(64 * 1024)))
+KAFKA_COMPRESSION_TYPE = os.getenv('KAFKA_COMPRESSION_TYPE', 'gzip') or None
+# 'all' stays a string; 0 and 1 must reach KafkaProducer as ints
+KAFKA_ACKS = os.getenv('KAFKA_ACKS', 'all')
+KAFKA_ACKS = KAFKA_ACKS if KAFKA_ACKS == 'all' else int(KAFKA_ACKS)
+KAFKA_RETRIES = int(os.getenv('KAFKA_RETRIES', '3'))
+KAFKA_CLOSE_TIMEOUT = int(os.getenv('KAFKA_CLOSE_TIMEOUT', '10'))
+# Per-topic producer overrides, e.g. {"genetic_data": {"linger_ms": 200}}
+KAFKA_TOPIC_CONFIGS = json.loads(os.getenv('KAFKA_TOPIC_CONFIGS', '{}'))
+# Row-chunk events published for an uploaded file: at most this many rows
+# and bytes per event, serialized as json or msgpack (gzipped only when
+# KAFKA_COMPRESSION_TYPE is empty)
+KAFKA_EVENT_CHUNK_ROWS = int(os.getenv('KAFKA_EVENT_CHUNK_ROWS', '500'))
+KAFKA_EVENT_MAX_BYTES = int(os.getenv('KAFKA_EVENT_MAX_BYTES', str(900 * 1024)))
+KAFKA_EVENT_SERIALIZER = os.getenv('KAFKA_EVENT_SERIALIZER', 'json')
@@ -1,7 +1,7 @@
 import pandas as pd
 import logging
 import json
-from .models import ProcessedData
+from .row_store import store_rows
 
 logger = logging.getLogger(__name__)
 
@@ -25,16 +25,10 @@ def process_excel_file(excel_file_instance):
         # Convert DataFrame to JSON
         json_data = json.loads(df.to_json(orient='records'))
         
-        # Create ProcessedData instance
-        processed_data = ProcessedData.objects.create(
-            excel_file=excel_file_instance,
-            data_json=json_data
-        )
-        
-        # Mark the file as processed
-        excel_file_instance.processed = True
-        excel_file_instance.save()
+        # Store the rows in fixed-size chunks so reads can page through them
+        processed_data = store_rows(excel_file_instance, json_data, [str(column) for column in df.columns])
         
+        # The caller marks the file as processed once its events are delivered
         logger.info(f"Successfully processed Excel file: {file_path}")
         return [processed_data]  # Return as a list for compatibility with existing code
     
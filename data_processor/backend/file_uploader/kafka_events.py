@@ -0,0 +1,136 @@
+import logging
+from functools import partial
+from django.conf import settings
+from kafka_producer.events import ENCODING_HEADER, encode_event, get_event_encoding
+from .row_store import iter_rows
+
+logger = logging.getLogger(__name__)
+
+EVENT_SCHEMA_VERSION = 1
+
+CHUNK_EVENT = 'processed_data.chunk'
+
+COMPLETE_EVENT = 'processed_data.complete'
+
+DEFAULT_EVENT_CHUNK_ROWS = 500
+
+# Below the broker's default max.request.size of 1 MiB, leaving room for the key and headers
+DEFAULT_EVENT_MAX_BYTES = 900 * 1024
+
+
+class PublishFailed(Exception):
+    pass
+
+
+def _chunks(processed_data, chunk_rows):
+    chunk = []
+    for row in iter_rows(processed_data):
+        chunk.append(row)
+        if len(chunk) == chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _fit(rows, row_start, encode_chunk, max_bytes):
+    """Yield (rows, value) pieces of a chunk, halving it until each encodes within max_bytes."""
+    value = encode_chunk(rows, row_start)
+    if len(value) <= max_bytes or len(rows) == 1:
+        if len(value) > max_bytes:
+            logger.warning(f"Row {row_start} alone encodes to {len(value)} bytes, over the {max_bytes} byte limit")
+        yield rows, value
+        return
+    half = len(rows) // 2
+    # Lazily, so the right half is encoded after the left half's pieces were numbered.
+    yield from _fit(rows[:half], row_start, encode_chunk, max_bytes)
+    yield from _fit(rows[half:], row_start + half, encode_chunk, max_bytes)
+
+
+def publish_file_rows(client, excel_file, documents, chunk_rows=None, max_bytes=None, on_error=None):
+    """
+    Queue a file's processed rows as chunk events followed by a completion marker.
+
+    Every message is keyed by the file id, so all of a file's events land on
+    one partition in order. ``seq`` numbers the file's messages from 0;
+    chunk events carry the document id, their [row_start, row_end) range and
+    the rows, and the final ``processed_data.complete`` event carries the
+    number of chunks and rows sent, so a consumer knows when it has them all.
+    A chunk holds at most ``KAFKA_EVENT_CHUNK_ROWS`` rows and is split
+    further until it encodes to at most ``KAFKA_EVENT_MAX_BYTES``. The caller
+    flushes the client; ``deliver_file_rows`` does both.
+
+    Args:
+        client: KafkaProducerClient to publish with
+        excel_file: ExcelFile model instance
+        documents (list): ProcessedData instances for the file
+        chunk_rows (int, optional): Rows per chunk event
+        max_bytes (int, optional): Largest encoded chunk event
+        on_error (callable, optional): Called with the exception of each failed delivery
+
+    Returns:
+        bool: True if every event was queued, False otherwise
+    """
+    chunk_rows = chunk_rows or getattr(settings, 'KAFKA_EVENT_CHUNK_ROWS', DEFAULT_EVENT_CHUNK_ROWS)
+    max_bytes = max_bytes or getattr(settings, 'KAFKA_EVENT_MAX_BYTES', DEFAULT_EVENT_MAX_BYTES)
+    encoding = get_event_encoding(client.producer_config()['compression_type'])
+    headers = [(ENCODING_HEADER, encoding.encode('utf-8'))]
+    key = str(excel_file.id)
+    seq = 0
+
+    def encode(event):
+        return encode_event({'schema': EVENT_SCHEMA_VERSION, 'file_id': excel_file.id, 'seq': seq, **event}, encoding)
+
+    def encode_chunk(processed_data, rows, row_start):
+        return encode({
+            'type': CHUNK_EVENT,
+            'processed_data_id': processed_data.id,
+            'columns': processed_data.columns,
+            'row_start': row_start,
+            'row_end': row_start + len(rows),
+            'rows': rows,
+        })
+
+    row_count = 0
+    queued = True
+    for processed_data in documents:
+        row_start = 0
+        for rows in _chunks(processed_data, chunk_rows):
+            for piece, value in _fit(rows, row_start, partial(encode_chunk, processed_data), max_bytes):
+                queued = client.publish_data(value, key=key, headers=headers, on_error=on_error) and queued
+                seq += 1
+                row_start += len(piece)
+        row_count += row_start
+
+    queued = client.publish_data(encode({
+        'type': COMPLETE_EVENT,
+        'processed_data_ids': [processed_data.id for processed_data in documents],
+        'chunk_count': seq,
+        'row_count': row_count,
+    }), key=key, headers=headers, on_error=on_error) and queued
+    logger.info(f"Queued {seq} chunk event(s) with {row_count} rows for file {excel_file.id} ({encoding})")
+    return queued
+
+
+def deliver_file_rows(client, excel_file, documents, timeout=None):
+    """
+    Publish a file's row events and wait once for the broker to acknowledge them.
+
+    Args:
+        client: KafkaProducerClient to publish with
+        excel_file: ExcelFile model instance
+        documents (list): ProcessedData instances for the file
+        timeout (float, optional): Seconds to wait for delivery
+
+    Raises:
+        PublishFailed: If an event could not be queued, was rejected, or was
+            not acknowledged within ``timeout``; the file should then stay
+            unprocessed so that processing it again resends every event
+    """
+    failures = []
+    queued = publish_file_rows(client, excel_file, documents, on_error=failures.append)
+    drained = client.flush(timeout=timeout)
+    if failures:
+        raise PublishFailed(f"Kafka rejected rows of file {excel_file.id}: {str(failures[0])}")
+    if not queued or not drained:
+        raise PublishFailed(f"Kafka did not accept and acknowledge the rows of file {excel_file.id} within {timeout}s")
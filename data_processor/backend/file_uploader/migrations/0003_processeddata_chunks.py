@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_uploader', '0002_excelfile_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processeddata',
+            name='columns',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='processeddata',
+            name='row_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='processeddata',
+            name='data_json',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ProcessedDataChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_offset', models.PositiveIntegerField()),
+                ('row_count', models.PositiveIntegerField()),
+                ('rows', models.JSONField()),
+                ('processed_data', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='file_uploader.processeddata')),
+            ],
+            options={
+                'ordering': ['row_offset'],
+                'constraints': [models.UniqueConstraint(fields=('processed_data', 'row_offset'), name='processed_chunk_offset_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+from django.db import migrations
+
+# Frozen copy of row_store.DEFAULT_CHUNK_ROWS at the time of this migration.
+CHUNK_ROWS = 500
+
+BATCH_SIZE = 100
+
+
+def _columns(rows):
+    columns = []
+    seen = set()
+    for row in rows:
+        if isinstance(row, dict):
+            for column in row:
+                if column not in seen:
+                    seen.add(column)
+                    columns.append(column)
+    return columns
+
+
+def split_blobs(apps, schema_editor):
+    """Move every ProcessedData.data_json blob into ProcessedDataChunk rows."""
+    ProcessedData = apps.get_model('file_uploader', 'ProcessedData')
+    ProcessedDataChunk = apps.get_model('file_uploader', 'ProcessedDataChunk')
+
+    for processed_data in ProcessedData.objects.filter(data_json__isnull=False).iterator():
+        rows = processed_data.data_json
+        if not isinstance(rows, list):
+            rows = [rows]
+        ProcessedDataChunk.objects.bulk_create([
+            ProcessedDataChunk(
+                processed_data=processed_data,
+                row_offset=offset,
+                row_count=len(rows[offset:offset + CHUNK_ROWS]),
+                rows=rows[offset:offset + CHUNK_ROWS],
+            )
+            for offset in range(0, len(rows), CHUNK_ROWS)
+        ], batch_size=BATCH_SIZE)
+        processed_data.row_count = len(rows)
+        processed_data.columns = _columns(rows)
+        processed_data.data_json = None
+        processed_data.save(update_fields=['row_count', 'columns', 'data_json'])
+
+
+def join_chunks(apps, schema_editor):
+    """Rebuild the single blob from the chunks."""
+    ProcessedData = apps.get_model('file_uploader', 'ProcessedData')
+    ProcessedDataChunk = apps.get_model('file_uploader', 'ProcessedDataChunk')
+
+    for processed_data in ProcessedData.objects.filter(data_json__isnull=True).iterator():
+        rows = []
+        for chunk in ProcessedDataChunk.objects.filter(processed_data=processed_data).order_by('row_offset'):
+            rows.extend(chunk.rows)
+        processed_data.data_json = rows
+        processed_data.save(update_fields=['data_json'])
+    ProcessedDataChunk.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_uploader', '0003_processeddata_chunks'),
+    ]
+
+    operations = [
+        migrations.RunPython(split_blobs, join_chunks),
+    ]
@@ -23,8 +23,26 @@ class ExcelFile(models.Model):
 class ProcessedData(models.Model):
     """Model to store data extracted from Excel files."""
     excel_file = models.ForeignKey(ExcelFile, on_delete=models.CASCADE, related_name='processed_data')
-    data_json = models.JSONField()  # Store the processed data as JSON
+    data_json = models.JSONField(null=True, blank=True)  # Legacy single blob; rows now live in chunks
+    row_count = models.PositiveIntegerField(default=0)
+    columns = models.JSONField(default=list, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return f"Data from {self.excel_file.title}"
+
+class ProcessedDataChunk(models.Model):
+    """A block of consecutive rows of a ProcessedData document."""
+    processed_data = models.ForeignKey(ProcessedData, on_delete=models.CASCADE, related_name='chunks')
+    row_offset = models.PositiveIntegerField()  # Index of the first row in the document
+    row_count = models.PositiveIntegerField()
+    rows = models.JSONField()
+    
+    class Meta:
+        ordering = ['row_offset']
+        constraints = [
+            models.UniqueConstraint(fields=['processed_data', 'row_offset'], name='processed_chunk_offset_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"Rows {self.row_offset}-{self.row_offset + self.row_count - 1} of {self.processed_data}"
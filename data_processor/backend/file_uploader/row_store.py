@@ -0,0 +1,122 @@
+import logging
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from .models import ProcessedData, ProcessedDataChunk
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_ROWS = 500
+
+# How many chunks a filtered scan pulls from the database per round trip.
+SCAN_BATCH_SIZE = 20
+
+
+def get_chunk_rows():
+    """Number of rows stored in each ProcessedDataChunk."""
+    return getattr(settings, 'PROCESSED_DATA_CHUNK_ROWS', DEFAULT_CHUNK_ROWS)
+
+
+def store_rows(excel_file, rows, columns):
+    """
+    Store processed rows as a ProcessedData document split into chunks.
+
+    Args:
+        excel_file: ExcelFile model instance
+        rows (list): Row dicts, in sheet order
+        columns (list): Column names, in sheet order
+
+    Returns:
+        ProcessedData: The created ProcessedData instance
+    """
+    chunk_rows = get_chunk_rows()
+    with transaction.atomic():
+        processed_data = ProcessedData.objects.create(
+            excel_file=excel_file,
+            row_count=len(rows),
+            columns=list(columns)
+        )
+        ProcessedDataChunk.objects.bulk_create([
+            ProcessedDataChunk(
+                processed_data=processed_data,
+                row_offset=offset,
+                row_count=len(rows[offset:offset + chunk_rows]),
+                rows=rows[offset:offset + chunk_rows]
+            )
+            for offset in range(0, len(rows), chunk_rows)
+        ])
+    logger.info(f"Stored {len(rows)} rows for file {excel_file.id} in chunks of {chunk_rows}")
+    return processed_data
+
+
+def iter_rows(processed_data):
+    """Yield every row of a document, loading one chunk at a time."""
+    chunks = ProcessedDataChunk.objects.filter(processed_data=processed_data).order_by('row_offset')
+    for rows in chunks.values_list('rows', flat=True).iterator(chunk_size=SCAN_BATCH_SIZE):
+        yield from rows
+
+
+def cell_text(value):
+    """Render a cell the way it would appear in a query string."""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return str(value).lower()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _project(row, columns):
+    if columns is None:
+        return row
+    return {column: row.get(column) for column in columns}
+
+
+def read_rows(processed_data, offset=0, limit=None, filters=None, columns=None):
+    """
+    Read a page of rows without loading the whole document.
+
+    Without filters only the chunks overlapping ``offset``/``limit`` are
+    fetched, using the (processed_data, row_offset) index. With filters the
+    chunks are scanned in order and the scan stops as soon as the page is
+    full, so ``offset`` counts matching rows.
+
+    Args:
+        processed_data: ProcessedData model instance
+        offset (int): Number of (matching) rows to skip
+        limit (int, optional): Maximum number of rows to return
+        filters (dict, optional): Column name to text value; all must match
+        columns (list, optional): Only return these columns
+
+    Returns:
+        tuple: (rows, next_offset) where next_offset is None on the last page
+    """
+    chunks = ProcessedDataChunk.objects.filter(processed_data=processed_data).order_by('row_offset')
+
+    if not filters:
+        stop = processed_data.row_count if limit is None else min(offset + limit, processed_data.row_count)
+        chunks = chunks.annotate(row_end=F('row_offset') + F('row_count')).filter(
+            row_offset__lt=stop, row_end__gt=offset
+        )
+        rows = []
+        for chunk_offset, chunk in chunks.values_list('row_offset', 'rows'):
+            start = max(offset - chunk_offset, 0)
+            rows.extend(chunk[start:stop - chunk_offset])
+        next_offset = stop if stop < processed_data.row_count else None
+        return [_project(row, columns) for row in rows], next_offset
+
+    rows = []
+    skipped = 0
+    for chunk in chunks.values_list('rows', flat=True).iterator(chunk_size=SCAN_BATCH_SIZE):
+        for row in chunk:
+            if any(cell_text(row.get(column)) != value for column, value in filters.items()):
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            if limit is not None and len(rows) == limit:
+                # One match past the page proves there is another page.
+                return rows, offset + limit
+            rows.append(_project(row, columns))
+    return rows, None
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import ExcelFile, ProcessedData
+from .row_store import iter_rows
 from django.contrib.auth.models import User
 
 class UserSerializer(serializers.ModelSerializer):
@@ -20,9 +21,22 @@ class ExcelFileSerializer(serializers.ModelSerializer):
         read_only_fields = ['uploaded_at', 'processed', 'user']
 
 class ProcessedDataSerializer(serializers.ModelSerializer):
-    """Serializer for the ProcessedData model."""
+    """Serializer for the ProcessedData model.
+    
+    ``data_json`` is assembled from the document's chunks. Views that read a
+    single page pass it in the ``rows`` context, keyed by ProcessedData id.
+    """
+    data_json = serializers.SerializerMethodField()
     
     class Meta:
         model = ProcessedData
-        fields = ['id', 'excel_file', 'data_json', 'created_at']
-        read_only_fields = ['created_at']
+        fields = ['id', 'excel_file', 'data_json', 'row_count', 'columns', 'created_at']
+        read_only_fields = ['created_at', 'row_count', 'columns']
+    
+    def get_data_json(self, obj):
+        pages = self.context.get('rows', {})
+        if obj.id in pages:
+            return pages[obj.id]
+        if obj.data_json is not None:
+            return obj.data_json
+        return list(iter_rows(obj))
@@ -1,18 +1,34 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APIClient
 from rest_framework import status
+from importlib import import_module
 import os
+import tempfile
 import pandas as pd
 from io import BytesIO
-from .models import ExcelFile, ProcessedData
+from .models import ExcelFile, ProcessedData, ProcessedDataChunk
+from .row_store import read_rows, store_rows
+from django.core.exceptions import ImproperlyConfigured
+from .kafka_events import COMPLETE_EVENT, publish_file_rows
+from kafka_producer.events import ENCODING_HEADER, decode_event
+from kafka_producer.kafka_utils import KafkaProducerClient
+from kafka_producer.testing import FakeKafkaProducer
+from kafka.errors import KafkaError
+from unittest import mock
 
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class FileUploadTest(TestCase):
     """Test case for file upload functionality."""
     
     def setUp(self):
         """Set up test environment."""
         self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
         
         # Create a test Excel file
         self.excel_data = {
@@ -53,4 +69,204 @@ class FileUploadTest(TestCase):
         
         # Check processed data content
         processed_data = ProcessedData.objects.first()
-        self.assertEqual(len(processed_data.data_json), 3)  # 3 rows in our test data
+        self.assertEqual(processed_data.row_count, 3)  # 3 rows in our test data
+        self.assertEqual(processed_data.columns, ['Name', 'Age', 'Salary'])
+        self.assertEqual(sum(len(chunk.rows) for chunk in processed_data.chunks.all()), 3)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), PROCESSED_DATA_CHUNK_ROWS=10)
+class ProcessedDataChunkTest(TestCase):
+    """Test case for chunked processed data storage."""
+    
+    def setUp(self):
+        """Set up test environment."""
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        
+        self.excel_file = ExcelFile.objects.create(
+            title='Trial',
+            file=SimpleUploadedFile('trial.xlsx', b'unused'),
+            user=self.user,
+            processed=True
+        )
+        self.rows = [
+            {'Plot': i, 'Variety': 'IR64' if i % 3 else 'Jasmine', 'Yield': i * 0.5}
+            for i in range(45)
+        ]
+        self.processed_data = store_rows(self.excel_file, self.rows, ['Plot', 'Variety', 'Yield'])
+    
+    def test_rows_are_split_into_chunks(self):
+        """Test rows are stored in fixed-size chunks with their offsets."""
+        chunks = list(self.processed_data.chunks.all())
+        self.assertEqual([chunk.row_offset for chunk in chunks], [0, 10, 20, 30, 40])
+        self.assertEqual([chunk.row_count for chunk in chunks], [10, 10, 10, 10, 5])
+        self.assertEqual(self.processed_data.row_count, 45)
+    
+    def test_page_reads_only_overlapping_chunks(self):
+        """Test a page spanning two chunks fetches just those chunks."""
+        with self.assertNumQueries(1):
+            rows, next_offset = read_rows(self.processed_data, offset=18, limit=5, columns=['Plot'])
+        self.assertEqual(rows, [{'Plot': i} for i in range(18, 23)])
+        self.assertEqual(next_offset, 23)
+        
+        rows, next_offset = read_rows(self.processed_data, offset=40, limit=10)
+        self.assertEqual(rows, self.rows[40:])
+        self.assertIsNone(next_offset)
+    
+    def test_by_file_pages_and_filters(self):
+        """Test by_file returns one page of matching rows per document."""
+        url = reverse('processeddata-by-file')
+        response = self.client.get(url, {'file_id': self.excel_file.id, 'offset': 40, 'limit': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        document = response.data['data'][0]
+        self.assertEqual(document['data_json'], self.rows[40:43])
+        self.assertEqual(document['row_count'], 45)
+        self.assertEqual(document['next_offset'], 43)
+        
+        response = self.client.get(url, {
+            'file_id': self.excel_file.id, 'filter_column': 'Variety', 'filter_value': 'Jasmine',
+            'offset': 2, 'limit': 4, 'columns': 'Plot'
+        })
+        document = response.data['data'][0]
+        self.assertEqual(document['data_json'], [{'Plot': 6}, {'Plot': 9}, {'Plot': 12}, {'Plot': 15}])
+        self.assertEqual(document['next_offset'], 6)
+        
+        response = self.client.get(url, {'file_id': self.excel_file.id, 'filter_column': 'Plot', 'filter_value': '44'})
+        self.assertEqual(response.data['data'][0]['data_json'], [self.rows[44]])
+        self.assertIsNone(response.data['data'][0]['next_offset'])
+        
+        response = self.client.get(url, {'file_id': self.excel_file.id, 'limit': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_migration_splits_legacy_blobs(self):
+        """Test existing data_json blobs are moved into chunks and back."""
+        migration = import_module('file_uploader.migrations.0004_split_processed_data_blobs')
+        legacy = ProcessedData.objects.create(excel_file=self.excel_file, data_json=self.rows[:12])
+        
+        migration.split_blobs(apps, None)
+        legacy.refresh_from_db()
+        self.assertIsNone(legacy.data_json)
+        self.assertEqual(legacy.row_count, 12)
+        self.assertEqual(legacy.columns, ['Plot', 'Variety', 'Yield'])
+        self.assertEqual(read_rows(legacy)[0], self.rows[:12])
+        
+        migration.join_chunks(apps, None)
+        legacy.refresh_from_db()
+        self.assertEqual(legacy.data_json, self.rows[:12])
+        self.assertFalse(ProcessedDataChunk.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), KAFKA_ENABLED=True)
+class KafkaPublishTest(TestCase):
+    """Test case for publishing processed data without a broker."""
+    
+    def setUp(self):
+        """Set up test environment."""
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.kafka = KafkaProducerClient(producer_factory=FakeKafkaProducer)
+    
+    def test_upload_flushes_once_per_request(self):
+        """Test an upload queues its messages and flushes them once."""
+        excel_file = BytesIO()
+        pd.DataFrame({'Name': ['John', 'Jane'], 'Age': [30, 25]}).to_excel(excel_file, index=False)
+        excel_file.seek(0)
+        
+        with mock.patch('file_uploader.views.kafka_producer', self.kafka):
+            response = self.client.post(reverse('excelfile-list'), {
+                'title': 'Test Excel File',
+                'file': excel_file
+            }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        
+        producer = self.kafka.producer
+        self.assertEqual(producer.flush_count, 1)
+        self.assertEqual(producer.pending, 0)
+        # One chunk event and the completion marker
+        self.assertEqual(len(producer.delivered), 2)
+        self.assertEqual(self.kafka.metrics, {'sent': 2, 'delivered': 2, 'failed': 0})
+    
+    def test_undelivered_rows_leave_the_file_unprocessed(self):
+        """Test a failed or timed out delivery fails the request instead of marking the file processed."""
+        failing = KafkaProducerClient(producer_factory=lambda **config: FakeKafkaProducer(
+            fail_with=KafkaError('broker unavailable'), **config
+        ))
+        for client, patch in ((failing, {}), (self.kafka, {'return_value': False})):
+            excel_file = BytesIO()
+            pd.DataFrame({'Name': ['John', 'Jane'], 'Age': [30, 25]}).to_excel(excel_file, index=False)
+            excel_file.seek(0)
+            with mock.patch('file_uploader.views.kafka_producer', client), \
+                    mock.patch.object(client, 'flush', wraps=client.flush, **patch):
+                response = self.client.post(reverse('excelfile-list'), {
+                    'title': 'Test Excel File',
+                    'file': excel_file
+                }, format='multipart')
+            self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+            self.assertIn('Kafka', response.data['error'])
+        self.assertFalse(ExcelFile.objects.filter(processed=True).exists())
+        self.assertFalse(ProcessedData.objects.exists())
+    
+    def _publish(self, rows, **kwargs):
+        excel_file = ExcelFile.objects.create(
+            user=self.user,
+            title='Test',
+            file=SimpleUploadedFile('test.xlsx', b'')
+        )
+        processed_data = store_rows(excel_file, rows, ['Name', 'Age'])
+        
+        self.assertTrue(publish_file_rows(self.kafka, excel_file, [processed_data], **kwargs))
+        self.kafka.flush()
+        
+        producer = self.kafka.producer
+        self.assertEqual({key for _, key, _ in producer.delivered}, {str(excel_file.id).encode()})
+        encodings = {dict(headers)[ENCODING_HEADER].decode() for headers in producer.delivered_headers}
+        self.assertEqual(len(encodings), 1)
+        encoding = encodings.pop()
+        events = [decode_event(payload, encoding) for _, _, payload in producer.delivered]
+        return processed_data, events, encoding
+    
+    @override_settings(KAFKA_EVENT_CHUNK_ROWS=2)
+    def test_rows_are_published_as_chunk_events(self):
+        """Test a file's rows go out in ordered, keyed chunks ending with a marker."""
+        rows = [{'Name': f'Row {i}', 'Age': i} for i in range(5)]
+        processed_data, events, encoding = self._publish(rows)
+        
+        # The producer already gzips batches, so the events are plain JSON.
+        self.assertEqual(encoding, 'json')
+        self.assertEqual([event['seq'] for event in events], [0, 1, 2, 3])
+        self.assertEqual([(event['row_start'], event['row_end']) for event in events[:3]], [(0, 2), (2, 4), (4, 5)])
+        self.assertEqual([row for event in events[:3] for row in event['rows']], rows)
+        self.assertEqual(events[0]['columns'], ['Name', 'Age'])
+        self.assertEqual(events[-1]['type'], COMPLETE_EVENT)
+        self.assertEqual(events[-1]['chunk_count'], 3)
+        self.assertEqual(events[-1]['row_count'], 5)
+        self.assertEqual(events[-1]['processed_data_ids'], [processed_data.id])
+    
+    @override_settings(KAFKA_EVENT_SERIALIZER='msgpack', KAFKA_COMPRESSION_TYPE=None)
+    def test_msgpack_events_are_gzipped_without_producer_compression(self):
+        """Test the configured serializer is used and named in the header."""
+        rows = [{'Name': 'John', 'Age': 30}]
+        _, events, encoding = self._publish(rows)
+        
+        self.assertEqual(encoding, 'msgpack+gzip')
+        self.assertEqual(events[0]['rows'], rows)
+        self.assertEqual(events[1]['type'], COMPLETE_EVENT)
+        
+        with override_settings(KAFKA_EVENT_SERIALIZER='pickle'):
+            with self.assertRaises(ImproperlyConfigured):
+                self._publish(rows)
+    
+    def test_chunks_are_split_to_fit_max_bytes(self):
+        """Test wide rows are split into smaller events with contiguous ranges."""
+        rows = [{'Name': 'x' * 1000, 'Age': i} for i in range(8)]
+        _, events, _ = self._publish(rows, max_bytes=2500)
+        
+        chunks = events[:-1]
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual([event['seq'] for event in events], list(range(5)))
+        self.assertEqual([(event['row_start'], event['row_end']) for event in chunks], [(0, 2), (2, 4), (4, 6), (6, 8)])
+        self.assertEqual([row for event in chunks for row in event['rows']], rows)
+        self.assertTrue(all(len(payload) <= 2500 for _, _, payload in self.kafka.producer.delivered))
+        self.assertEqual(events[-1]['chunk_count'], 4)
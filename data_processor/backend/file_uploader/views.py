@@ -1,3 +1,4 @@
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
@@ -6,11 +7,19 @@ from rest_framework.permissions import IsAuthenticated
 from .models import ExcelFile, ProcessedData
 from .serializers import ExcelFileSerializer, ProcessedDataSerializer
 from .excel_utils import process_excel_file
-from .kafka_utils import kafka_producer
+from .row_store import read_rows
+from .kafka_events import deliver_file_rows
+from kafka_producer.kafka_utils import kafka_producer
 import logging
 
 logger = logging.getLogger(__name__)
 
+BY_FILE_DEFAULT_LIMIT = 1000
+
+BY_FILE_MAX_LIMIT = 10000
+
+KAFKA_FLUSH_TIMEOUT = 10
+
 class ExcelFileViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing Excel files
@@ -55,17 +64,16 @@ class ExcelFileViewSet(viewsets.ModelViewSet):
             
             # Process the Excel file
             try:
-                # Process the file and get the processed data
-                processed_data = process_excel_file(excel_file)
-                logger.info(f"File processed: {excel_file.title}, extracted {len(processed_data)} data points")
-                
-                # Publish data to Kafka
-                for data in processed_data:
-                    kafka_producer.publish_data(data.data_json)
-                
-                # Mark the file as processed
-                excel_file.processed = True
-                excel_file.save()
+                # The rows are only kept, and the file marked processed, once
+                # the broker has acknowledged every row-chunk event.
+                with transaction.atomic():
+                    processed_data = process_excel_file(excel_file)
+                    logger.info(f"File processed: {excel_file.title}, extracted {len(processed_data)} data points")
+                    
+                    deliver_file_rows(kafka_producer, excel_file, processed_data, timeout=KAFKA_FLUSH_TIMEOUT)
+                    
+                    excel_file.processed = True
+                    excel_file.save()
                 
                 # Re-serialize to include the user field
                 updated_serializer = self.get_serializer(excel_file)
@@ -103,16 +111,13 @@ class ExcelFileViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            # Process the file and get the processed data
-            processed_data = process_excel_file(excel_file)
-            
-            # Publish data to Kafka
-            for data in processed_data:
-                kafka_producer.publish_data(data.data_json)
-            
-            # Mark the file as processed
-            excel_file.processed = True
-            excel_file.save()
+            # The rows are only kept, and the file marked processed, once
+            # the broker has acknowledged every row-chunk event.
+            with transaction.atomic():
+                processed_data = process_excel_file(excel_file)
+                deliver_file_rows(kafka_producer, excel_file, processed_data, timeout=KAFKA_FLUSH_TIMEOUT)
+                excel_file.processed = True
+                excel_file.save()
             
             return Response(
                 {"message": "File processed successfully."},
@@ -156,13 +161,46 @@ class ProcessedDataViewSet(viewsets.ReadOnlyModelViewSet):
             # Get the file and verify it belongs to the user
             excel_file = get_object_or_404(ExcelFile, id=file_id, user=request.user)
             
-            # Get processed data for the file
+            try:
+                offset = int(request.query_params.get('offset', 0))
+                limit = int(request.query_params.get('limit', BY_FILE_DEFAULT_LIMIT))
+            except ValueError:
+                return Response(
+                    {"success": False, "error": "offset and limit must be integers"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if offset < 0 or not 1 <= limit <= BY_FILE_MAX_LIMIT:
+                return Response(
+                    {"success": False, "error": f"offset must be >= 0 and limit between 1 and {BY_FILE_MAX_LIMIT}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            columns = request.query_params.get('columns')
+            columns = [column for column in columns.split(',') if column] if columns else None
+            filters = {}
+            filter_column = request.query_params.get('filter_column')
+            if filter_column:
+                filters[filter_column] = request.query_params.get('filter_value', '')
+            
+            # Get processed data for the file, one page of rows per document
             data = ProcessedData.objects.filter(excel_file=excel_file)
-            serializer = self.get_serializer(data, many=True)
+            pages = {}
+            next_offsets = {}
+            for processed_data in data:
+                pages[processed_data.id], next_offsets[processed_data.id] = read_rows(
+                    processed_data, offset=offset, limit=limit, filters=filters, columns=columns
+                )
+            serializer = self.get_serializer(data, many=True, context={**self.get_serializer_context(), 'rows': pages})
+            
+            results = serializer.data
+            for item in results:
+                item['next_offset'] = next_offsets[item['id']]
             
             return Response({
                 "success": True,
-                "data": serializer.data
+                "offset": offset,
+                "limit": limit,
+                "data": results
             })
         except Exception as e:
             logger.error(f"Error retrieving processed data: {str(e)}")
@@ -3,6 +3,7 @@ Django settings for data_processor project - Docker configuration.
 """
 
 from pathlib import Path
+import json
 import os
 from dotenv import load_dotenv
 from datetime import timedelta
@@ -144,7 +145,77 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Optional pre-derived Fernet key; see `manage.py export_encryption_key`
+ENCRYPTION_KEY = os.getenv('ENCRYPTION_KEY')
+ENCRYPTION_KEY_FILE = os.getenv('ENCRYPTION_KEY_FILE')
+
+# Genetic data ingest
+GENETIC_INGEST_BATCH_SIZE = int(os.getenv('GENETIC_INGEST_BATCH_SIZE', '500'))
+GENETIC_INGEST_ENCRYPTION_WORKERS = int(os.getenv('GENETIC_INGEST_ENCRYPTION_WORKERS', '0'))
+# Seconds without a heartbeat before a running job is handed to another worker
+GENETIC_INGEST_LEASE_SECONDS = int(os.getenv('GENETIC_INGEST_LEASE_SECONDS', '300'))
+
+# Parsed CSV table cache
+TABLE_CACHE_DIR = os.getenv('TABLE_CACHE_DIR', os.path.join(BASE_DIR, 'table_cache'))
+TABLE_CACHE_MAX_BYTES = int(os.getenv('TABLE_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+
+# Shared cache for processed file data
+PROCESSED_DATA_CACHE_ALIAS = 'processed_data'
+PROCESSED_DATA_CACHE_TIMEOUT = int(os.getenv('PROCESSED_DATA_CACHE_TIMEOUT', str(60 * 60)))
+PROCESSED_DATA_CACHE_MAX_BYTES = int(os.getenv('PROCESSED_DATA_CACHE_MAX_BYTES', str(5 * 1024 * 1024)))
+
+# Any Redis-compatible server can back the shared caches; without one they
+# fall back to a file-based cache visible to every worker on the host.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    _processed_data_cache = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'processed_data',
+    }
+else:
+    _processed_data_cache = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('PROCESSED_DATA_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'processed_data')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('PROCESSED_DATA_CACHE_MAX_ENTRIES', '200')),
+        },
+    }
+_processed_data_cache['TIMEOUT'] = PROCESSED_DATA_CACHE_TIMEOUT
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    PROCESSED_DATA_CACHE_ALIAS: _processed_data_cache,
+}
+
 # Kafka settings
 KAFKA_ENABLED = os.getenv('KAFKA_ENABLED', 'False').lower() == 'true'
 KAFKA_BOOTSTRAP_SERVERS = os.getenv('KAFKA_BOOTSTRAP_SERVERS', 'kafka:9092')
 KAFKA_TOPIC = os.getenv('KAFKA_TOPIC', 'excel_data')
+KAFKA_LINGER_MS = int(os.getenv('KAFKA_LINGER_MS', '20'))
+KAFKA_BATCH_SIZE = int(os.getenv('KAFKA_BATCH_SIZE', str(64 * 1024)))
+KAFKA_COMPRESSION_TYPE = os.getenv('KAFKA_COMPRESSION_TYPE', 'gzip') or None
+# 'all' stays a string; 0 and 1 must reach KafkaProducer as ints
+KAFKA_ACKS = os.getenv('KAFKA_ACKS', 'all')
+KAFKA_ACKS = KAFKA_ACKS if KAFKA_ACKS == 'all' else int(KAFKA_ACKS)
+KAFKA_RETRIES = int(os.getenv('KAFKA_RETRIES', '3'))
+KAFKA_CLOSE_TIMEOUT = int(os.getenv('KAFKA_CLOSE_TIMEOUT', '10'))
+# Per-topic producer overrides, e.g. {"genetic_data": {"linger_ms": 200}}
+KAFKA_TOPIC_CONFIGS = json.loads(os.getenv('KAFKA_TOPIC_CONFIGS', '{}'))
+
+# Transactional outbox relay (python manage.py relay_outbox)
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '100'))
+OUTBOX_RETRY_BASE_SECONDS = int(os.getenv('OUTBOX_RETRY_BASE_SECONDS', '1'))
+OUTBOX_RETRY_MAX_SECONDS = int(os.getenv('OUTBOX_RETRY_MAX_SECONDS', '300'))
+OUTBOX_CLAIM_SECONDS = int(os.getenv('OUTBOX_CLAIM_SECONDS', '60'))
+# Published events are deleted by relay_outbox after this many hours
+OUTBOX_RETENTION_HOURS = float(os.getenv('OUTBOX_RETENTION_HOURS', '168'))
+
+# Batch consumer (python manage.py run_kafka_consumer)
+KAFKA_CONSUMER_GROUP = os.getenv('KAFKA_CONSUMER_GROUP', 'aquagreen-consumer')
+KAFKA_CONSUMER_HANDLER = os.getenv('KAFKA_CONSUMER_HANDLER', '')
+KAFKA_CONSUMER_MAX_RECORDS = int(os.getenv('KAFKA_CONSUMER_MAX_RECORDS', '500'))
+KAFKA_CONSUMER_WORKERS = int(os.getenv('KAFKA_CONSUMER_WORKERS', '4'))
+KAFKA_CONSUMER_MAX_IN_FLIGHT = int(os.getenv('KAFKA_CONSUMER_MAX_IN_FLIGHT', '8'))
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class FileUploaderConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'file_uploader'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,80 @@
+import logging
+import os
+import shutil
+import uuid
+
+import pandas as pd
+
+from .excel_utils import iter_file_chunks, read_file_head
+from .file_formats import get_file_format
+from .table_cache import read_schema, read_table, source_signature, write_table
+
+logger = logging.getLogger(__name__)
+
+STORE_SUFFIX = '.columns'
+
+
+def store_dir(excel_file):
+    """The columnar copy of an upload lives in a directory beside it."""
+    return excel_file.file.path + STORE_SUFFIX
+
+
+def get_store_schema(excel_file):
+    """Return the schema of the upload's columnar copy, or None if it is
+    missing or was written for a different version of the file."""
+    schema = read_schema(store_dir(excel_file))
+    if schema is None:
+        return None
+    try:
+        if schema['source'] != source_signature(excel_file.file.path):
+            return None
+    except OSError:
+        return None
+    return schema
+
+
+def build_store(excel_file):
+    """Parse the upload once and write it as per-column NumPy/JSON files."""
+    file_path = excel_file.file.path
+    chunks = list(iter_file_chunks(file_path, file_format=get_file_format(excel_file)))
+    df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+    directory = store_dir(excel_file)
+    staging = f'{directory}.{uuid.uuid4().hex}'
+    try:
+        schema = write_table(staging, df, source=source_signature(file_path))
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(staging, directory)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    logger.info(f"Wrote columnar store for Excel file {excel_file.pk}: {len(df)} rows")
+    return schema
+
+
+def read_store(excel_file, columns=None, nrows=None, offset=0):
+    """Read rows of an upload from its columnar copy, building it on a miss.
+
+    Numeric and date columns are memory-mapped, so reading a page touches
+    only that page instead of parsing the workbook again.
+    """
+    schema = get_store_schema(excel_file)
+    if schema is None:
+        schema = build_store(excel_file)
+    return read_table(store_dir(excel_file), columns=columns, nrows=nrows, schema=schema, offset=offset)
+
+
+def discard_store(file_path):
+    shutil.rmtree(file_path + STORE_SUFFIX, ignore_errors=True)
+
+
+def read_head(excel_file, nrows):
+    """First ``nrows`` rows, from the columnar copy if there is one.
+
+    Without a copy only those rows are streamed from the upload; a preview
+    is not worth parsing the whole file for.
+    """
+    schema = get_store_schema(excel_file)
+    if schema is not None:
+        return read_table(store_dir(excel_file), nrows=nrows, schema=schema)
+    return read_file_head(excel_file.file.path, nrows, file_format=get_file_format(excel_file))
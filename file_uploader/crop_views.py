@@ -11,6 +11,10 @@ from django.core.files.base import ContentFile
 from .crop_models import CsvFile, CropImage, CropMetadata
 from .crop_serializers import CsvFileSerializer, CropImageSerializer, CropMetadataSerializer
 
+CSV_RESERVED_COLUMNS = ('F5 Code', 'sample_id', 'No.', 'no', 'F6 Full Name', 'description')
+
+BULK_BATCH_SIZE = 500
+
 class CsvFileViewSet(viewsets.ModelViewSet):
     queryset = CsvFile.objects.all().order_by('-uploaded_at')
     serializer_class = CsvFileSerializer
@@ -31,48 +35,65 @@ class CsvFileViewSet(viewsets.ModelViewSet):
                 csv_reader = csv.DictReader(file)
                 rows = [dict(r) for r in csv_reader]
             
-            # Process each row and create/update CropImage records
+            # Work out inserts and updates in memory against the images this
+            # CSV already owns, then write them in bulk.
+            existing_images = {}
+            for crop_image in CropImage.objects.filter(csv_file=csv_file).order_by('id'):
+                existing_images.setdefault(crop_image.sample_id, crop_image)
+            
             created_count = 0
             updated_count = 0
-            with transaction.atomic():
-                for idx, row in enumerate(rows):
-                    # Map columns
-                    sample_id = row.get('F5 Code') or row.get('sample_id')
-                    no_col = row.get('No.') or row.get('no')
-                    if not sample_id:
-                        continue  # Skip rows without sample_id
-                    
-                    # Try to find existing image or create new one
-                    crop_image, created = CropImage.objects.update_or_create(
+            new_images = {}
+            updated_images = {}
+            metadata_values = {}
+            for row in rows:
+                # Map columns
+                sample_id = row.get('F5 Code') or row.get('sample_id')
+                no_col = row.get('No.') or row.get('no')
+                if not sample_id:
+                    continue  # Skip rows without sample_id
+                
+                description = row.get('F6 Full Name') or row.get('description', '')
+                crop_image = existing_images.get(sample_id) or new_images.get(sample_id)
+                if crop_image is None:
+                    new_images[sample_id] = CropImage(
                         sample_id=sample_id,
                         csv_file=csv_file,
-                        defaults={
-                            'user': request.user,
-                            'description': row.get('F6 Full Name') or row.get('description', '')
-                        }
+                        user=request.user,
+                        description=description
                     )
-                    
-                    if created:
-                        created_count += 1
-                    else:
-                        updated_count += 1
-                    
-                    # store No. as metadata too
-                    if no_col:
-                        CropMetadata.objects.update_or_create(
-                            crop_image=crop_image,
-                            label='No.',
-                            defaults={'value': str(no_col)}
-                        )
-                    # store other columns generically
-                    for key, value in row.items():
-                        if key in ['F5 Code', 'sample_id', 'No.', 'no', 'F6 Full Name', 'description'] or value in [None, '']:
-                            continue
-                        CropMetadata.objects.update_or_create(
-                            crop_image=crop_image,
-                            label=key,
-                            defaults={'value': str(value)}
-                        )
+                    created_count += 1
+                else:
+                    crop_image.user = request.user
+                    crop_image.description = description
+                    if sample_id in existing_images:
+                        updated_images[sample_id] = crop_image
+                    updated_count += 1
+                
+                # store No. as metadata too
+                if no_col:
+                    metadata_values[(sample_id, 'No.')] = str(no_col)
+                # store other columns generically
+                for key, value in row.items():
+                    if key in CSV_RESERVED_COLUMNS or value in [None, '']:
+                        continue
+                    metadata_values[(sample_id, key)] = str(value)
+            
+            with transaction.atomic():
+                CropImage.objects.bulk_create(new_images.values(), batch_size=BULK_BATCH_SIZE)
+                CropImage.objects.bulk_update(updated_images.values(), ['user', 'description'], batch_size=BULK_BATCH_SIZE)
+                
+                images = {**existing_images, **new_images}
+                CropMetadata.objects.bulk_create(
+                    [
+                        CropMetadata(crop_image=images[sample_id], label=label, value=value)
+                        for (sample_id, label), value in metadata_values.items()
+                    ],
+                    batch_size=BULK_BATCH_SIZE,
+                    update_conflicts=True,
+                    unique_fields=['crop_image', 'label'],
+                    update_fields=['value']
+                )
             
             # Collect all row labels from 'No.' column for image matching
             row_labels = [row.get('No.') or row.get('no') for row in rows if (row.get('No.') or row.get('no'))]
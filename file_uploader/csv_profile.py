@@ -0,0 +1,179 @@
+import csv
+import hashlib
+import io
+import os
+import re
+from collections import namedtuple
+
+import pandas as pd
+
+from .table_cache import infer_column_types
+
+CHUNK_SIZE = 64 * 1024
+
+SNIFF_SIZE = 16 * 1024
+
+SAMPLE_SIZE = 1024 * 1024
+
+SAMPLE_ROWS = 1000
+
+DELIMITERS = ',;\t|'
+
+CsvProfile = namedtuple('CsvProfile', [
+    'data_hash', 'columns', 'column_types', 'row_count', 'delimiter', 'size', 'mtime_ns'
+])
+
+
+class RowCounter:
+    """Count CSV records from raw byte chunks without splitting fields.
+
+    Newlines inside double-quoted fields do not end a record; a doubled
+    quote flips the quoted state twice, so it needs no special case. Blank
+    lines are skipped, as ``pd.read_csv`` does.
+    """
+
+    BLANK_LINE = re.compile(rb'\n(?=\r?\n)')
+
+    def __init__(self):
+        self.records = 0
+        self.in_quotes = False
+        self.at_line_start = True
+        self.carry = b''
+
+    def feed(self, chunk):
+        chunk = self.carry + chunk
+        # Keep a trailing CR with the next chunk so CRLF blank lines are
+        # not split across two calls.
+        self.carry = b'\r' if chunk.endswith(b'\r') else b''
+        if self.carry:
+            chunk = chunk[:-1]
+
+        for position, part in enumerate(chunk.split(b'"')):
+            if position:
+                self.in_quotes = not self.in_quotes
+                self.at_line_start = False
+            if self.in_quotes or not part:
+                continue
+            blanks = len(self.BLANK_LINE.findall(part))
+            if self.at_line_start and (part.startswith(b'\n') or part.startswith(b'\r\n')):
+                blanks += 1
+            self.records += part.count(b'\n') - blanks
+            self.at_line_start = part.endswith(b'\n')
+
+    def finish(self):
+        if self.carry:
+            self.at_line_start = False
+            self.carry = b''
+        if not self.at_line_start:
+            # The last line has no trailing newline.
+            self.records += 1
+            self.at_line_start = True
+        return self.records
+
+
+def sniff_delimiter(sample):
+    header = sample.split('\n', 1)[0]
+    try:
+        delimiter = csv.Sniffer().sniff(sample, delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        return ','
+    # A single-column file has nothing to sniff; do not trust a guess the
+    # header line does not even contain.
+    return delimiter if delimiter in header else ','
+
+
+def file_signature(file_path):
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _sample_frame(text, delimiter, truncated, sample_rows):
+    """Parse the header and first ``sample_rows`` records of ``text``."""
+    pending = []
+
+    def capture():
+        for line in io.StringIO(text, newline=''):
+            pending.append(line)
+            yield line
+
+    records = []
+    complete = not truncated
+    try:
+        for _ in csv.reader(capture(), delimiter=delimiter):
+            records.append(''.join(pending))
+            pending.clear()
+            if len(records) > sample_rows:
+                complete = True
+                break
+    except csv.Error:
+        pass
+    if not complete:
+        # The sample was cut mid-file, so its last record may be partial.
+        records = records[:-1] or records
+    return pd.read_csv(io.StringIO(''.join(records)), sep=delimiter)
+
+
+def profile_csv(file_path, sample_rows=SAMPLE_ROWS):
+    """Hash and profile a CSV in a single streaming pass.
+
+    The file is read once in chunks; each chunk feeds the SHA-256 and a
+    quote-aware row counter, and the first ``SAMPLE_SIZE`` bytes are kept.
+    The delimiter is sniffed from that sample, and column types are
+    inferred by pandas from the header plus the first ``sample_rows``
+    records only.
+    """
+    size, mtime_ns = file_signature(file_path)
+    sha256 = hashlib.sha256()
+    counter = RowCounter()
+    sample = bytearray()
+
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha256.update(chunk)
+            counter.feed(chunk)
+            if len(sample) < SAMPLE_SIZE:
+                sample += chunk[:SAMPLE_SIZE - len(sample)]
+    records = counter.finish()
+
+    if not records:
+        raise pd.errors.EmptyDataError('No columns to parse from file')
+
+    text = bytes(sample).decode('utf-8-sig', errors='replace')
+    delimiter = sniff_delimiter(text[:SNIFF_SIZE])
+    frame = _sample_frame(text, delimiter, len(sample) < size, sample_rows)
+    return CsvProfile(
+        data_hash=sha256.hexdigest(),
+        columns=list(frame.columns),
+        column_types=infer_column_types(frame),
+        row_count=records - 1,
+        delimiter=delimiter,
+        size=size,
+        mtime_ns=mtime_ns,
+    )
+
+
+def apply_profile(csv_file, profile):
+    csv_file.data_hash = profile.data_hash
+    csv_file.columns = profile.columns
+    csv_file.column_types = profile.column_types
+    csv_file.row_count = profile.row_count
+    csv_file.profile = {
+        'delimiter': profile.delimiter,
+        'size': profile.size,
+        'mtime_ns': profile.mtime_ns,
+    }
+
+
+def profile_is_current(csv_file, file_path):
+    """True when the stored profile still describes the file on disk."""
+    stored = csv_file.profile or {}
+    if not csv_file.data_hash or 'size' not in stored:
+        return False
+    try:
+        return (stored['size'], stored['mtime_ns']) == file_signature(file_path)
+    except OSError:
+        return False
+
+
+def get_delimiter(csv_file):
+    return (csv_file.profile or {}).get('delimiter', ',')
@@ -1,27 +1,139 @@
 import os
 import base64
+import functools
+import io
+import struct
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from cryptography.exceptions import InvalidTag
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from django.conf import settings
 import json
 
+# Fernet tokens are urlsafe base64 of a 0x80 version byte followed by a
+# big-endian timestamp, so every token we produce starts with this prefix.
+# Legacy values are base64 of the token text and start with 'Z0FBQUFB'.
+COMPACT_TOKEN_PREFIX = 'gAAAAA'
+
+# Segmented file container: a 16 byte header (magic, version, plaintext chunk
+# size, nonce prefix) followed by length-prefixed AES-GCM segments. Each
+# segment's nonce is prefix + chunk counter + final flag and the header is
+# bound in as associated data, so reordered, dropped or truncated segments
+# fail authentication.
+STREAM_MAGIC = b'AGSE'
+STREAM_VERSION = 1
+STREAM_HEADER = struct.Struct('>4sBI7s')
+SEGMENT_LENGTH = struct.Struct('>I')
+STREAM_TAG_SIZE = 16
+DEFAULT_STREAM_CHUNK_SIZE = 64 * 1024
+
+class StreamDecryptionError(Exception):
+    pass
+
+def _segment_nonce(prefix, index, final):
+    return prefix + struct.pack('>IB', index, 1 if final else 0)
+
+def _encrypt_strings(key, texts):
+    fernet = Fernet(key)
+    return [fernet.encrypt(text.encode()).decode() for text in texts]
+
+def _decrypt_strings(key, tokens):
+    fernet = Fernet(key)
+    return [_decrypt_token(fernet, token) for token in tokens]
+
+def _decrypt_token(fernet, token):
+    if not token:
+        return token
+    try:
+        if token.startswith(COMPACT_TOKEN_PREFIX):
+            return fernet.decrypt(token.encode()).decode()
+        return fernet.decrypt(base64.urlsafe_b64decode(token.encode())).decode()
+    except Exception:
+        return token
+
+def is_stream_encrypted(head):
+    return head[:len(STREAM_MAGIC)] == STREAM_MAGIC
+
+def stream_plaintext_size(encrypted_size, chunk_size):
+    """Plaintext length of a segmented file, from its size on disk."""
+    body = encrypted_size - STREAM_HEADER.size
+    segment_size = SEGMENT_LENGTH.size + chunk_size + STREAM_TAG_SIZE
+    segments = max(1, -(-body // segment_size))
+    return body - segments * (SEGMENT_LENGTH.size + STREAM_TAG_SIZE)
+
+def read_stream_header(head):
+    return STREAM_HEADER.unpack(head[:STREAM_HEADER.size])
+
+def _split(items, parts):
+    size = max(1, -(-len(items) // parts))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+@functools.lru_cache(maxsize=None)
+def derive_key(secret_key):
+    """PBKDF2 derivation of the Fernet key, memoized once per process."""
+    password = secret_key.encode()
+    salt = b'genetic_data_salt'
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        iterations=100000,
+    )
+    return base64.urlsafe_b64encode(kdf.derive(password))
+
+def load_configured_key():
+    """Return a pre-derived key from settings/environment or a key file, if any."""
+    key = getattr(settings, 'ENCRYPTION_KEY', None)
+    if key:
+        return key.strip().encode() if isinstance(key, str) else key
+    
+    key_file = getattr(settings, 'ENCRYPTION_KEY_FILE', None)
+    if key_file:
+        with open(key_file, 'rb') as f:
+            return f.read().strip()
+    return None
+
 class EncryptionManager:
-    def __init__(self):
-        self.key = self._get_encryption_key()
-        self.fernet = Fernet(self.key)
+    """Fernet helpers whose key is resolved on first use rather than at import."""
+    
+    def __init__(self, key=None):
+        self._key = key
+        self._fernet = None
+        self._stream_cipher = None
+        self._lock = threading.Lock()
+    
+    @property
+    def key(self):
+        if self._key is None:
+            with self._lock:
+                if self._key is None:
+                    self._key = self._get_encryption_key()
+        return self._key
+    
+    @property
+    def fernet(self):
+        if self._fernet is None:
+            self._fernet = Fernet(self.key)
+        return self._fernet
     
     def _get_encryption_key(self):
-        password = settings.SECRET_KEY.encode()
-        salt = b'genetic_data_salt'
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(password))
-        return key
+        return load_configured_key() or derive_key(settings.SECRET_KEY)
+    
+    @property
+    def stream_cipher(self):
+        if self._stream_cipher is None:
+            stream_key = HKDF(
+                algorithm=hashes.SHA256(),
+                length=32,
+                salt=None,
+                info=b'genetic-file-stream-v1',
+            ).derive(base64.urlsafe_b64decode(self.key))
+            self._stream_cipher = AESGCM(stream_key)
+        return self._stream_cipher
     
     def encrypt_file(self, file_content):
         if isinstance(file_content, str):
@@ -29,8 +141,121 @@ class EncryptionManager:
         return self.fernet.encrypt(file_content)
     
     def decrypt_file(self, encrypted_content):
+        if is_stream_encrypted(encrypted_content):
+            return b''.join(self.decrypt_stream(io.BytesIO(encrypted_content)))
         return self.fernet.decrypt(encrypted_content)
     
+    def encrypt_stream(self, chunks, chunk_size=DEFAULT_STREAM_CHUNK_SIZE):
+        """Encrypt an iterable of byte chunks into the segmented container.
+        
+        Input chunks may be any size; they are re-cut to ``chunk_size``
+        plaintext bytes per segment. Yields the header and then one
+        sealed segment at a time.
+        """
+        header = STREAM_HEADER.pack(STREAM_MAGIC, STREAM_VERSION, chunk_size, os.urandom(7))
+        prefix = header[-7:]
+        cipher = self.stream_cipher
+        yield header
+        
+        buffer = bytearray()
+        pending = None
+        index = 0
+        for chunk in chunks:
+            buffer.extend(chunk)
+            while len(buffer) >= chunk_size:
+                if pending is not None:
+                    yield self._seal_segment(cipher, prefix, index, pending, False, header)
+                    index += 1
+                pending = bytes(buffer[:chunk_size])
+                del buffer[:chunk_size]
+        
+        if buffer or pending is None:
+            if pending is not None:
+                yield self._seal_segment(cipher, prefix, index, pending, False, header)
+                index += 1
+            pending = bytes(buffer)
+        yield self._seal_segment(cipher, prefix, index, pending, True, header)
+    
+    def _seal_segment(self, cipher, prefix, index, plaintext, final, header):
+        ciphertext = cipher.encrypt(_segment_nonce(prefix, index, final), plaintext, header)
+        return SEGMENT_LENGTH.pack(len(ciphertext)) + ciphertext
+    
+    def decrypt_stream(self, source):
+        """Yield the plaintext of an encrypted file object chunk by chunk.
+        
+        Files written before the segmented format (a single Fernet token)
+        are decrypted in one piece.
+        """
+        header = source.read(STREAM_HEADER.size)
+        if not is_stream_encrypted(header):
+            yield self.fernet.decrypt(header + source.read())
+            return
+        
+        _, version, chunk_size, prefix = STREAM_HEADER.unpack(header)
+        if version != STREAM_VERSION:
+            raise StreamDecryptionError(f'Unsupported stream version {version}')
+        
+        cipher = self.stream_cipher
+        index = 0
+        while True:
+            length_bytes = source.read(SEGMENT_LENGTH.size)
+            if len(length_bytes) < SEGMENT_LENGTH.size:
+                raise StreamDecryptionError('Encrypted file is truncated')
+            (length,) = SEGMENT_LENGTH.unpack(length_bytes)
+            if length > chunk_size + STREAM_TAG_SIZE:
+                raise StreamDecryptionError('Encrypted segment is larger than the declared chunk size')
+            ciphertext = source.read(length)
+            if len(ciphertext) < length:
+                raise StreamDecryptionError('Encrypted file is truncated')
+            
+            plaintext, final = self._open_segment(cipher, prefix, index, ciphertext, header)
+            yield plaintext
+            if final:
+                return
+            index += 1
+    
+    def decrypt_range(self, source, start, end):
+        """Yield plaintext bytes ``start``..``end`` (inclusive) of a segmented file.
+        
+        Only the segments overlapping the range are read and decrypted; the
+        file object must be seekable.
+        """
+        header = source.read(STREAM_HEADER.size)
+        if not is_stream_encrypted(header):
+            raise StreamDecryptionError('Range reads need the segmented format')
+        _, _, chunk_size, prefix = STREAM_HEADER.unpack(header)
+        
+        cipher = self.stream_cipher
+        index = start // chunk_size
+        offset = start - index * chunk_size
+        remaining = end - start + 1
+        source.seek(STREAM_HEADER.size + index * (SEGMENT_LENGTH.size + chunk_size + STREAM_TAG_SIZE))
+        
+        while remaining > 0:
+            length_bytes = source.read(SEGMENT_LENGTH.size)
+            if len(length_bytes) < SEGMENT_LENGTH.size:
+                raise StreamDecryptionError('Encrypted file is truncated')
+            (length,) = SEGMENT_LENGTH.unpack(length_bytes)
+            ciphertext = source.read(length)
+            
+            plaintext, final = self._open_segment(cipher, prefix, index, ciphertext, header)
+            piece = plaintext[offset:offset + remaining]
+            if piece:
+                yield piece
+            remaining -= len(piece)
+            if final:
+                return
+            offset = 0
+            index += 1
+    
+    def _open_segment(self, cipher, prefix, index, ciphertext, header):
+        for final in (False, True):
+            try:
+                return cipher.decrypt(_segment_nonce(prefix, index, final), ciphertext, header), final
+            except InvalidTag:
+                continue
+        raise StreamDecryptionError(f'Segment {index} failed authentication')
+    
     def encrypt_text(self, text):
         if not text:
             return text
@@ -39,13 +264,7 @@ class EncryptionManager:
         ).decode()
     
     def decrypt_text(self, encrypted_text):
-        if not encrypted_text:
-            return encrypted_text
-        try:
-            encrypted_bytes = base64.urlsafe_b64decode(encrypted_text.encode())
-            return self.fernet.decrypt(encrypted_bytes).decode()
-        except:
-            return encrypted_text
+        return _decrypt_token(self.fernet, encrypted_text)
     
     def encrypt_json(self, data):
         json_str = json.dumps(data)
@@ -57,5 +276,48 @@ class EncryptionManager:
             return json.loads(decrypted_str)
         except:
             return decrypted_str
+    
+    def _map_chunks(self, func, items, max_workers, use_processes):
+        if not max_workers or max_workers <= 1 or len(items) < 2:
+            return func(self.key, items)
+        
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        chunks = _split(items, max_workers)
+        with executor_class(max_workers=min(max_workers, len(chunks))) as executor:
+            results = executor.map(func, [self.key] * len(chunks), chunks)
+            return [value for chunk in results for value in chunk]
+    
+    def encrypt_json_many(self, payloads, max_workers=None, use_processes=False, compact=True):
+        """Encrypt a list of JSON payloads, optionally across a worker pool.
+        
+        Compact tokens are the Fernet token text itself; ``compact=False``
+        produces the legacy base64-wrapped format of ``encrypt_json``.
+        Empty payloads are returned as ``None``.
+        """
+        payloads = list(payloads)
+        positions = [i for i, payload in enumerate(payloads) if payload]
+        texts = [json.dumps(payloads[i], separators=(',', ':')) for i in positions]
+        
+        tokens = self._map_chunks(_encrypt_strings, texts, max_workers, use_processes)
+        if not compact:
+            tokens = [base64.urlsafe_b64encode(token.encode()).decode() for token in tokens]
+        
+        results = [None] * len(payloads)
+        for position, token in zip(positions, tokens):
+            results[position] = token
+        return results
+    
+    def decrypt_json_many(self, encrypted_values, max_workers=None, use_processes=False):
+        """Decrypt a list of values written by either token format."""
+        encrypted_values = list(encrypted_values)
+        texts = self._map_chunks(_decrypt_strings, encrypted_values, max_workers, use_processes)
+        
+        results = []
+        for text in texts:
+            try:
+                results.append(json.loads(text) if text else text)
+            except (TypeError, ValueError):
+                results.append(text)
+        return results
 
 encryption_manager = EncryptionManager()
\ No newline at end of file
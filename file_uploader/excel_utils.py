@@ -1,24 +1,132 @@
 import pandas as pd
 import logging
 import json
+from openpyxl import load_workbook
+from .file_formats import FILE_FORMATS, detect_format
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_CHUNK_ROWS = 1000
+
+
+def header_columns(header):
+    """Name header cells the way ``pd.read_excel`` does."""
+    columns = []
+    seen = {}
+    for position, value in enumerate(header):
+        name = f'Unnamed: {position}' if value is None else value
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+def trim_row(row):
+    end = len(row)
+    while end and row[end - 1] is None:
+        end -= 1
+    return row[:end]
+
+
+def iter_excel_chunks(file_path, chunk_rows=DEFAULT_CHUNK_ROWS, max_rows=None, sheet_name=None):
+    """Yield DataFrame chunks of at most ``chunk_rows`` rows from a workbook.
+
+    The sheet is streamed with openpyxl in read-only mode, so only one
+    chunk of rows is in memory at a time. The first non-blank row is the
+    header, blank rows are skipped, and reading stops as soon as
+    ``max_rows`` data rows have been produced.
+    """
+    # openpyxl rejects paths without an Excel extension, so hand it an open
+    # file; the format was already decided from the content.
+    with open(file_path, 'rb') as f:
+        yield from _iter_workbook_chunks(f, chunk_rows, max_rows, sheet_name)
+
+
+def _iter_workbook_chunks(f, chunk_rows, max_rows, sheet_name):
+    workbook = load_workbook(f, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+        rows = (trim_row(row) for row in sheet.iter_rows(values_only=True))
+        rows = (row for row in rows if row)
+
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = header_columns(header)
+        width = len(columns)
+        padding = (None,) * width
+
+        buffer = []
+        produced = 0
+        for row in rows:
+            buffer.append((row + padding)[:width])
+            produced += 1
+            if produced == max_rows:
+                break
+            if len(buffer) >= chunk_rows:
+                yield pd.DataFrame(buffer, columns=columns)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columns)
+    finally:
+        workbook.close()
+
+
+def iter_file_chunks(file_path, chunk_rows=DEFAULT_CHUNK_ROWS, max_rows=None, file_format=None):
+    """Yield DataFrame chunks from a CSV or spreadsheet upload.
+
+    ``file_format`` is a key of ``FILE_FORMATS``; when omitted it is
+    detected from the file's leading bytes. CSV files use pandas' own
+    chunked reader, ``.xlsx`` workbooks are streamed with
+    ``iter_excel_chunks`` and other workbooks go straight to their pandas
+    engine, limited to ``max_rows``.
+    """
+    file_format = file_format or detect_format(file_path)
+
+    if file_format == 'csv':
+        with pd.read_csv(file_path, chunksize=chunk_rows, nrows=max_rows) as reader:
+            yield from reader
+        return
+
+    if file_format == 'xlsx':
+        yield from iter_excel_chunks(file_path, chunk_rows=chunk_rows, max_rows=max_rows)
+        return
+
+    df = pd.read_excel(file_path, engine=FILE_FORMATS[file_format].engine, nrows=max_rows)
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def read_file_head(file_path, max_rows, chunk_rows=DEFAULT_CHUNK_ROWS, file_format=None):
+    """Read at most ``max_rows`` data rows without loading the whole file."""
+    chunks = list(iter_file_chunks(
+        file_path, chunk_rows=min(chunk_rows, max_rows), max_rows=max_rows, file_format=file_format
+    ))
+    if not chunks:
+        return pd.DataFrame()
+    return pd.concat(chunks, ignore_index=True)
+
+
 def process_excel_file(excel_file_instance):
     try:
         file_path = excel_file_instance.file.path
         logger.info(f"Processing Excel file: {file_path}")
-        
-        df = pd.read_excel(file_path)
-        
-        json_data = json.loads(df.to_json(orient='records'))
-        
+
+        from .columnar_store import build_store, read_store
+
+        # Keep the parsed table beside the upload so later reads skip parsing.
+        build_store(excel_file_instance)
+        json_data = json.loads(read_store(excel_file_instance).to_json(orient='records'))
+
         excel_file_instance.processed = True
         excel_file_instance.save()
-        
+
         logger.info(f"Successfully processed Excel file: {file_path}")
         return json_data
-    
+
     except Exception as e:
         logger.error(f"Error processing Excel file: {str(e)}")
         raise e
@@ -0,0 +1,105 @@
+import logging
+import zipfile
+from collections import namedtuple
+
+try:
+    import magic
+except ImportError:  # libmagic is optional; the signatures below cover our formats
+    magic = None
+
+logger = logging.getLogger(__name__)
+
+ZIP_SIGNATURE = b'PK\x03\x04'
+
+OLE2_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+SNIFF_SIZE = 4096
+
+FileFormat = namedtuple('FileFormat', ['name', 'engine', 'mime_types'])
+
+# Formats pandas can read, keyed by the name stored on ExcelFile.file_format.
+FILE_FORMATS = {
+    'csv': FileFormat('csv', None, ('text/csv', 'text/plain', 'application/csv')),
+    'xlsx': FileFormat('xlsx', 'openpyxl', ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',)),
+    'xls': FileFormat('xls', 'xlrd', ('application/vnd.ms-excel', 'application/x-ole-storage', 'application/CDFV2')),
+    'ods': FileFormat('ods', 'odf', ('application/vnd.oasis.opendocument.spreadsheet',)),
+}
+
+
+class UnsupportedFormatError(ValueError):
+    pass
+
+
+def _zip_format(file_path):
+    """Tell OOXML workbooks from OpenDocument sheets by their members."""
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            names = set(archive.namelist())
+            if 'xl/workbook.xml' in names:
+                return 'xlsx'
+            if 'mimetype' in names and archive.read('mimetype').startswith(b'application/vnd.oasis.opendocument.spreadsheet'):
+                return 'ods'
+    except zipfile.BadZipFile:
+        return None
+    return None
+
+
+def _looks_like_text(head):
+    if b'\x00' in head:
+        return False
+    try:
+        head.decode('utf-8')
+        return True
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off at the end of the sample is fine.
+        return e.start >= len(head) - 3
+
+
+def _magic_format(head):
+    if magic is None:
+        return None
+    try:
+        mime_type = magic.from_buffer(head, mime=True)
+    except Exception as e:
+        logger.warning(f"libmagic could not identify file: {str(e)}")
+        return None
+    for file_format in FILE_FORMATS.values():
+        if mime_type in file_format.mime_types:
+            return file_format.name
+    return None
+
+
+def detect_format(file_path):
+    """Identify a tabular upload from its leading bytes, not its name.
+
+    ZIP and OLE2 signatures identify workbooks and plain UTF-8 text is read
+    as CSV. libmagic, when installed, gets the last word on anything else.
+    Returns a key of ``FILE_FORMATS`` or raises ``UnsupportedFormatError``.
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(SNIFF_SIZE)
+
+    if not head:
+        raise UnsupportedFormatError('The file is empty')
+
+    detected = None
+    if head.startswith(ZIP_SIGNATURE):
+        detected = _zip_format(file_path)
+    elif head.startswith(OLE2_SIGNATURE):
+        detected = 'xls'
+    elif _looks_like_text(head):
+        detected = 'csv'
+    else:
+        detected = _magic_format(head)
+
+    if detected is None:
+        raise UnsupportedFormatError('Unsupported file format. Please upload a CSV or Excel file')
+    return detected
+
+
+def get_file_format(excel_file):
+    """Return the detected format of an ``ExcelFile``, detecting it once."""
+    if excel_file.file_format not in FILE_FORMATS:
+        excel_file.file_format = detect_format(excel_file.file.path)
+        excel_file.save(update_fields=['file_format'])
+    return excel_file.file_format
@@ -0,0 +1,137 @@
+import pandas as pd
+from django.db import transaction
+from openpyxl import load_workbook
+
+from kafka_producer.outbox import enqueue_event
+
+from .csv_profile import CHUNK_SIZE, RowCounter
+from .excel_utils import header_columns, trim_row
+from .file_formats import FILE_FORMATS, detect_format, get_file_format
+
+SAMPLE_ROWS = 5
+
+
+def _json_name(value):
+    return value if isinstance(value, (str, int, float, bool)) else str(value)
+
+
+def _summary(columns, row_count, exact, sampled_rows, sheet_names=(), sheet=None):
+    return {
+        'sheet_names': list(sheet_names),
+        'sheet': sheet,
+        'columns': [_json_name(column) for column in columns],
+        'column_count': len(columns),
+        'row_count': row_count,
+        'row_count_exact': exact,
+        'sampled_rows': sampled_rows,
+    }
+
+
+def _summarize_xlsx(file_path, sample_rows):
+    """Read the sheet list, the first sheet's dimension and its first rows.
+
+    The row count comes from the ``<dimension>`` element at the top of the
+    sheet XML, so it counts every row the writer declared, blank or not. It
+    is exact only when the sample reached the end of the sheet.
+    """
+    with open(file_path, 'rb') as f:
+        workbook = load_workbook(f, read_only=True, data_only=True)
+        try:
+            sheet = workbook.worksheets[0]
+            max_row = sheet.max_row
+
+            rows = (trim_row(row) for row in sheet.iter_rows(values_only=True))
+            header_row = None
+            header = None
+            sampled = 0
+            exhausted = True
+            for position, row in enumerate(rows, start=sheet.min_row or 1):
+                if not row:
+                    continue
+                if header is None:
+                    header, header_row = row, position
+                    continue
+                if sampled == sample_rows:
+                    exhausted = False
+                    break
+                sampled += 1
+
+            columns = header_columns(header) if header else []
+            if header is None or exhausted:
+                row_count, exact = sampled, True
+            elif max_row:
+                row_count, exact = max_row - header_row, False
+            else:
+                row_count, exact = None, False
+            return _summary(columns, row_count, exact, sampled, workbook.sheetnames, sheet.title)
+        finally:
+            workbook.close()
+
+
+def _summarize_workbook(file_path, file_format, sample_rows):
+    engine = FILE_FORMATS[file_format].engine
+    with pd.ExcelFile(file_path, engine=engine) as book:
+        sheet = book.sheet_names[0] if book.sheet_names else None
+        head = book.parse(0, nrows=sample_rows + 1)
+        sheet_names = book.sheet_names
+    sampled = min(len(head), sample_rows)
+    if len(head) <= sample_rows:
+        return _summary(list(head.columns), sampled, True, sampled, sheet_names, sheet)
+    return _summary(list(head.columns), None, False, sampled, sheet_names, sheet)
+
+
+def _summarize_csv(file_path, sample_rows):
+    """Estimate the row count of a CSV from its first chunk.
+
+    Small files are counted exactly. For larger ones the records per byte of
+    the first ``CHUNK_SIZE`` bytes are scaled to the file size.
+    """
+    head = pd.read_csv(file_path, nrows=sample_rows)
+    sampled = len(head)
+
+    counter = RowCounter()
+    with open(file_path, 'rb') as f:
+        chunk = f.read(CHUNK_SIZE)
+        counter.feed(chunk)
+        at_end = not f.read(1)
+        size = f.seek(0, 2)
+
+    if at_end:
+        row_count, exact = counter.finish() - 1, True
+    else:
+        row_count, exact = max(round(counter.records * size / len(chunk)) - 1, sampled), False
+    return _summary(list(head.columns), row_count, exact, sampled)
+
+
+def summarize_file(file_path, file_format=None, sample_rows=SAMPLE_ROWS):
+    """Describe an upload without parsing all of it.
+
+    Returns the sheet names, the header of the first sheet, a row count
+    and how many data rows were actually sampled. Only the header and the
+    first ``sample_rows`` data rows are read, so the cost does not grow with
+    the file. ``row_count_exact`` is False when the count is the declared
+    sheet dimension or an estimate from the first chunk of a CSV.
+    """
+    file_format = file_format or detect_format(file_path)
+    if file_format == 'csv':
+        return _summarize_csv(file_path, sample_rows)
+    if file_format == 'xlsx':
+        return _summarize_xlsx(file_path, sample_rows)
+    return _summarize_workbook(file_path, file_format, sample_rows)
+
+
+def summarize_excel_file(excel_file):
+    """Summarize an ``ExcelFile`` and mark it processed if it has data."""
+    metadata = summarize_file(excel_file.file.path, file_format=get_file_format(excel_file))
+    if metadata['sampled_rows']:
+        excel_file.metadata = metadata
+        excel_file.processed = True
+        with transaction.atomic():
+            excel_file.save(update_fields=['metadata', 'processed'])
+            enqueue_event('excel_file.processed', f'excel_file:{excel_file.id}', {
+                'file_id': excel_file.id,
+                'columns': metadata['columns'],
+                'row_count': metadata['row_count'],
+                'row_count_exact': metadata['row_count_exact'],
+            })
+    return metadata
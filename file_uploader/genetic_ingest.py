@@ -0,0 +1,262 @@
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import islice
+
+import pandas as pd
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from kafka_producer.outbox import enqueue_event
+
+from .encryption_utils import encryption_manager
+from .genetic_schema import map_genetic_records, missing_required_columns
+from .models import GeneticData, GeneticIngestJob, GeneticRecord
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+
+MAX_REPORTED_ERRORS = 100
+
+DEFAULT_LEASE_SECONDS = 300
+
+
+class IngestError(Exception):
+    pass
+
+
+class LeaseLost(Exception):
+    pass
+
+
+def get_batch_size(batch_size=None):
+    if batch_size:
+        return batch_size
+    return getattr(settings, 'GENETIC_INGEST_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+
+def _genetic_payloads(genetic_record):
+    genetic_signature = {
+        'f5_code': genetic_record.f5_code,
+        'f6_full_name': genetic_record.f6_full_name,
+        'location': genetic_record.location,
+        'breeding_cycle': 'F5-F6'
+    }
+
+    breeding_data = {
+        'pollination_date': str(genetic_record.pollination_date) if genetic_record.pollination_date else None,
+        'harvest_date': str(genetic_record.harvest_date) if genetic_record.harvest_date else None,
+        'genetic_traits': {
+            'fruit_weight': genetic_record.fruit_weight,
+            'fruit_dimensions': {
+                'length': genetic_record.fruit_length,
+                'width': genetic_record.fruit_width
+            },
+            'quality_metrics': {
+                'brix_content': genetic_record.brix_content,
+                'flesh_color': genetic_record.flesh_color,
+                'flesh_hardness': genetic_record.flesh_hardness
+            }
+        }
+    }
+    return genetic_signature, breeding_data
+
+
+def build_genetic_records(genetic_data, batch):
+    """Build one batch of records, encrypting their payloads in bulk."""
+    records = [GeneticRecord(genetic_data=genetic_data, **record_data) for _, record_data in batch]
+    payloads = [_genetic_payloads(record) for record in records]
+
+    max_workers = getattr(settings, 'GENETIC_INGEST_ENCRYPTION_WORKERS', None)
+    signatures = encryption_manager.encrypt_json_many([p[0] for p in payloads], max_workers=max_workers)
+    breeding = encryption_manager.encrypt_json_many([p[1] for p in payloads], max_workers=max_workers)
+
+    for record, signature, breeding_data in zip(records, signatures, breeding):
+        record.encrypted_genetic_signature = signature
+        record.encrypted_breeding_data = breeding_data
+    return records
+
+
+def iter_batches(iterable, batch_size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def write_genetic_records(genetic_data, mapped_records, batch_size=None, progress_callback=None):
+    """Build and insert ``GeneticRecord`` rows batch by batch in one transaction.
+
+    Only one batch of model instances is alive at a time. All of the batches
+    commit together, so a failure part-way through, including one raised by
+    ``progress_callback(written)``, rolls every record back and no partial
+    dataset is ever visible. Called inside an outer ``transaction.atomic()``
+    the records commit with it instead.
+    """
+    batch_size = get_batch_size(batch_size)
+    written = 0
+
+    with transaction.atomic():
+        for batch in iter_batches(mapped_records, batch_size):
+            records = build_genetic_records(genetic_data, batch)
+            GeneticRecord.objects.bulk_create(records, batch_size=batch_size)
+            written += len(records)
+            genetic_data.records_written = written
+            if progress_callback:
+                progress_callback(written)
+
+    logger.info(f"Wrote {written} genetic records for dataset {genetic_data.pk} in batches of {batch_size}")
+    return written
+
+
+def parse_genetic_file(source, file_type):
+    if file_type == 'csv':
+        return pd.read_csv(source)
+    return pd.read_excel(source)
+
+
+def get_lease_seconds():
+    return getattr(settings, 'GENETIC_INGEST_LEASE_SECONDS', DEFAULT_LEASE_SECONDS)
+
+
+def claim_next_job(now=None):
+    """Atomically move the oldest claimable job to running and return it.
+
+    The conditional UPDATE is the lock: when several workers race for the
+    same job only one of them sees a row count of 1. Queued jobs are
+    claimable, and so are running jobs whose heartbeat is older than
+    ``GENETIC_INGEST_LEASE_SECONDS``: their worker died. Each claim gets a
+    new token, so the previous owner's writes are refused from then on.
+    """
+    now = now or timezone.now()
+    stale = now - timedelta(seconds=get_lease_seconds())
+    claimable = Q(status=GeneticIngestJob.STATUS_QUEUED) | Q(
+        Q(heartbeat_at__lt=stale) | Q(heartbeat_at__isnull=True),
+        status=GeneticIngestJob.STATUS_RUNNING
+    )
+    candidates = GeneticIngestJob.objects.filter(claimable).order_by(
+        'created_at', 'id'
+    ).values_list('id', flat=True)[:10]
+
+    for job_id in candidates:
+        claimed = GeneticIngestJob.objects.filter(claimable, id=job_id).update(
+            status=GeneticIngestJob.STATUS_RUNNING,
+            started_at=now,
+            heartbeat_at=now,
+            claim_token=uuid.uuid4()
+        )
+        if claimed:
+            return GeneticIngestJob.objects.select_related('genetic_data').get(id=job_id)
+    return None
+
+
+def _update_job(job, **fields):
+    """Write ``fields`` and renew the lease, if this worker still holds it."""
+    fields['heartbeat_at'] = timezone.now()
+    updated = GeneticIngestJob.objects.filter(pk=job.pk, claim_token=job.claim_token).update(**fields)
+    if not updated:
+        raise LeaseLost(f'Ingest job {job.pk} was claimed by another worker')
+    for name, value in fields.items():
+        setattr(job, name, value)
+
+
+@contextmanager
+def job_progress(job):
+    """Yield a callback that stores a job's ``rows_processed`` and renews its lease.
+
+    The records are written in one transaction, so progress saved on the same
+    connection would only show once they commit. The callback therefore
+    writes from a thread of its own, on that thread's autocommit connection,
+    and the job row stays current while the file is being written. SQLite
+    allows a single writer, which the ingest transaction holds, so there the
+    progress is written inside that transaction instead.
+    """
+    if connection.vendor == 'sqlite':
+        yield lambda count: _update_job(job, rows_processed=count)
+        return
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='genetic-ingest-progress') as reporter:
+        try:
+            yield lambda count: reporter.submit(_update_job, job, rows_processed=count).result()
+        finally:
+            reporter.submit(connections.close_all)
+
+
+def run_ingest_job(job):
+    """Parse, map and insert the dataset attached to a claimed job."""
+    genetic_data = job.genetic_data
+    try:
+        if genetic_data is None:
+            raise IngestError('The uploaded dataset no longer exists')
+
+        try:
+            with genetic_data.open_file_content() as content:
+                df = parse_genetic_file(content, genetic_data.file_type)
+        except Exception as e:
+            raise IngestError(f'Error processing file: {str(e)}')
+
+        if df.empty:
+            raise IngestError('The uploaded file is empty')
+
+        missing_columns = missing_required_columns(df)
+        if missing_columns:
+            raise IngestError(
+                f'Missing required columns: {", ".join(missing_columns)}. Found columns: {", ".join(list(df.columns))}'
+            )
+
+        mapped_records, cast_errors = map_genetic_records(df)
+        _update_job(
+            job,
+            rows_total=len(df),
+            rows_failed=len(cast_errors),
+            errors=cast_errors[:MAX_REPORTED_ERRORS]
+        )
+        del df
+
+        if not mapped_records:
+            raise IngestError('No valid records found in the file')
+
+        # The records and the completed job commit together: if the lease is
+        # lost or anything fails, none of this worker's records remain.
+        with job_progress(job) as report_progress, transaction.atomic():
+            written = write_genetic_records(genetic_data, mapped_records, progress_callback=report_progress)
+            genetic_data.total_records = written
+            genetic_data.processed = True
+            genetic_data.save(update_fields=['total_records', 'records_written', 'processed'])
+            enqueue_event('genetic_data.processed', f'genetic_data:{genetic_data.id}', {
+                'genetic_data_id': genetic_data.id,
+                'uploaded_by': genetic_data.uploaded_by_id,
+                'total_records': written,
+            })
+            _update_job(job, status=GeneticIngestJob.STATUS_COMPLETED, finished_at=timezone.now())
+
+        logger.info(f"Ingest job {job.pk} completed with {written} records")
+    except LeaseLost as e:
+        # Another worker owns the job and its dataset now; leave both alone.
+        logger.warning(str(e))
+    except Exception as e:
+        logger.error(f"Ingest job {job.pk} failed: {str(e)}")
+        try:
+            _update_job(
+                job,
+                status=GeneticIngestJob.STATUS_FAILED,
+                error_message=str(e),
+                rows_processed=0,
+                genetic_data=None,
+                finished_at=timezone.now()
+            )
+        except LeaseLost as lost:
+            logger.warning(str(lost))
+            return job
+        if genetic_data is not None:
+            if genetic_data.file:
+                genetic_data.file.delete(save=False)
+            genetic_data.delete()
+    return job
@@ -0,0 +1,111 @@
+import logging
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ColumnMapping = namedtuple('ColumnMapping', ['field', 'column', 'kind'])
+
+REQUIRED_COLUMNS = ('No.', 'F5 Code')
+
+GENETIC_RECORD_SCHEMA = (
+    ColumnMapping('record_number', 'No.', 'int'),
+    ColumnMapping('f5_code', 'F5 Code', 'text'),
+    ColumnMapping('location', '6th Location', 'text'),
+    ColumnMapping('f5_fruit_number', 'F5 Fruit #', 'text'),
+    ColumnMapping('f6_full_name', 'F6 Full Name', 'text'),
+    ColumnMapping('sixth_code', '6th Code', 'text'),
+    ColumnMapping('fruit_number', 'Fruit No.', 'text'),
+    ColumnMapping('pollination_date', 'Polli.Date(2024)', 'date'),
+    ColumnMapping('harvest_date', 'Har.Date(2024)', 'date'),
+    ColumnMapping('pedicel_length', 'Pedicel Length (cm)', 'float'),
+    ColumnMapping('pedicel_width', 'Pedicel Width (mm)', 'float'),
+    ColumnMapping('insertion_peduncle_size', 'Size of Insertion Peduncle (mm)', 'float'),
+    ColumnMapping('fruit_weight', 'Fruit Weight (Kg)', 'float'),
+    ColumnMapping('fruit_length', 'Fruit Length (cm)', 'float'),
+    ColumnMapping('fruit_width', 'Fruit Width (cm)', 'float'),
+    ColumnMapping('rind_thickness', 'Rind Thickness (mm)', 'float'),
+    ColumnMapping('rind_hardness', 'Rind Hardness (Kpa)', 'float'),
+    ColumnMapping('apex_size', 'Size of Apex (mm)', 'float'),
+    ColumnMapping('rind_stripe', 'Rind Stripe', 'text'),
+    ColumnMapping('flesh_hardness', 'Flesh Hardness', 'text'),
+    ColumnMapping('flesh_color', 'Flesh Color', 'text'),
+    ColumnMapping('brix_content', 'Flesh sugar content Brix (%)', 'float'),
+    ColumnMapping('seeds_quantity', 'Seeds Quantity', 'int'),
+    ColumnMapping('remained_seeds', 'Remained Seeds', 'int'),
+)
+
+# Fields whose cast failure makes the whole row unusable.
+ROW_KEY_FIELDS = ('record_number',)
+
+
+def missing_required_columns(df):
+    return [col for col in REQUIRED_COLUMNS if col not in df.columns]
+
+
+def _cast_column(series, kind):
+    """Cast a whole column at once; unparseable cells come back as null."""
+    if kind == 'float':
+        return pd.to_numeric(series, errors='coerce').astype('float64')
+    if kind == 'int':
+        numeric = pd.to_numeric(series, errors='coerce')
+        return pd.Series(np.trunc(numeric.astype('float64')), index=series.index).astype('Int64')
+    if kind == 'date':
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return series.dt.date.where(series.notna(), None)
+        parsed = pd.to_datetime(series, errors='coerce', format='mixed')
+        return parsed.dt.date.where(parsed.notna(), None)
+    return series.astype(str).where(series.notna(), None)
+
+
+def _to_python_list(series):
+    values = series.astype(object).where(series.notna(), None).tolist()
+    return [value.item() if isinstance(value, np.generic) else value for value in values]
+
+
+def map_genetic_records(df, schema=GENETIC_RECORD_SCHEMA):
+    """Map a genetic trial sheet to ``GeneticRecord`` constructor kwargs.
+
+    Returns ``(records, errors)`` where ``records`` is a list of
+    ``(row_index, kwargs)`` pairs and ``errors`` lists every cell that was
+    present in the sheet but could not be cast to its field type.
+    """
+    errors = []
+    typed_columns = {}
+    dropped = pd.Series(False, index=df.index)
+
+    for mapping in schema:
+        if mapping.column not in df.columns:
+            continue
+        source = df[mapping.column]
+        typed = _cast_column(source, mapping.kind)
+        failed = source.notna() & typed.isna()
+        if failed.any():
+            for index, value in source[failed].items():
+                errors.append({
+                    'row': int(index) if isinstance(index, (int, np.integer)) else str(index),
+                    'field': mapping.field,
+                    'column': mapping.column,
+                    'value': str(value),
+                })
+        if mapping.field in ROW_KEY_FIELDS:
+            dropped |= typed.isna()
+        typed_columns[mapping.field] = _to_python_list(typed)
+
+    if errors:
+        logger.warning(f"{len(errors)} cell(s) could not be cast while mapping genetic records")
+
+    fields = list(typed_columns)
+    columns = [typed_columns[field] for field in fields]
+    keep = (~dropped).tolist()
+
+    records = []
+    for position, (index, values) in enumerate(zip(df.index, zip(*columns))):
+        if not keep[position]:
+            continue
+        records.append((index, {
+            field: value for field, value in zip(fields, values) if value is not None
+        }))
+    return records, errors
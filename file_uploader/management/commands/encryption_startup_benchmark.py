@@ -0,0 +1,52 @@
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from file_uploader.encryption_utils import EncryptionManager, derive_key
+
+# django.setup() imports every app's models, which is where the old
+# module-level EncryptionManager() paid for PBKDF2.
+SETUP_SNIPPET = (
+    "import time, django; t = time.perf_counter(); django.setup(); "
+    "print(time.perf_counter() - t)"
+)
+
+
+class Command(BaseCommand):
+    help = 'Compare the start-up cost of eager PBKDF2 key derivation with the lazy and pre-derived key paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        repeat = max(1, options['repeat'])
+
+        eager = self._timeit(lambda: derive_key.__wrapped__(settings.SECRET_KEY), repeat)
+        lazy = self._timeit(EncryptionManager, repeat)
+        pre_derived_key = derive_key(settings.SECRET_KEY)
+        pre_derived = self._timeit(lambda: EncryptionManager(key=pre_derived_key).fernet, repeat)
+        app_setup = self._timeit(self._setup_in_subprocess, repeat)
+
+        self.stdout.write(f'Eager PBKDF2 derivation (old import cost): {eager * 1000:8.2f} ms')
+        self.stdout.write(f'Lazy EncryptionManager() construction:      {lazy * 1000:8.2f} ms')
+        self.stdout.write(f'First use with a pre-derived key:           {pre_derived * 1000:8.2f} ms')
+        self.stdout.write(f'django.setup() in a fresh process:          {app_setup * 1000:8.2f} ms')
+
+    def _timeit(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            timings.append(result if isinstance(result, float) else time.perf_counter() - started)
+        return statistics.median(timings)
+
+    def _setup_in_subprocess(self):
+        output = subprocess.run(
+            [sys.executable, '-c', SETUP_SNIPPET],
+            capture_output=True, text=True, check=True
+        ).stdout
+        return float(output.strip().splitlines()[-1])
@@ -0,0 +1,20 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from file_uploader.encryption_utils import derive_key
+
+
+class Command(BaseCommand):
+    help = 'Write the Fernet key derived from SECRET_KEY so workers can load it via ENCRYPTION_KEY_FILE'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Path of the key file to write')
+
+    def handle(self, *args, **options):
+        path = options['output']
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(derive_key(settings.SECRET_KEY))
+        self.stdout.write(f'Wrote encryption key to {path}; set ENCRYPTION_KEY_FILE={path}')
@@ -0,0 +1,76 @@
+import logging
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from file_uploader.genetic_ingest import claim_next_job, run_ingest_job
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Process queued genetic data ingest jobs with a pool of worker threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Number of worker threads')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit instead of polling forever')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        stop_event = threading.Event()
+
+        if workers == 1:
+            # A single worker runs in the command's own thread and connection
+            self.stdout.write('Starting 1 genetic ingest worker')
+            try:
+                self._work(stop_event, options['poll_interval'], options['once'])
+            except KeyboardInterrupt:
+                self.stdout.write('Stopping genetic ingest worker')
+            return
+
+        threads = [
+            threading.Thread(
+                target=self._work_in_thread,
+                args=(stop_event, options['poll_interval'], options['once']),
+                name=f'genetic-ingest-{index}',
+                daemon=True
+            )
+            for index in range(workers)
+        ]
+
+        self.stdout.write(f'Starting {workers} genetic ingest worker(s)')
+        for thread in threads:
+            thread.start()
+
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping genetic ingest workers after their current job')
+            stop_event.set()
+            for thread in threads:
+                thread.join()
+
+    def _work_in_thread(self, stop_event, poll_interval, once):
+        try:
+            self._work(stop_event, poll_interval, once)
+        finally:
+            connection.close()
+
+    def _work(self, stop_event, poll_interval, once):
+        while not stop_event.is_set():
+            close_old_connections()
+            job = claim_next_job()
+            if job is None:
+                if once:
+                    return
+                stop_event.wait(poll_interval)
+                continue
+
+            started = time.monotonic()
+            run_ingest_job(job)
+            logger.info(f"Job {job.pk} finished as {job.status} in {time.monotonic() - started:.1f}s")
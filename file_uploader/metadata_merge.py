@@ -0,0 +1,107 @@
+import logging
+
+import pandas as pd
+from django.db import transaction
+
+from .models import CropImage, ImageMetadata
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_ID_COLUMN = 'sample_id'
+
+BULK_BATCH_SIZE = 500
+
+
+def format_metadata_value(value):
+    if isinstance(value, (int, float)):
+        text = str(value)
+        return text.rstrip('0').rstrip('.') if '.' in text else text
+    return str(value)
+
+
+def iter_metadata_rows(df):
+    """Yield ``(sample_id, {label: value})`` for every row with a sample id.
+
+    Values are read column by column instead of through ``iterrows()``, so
+    each cell keeps its column's type and empty cells are skipped.
+    """
+    labels = [column for column in df.columns if column != SAMPLE_ID_COLUMN]
+    columns = [df[label].tolist() for label in labels]
+    sample_ids = df[SAMPLE_ID_COLUMN].tolist()
+
+    for position, sample_id in enumerate(sample_ids):
+        if not sample_id or pd.isna(sample_id):
+            continue
+        values = {}
+        for label, column in zip(labels, columns):
+            value = column[position]
+            if not pd.isna(value):
+                values[label] = format_metadata_value(value)
+        yield str(sample_id), values
+
+
+def merge_csv_metadata(csv_file, df, user):
+    """Attach a CSV's rows to the user's crop images as ``ImageMetadata``.
+
+    Every sample id is resolved to images with one query and the existing
+    metadata of those images is loaded with another. The diff is then
+    written with ``bulk_create``/``bulk_update`` in a single transaction.
+
+    The counts match the old row-by-row ``update_or_create`` loop: each
+    image newly linked to ``csv_file`` and each (image, label) write that
+    hit an existing row counts as updated, and first writes count as
+    created. Returns ``(created, updated, rows_processed)``.
+    """
+    rows = list(iter_metadata_rows(df))
+    sample_ids = {sample_id for sample_id, _ in rows}
+
+    images_by_sample = {}
+    for image in CropImage.objects.filter(uploaded_by=user, sample_id__in=sample_ids).order_by('id'):
+        images_by_sample.setdefault(image.sample_id, []).append(image)
+
+    image_ids = [image.id for images in images_by_sample.values() for image in images]
+    existing = {}
+    for meta in ImageMetadata.objects.filter(image_id__in=image_ids).order_by('id'):
+        existing.setdefault((meta.image_id, meta.label), []).append(meta)
+
+    created = 0
+    updated = 0
+    linked_images = []
+    new_metadata = {}
+    changed_metadata = {}
+
+    for sample_id, values in rows:
+        for image in images_by_sample.get(sample_id, ()):
+            if image.csv_file_id != csv_file.id:
+                image.csv_file = csv_file
+                linked_images.append(image)
+                updated += 1
+
+            for label, value in values.items():
+                key = (image.id, label)
+                if key in existing:
+                    for meta in existing[key]:
+                        if meta.value != value:
+                            meta.value = value
+                            changed_metadata[meta.id] = meta
+                    updated += 1
+                elif key in new_metadata:
+                    new_metadata[key].value = value
+                    updated += 1
+                else:
+                    new_metadata[key] = ImageMetadata(image=image, label=label, value=value)
+                    created += 1
+
+    with transaction.atomic():
+        if linked_images:
+            CropImage.objects.bulk_update(linked_images, ['csv_file'], batch_size=BULK_BATCH_SIZE)
+        if new_metadata:
+            ImageMetadata.objects.bulk_create(new_metadata.values(), batch_size=BULK_BATCH_SIZE)
+        if changed_metadata:
+            ImageMetadata.objects.bulk_update(changed_metadata.values(), ['value'], batch_size=BULK_BATCH_SIZE)
+
+    logger.info(
+        f"Merged CSV {csv_file.pk}: {len(rows)} rows, {len(new_metadata)} metadata created, "
+        f"{len(changed_metadata)} changed, {len(linked_images)} images linked"
+    )
+    return created, updated, len(rows)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_uploader', '0005_csvfile_columns_csvfile_data_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='geneticdata',
+            name='records_written',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_uploader', '0007_geneticingestjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='geneticrecord',
+            index=models.Index(fields=['genetic_data', 'fruit_weight'], name='genrec_data_weight_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='geneticrecord',
+            index=models.Index(fields=['genetic_data', 'fruit_length'], name='genrec_data_length_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='geneticrecord',
+            index=models.Index(fields=['genetic_data', 'fruit_width'], name='genrec_data_width_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='geneticrecord',
+            index=models.Index(fields=['genetic_data', 'brix_content'], name='genrec_data_brix_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_uploader', '0008_geneticrecord_trait_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cropimage',
+            index=models.Index(fields=['sample_id', 'uploaded_by'], name='cropimage_sample_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='geneticdata',
+            index=models.Index(fields=['uploaded_by', 'uploaded_at'], name='geneticdata_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imagemetadata',
+            index=models.Index(fields=['image', 'label'], name='imagemeta_image_label_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_uploader', '0009_lookup_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvfile',
+            name='column_types',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
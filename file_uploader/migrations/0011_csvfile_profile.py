@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_uploader', '0010_csvfile_column_types'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvfile',
+            name='profile',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='csvfile',
+            name='row_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
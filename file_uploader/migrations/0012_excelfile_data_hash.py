@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_uploader', '0011_csvfile_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='excelfile',
+            name='data_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_uploader', '0012_excelfile_data_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='excelfile',
+            name='file_format',
+            field=models.CharField(blank=True, max_length=10, null=True),
+        ),
+    ]
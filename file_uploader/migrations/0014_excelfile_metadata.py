@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_uploader', '0013_excelfile_file_format'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='excelfile',
+            name='metadata',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
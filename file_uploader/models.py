@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth.models import User
 import uuid
 import os
+import tempfile
 from .encryption_utils import encryption_manager
 
 def get_file_path(instance, filename):
@@ -15,6 +16,9 @@ class ExcelFile(models.Model):
     uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='excel_files', null=True, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     processed = models.BooleanField(default=False)
+    data_hash = models.CharField(max_length=64, blank=True, null=True)
+    file_format = models.CharField(max_length=10, blank=True, null=True)
+    metadata = models.JSONField(default=dict, blank=True)
     
     def __str__(self):
         return self.title
@@ -34,6 +38,9 @@ class CsvFile(models.Model):
     uploaded_at = models.DateTimeField(auto_now_add=True)
     processed = models.BooleanField(default=False)
     columns = models.JSONField(default=list, blank=True)
+    column_types = models.JSONField(default=dict, blank=True)
+    row_count = models.IntegerField(blank=True, null=True)
+    profile = models.JSONField(default=dict, blank=True)
     data_hash = models.CharField(max_length=64, blank=True, null=True)
     
     def __str__(self):
@@ -47,6 +54,11 @@ class CropImage(models.Model):
     uploaded_at = models.DateTimeField(auto_now_add=True)
     csv_file = models.ForeignKey(CsvFile, on_delete=models.SET_NULL, related_name='images', null=True, blank=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['sample_id', 'uploaded_by'], name='cropimage_sample_user_idx'),
+        ]
+    
     def __str__(self):
         return self.sample_id
 
@@ -55,6 +67,11 @@ class ImageMetadata(models.Model):
     label = models.CharField(max_length=100)
     value = models.CharField(max_length=255)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['image', 'label'], name='imagemeta_image_label_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.label}: {self.value}"
 
@@ -64,22 +81,40 @@ class GeneticData(models.Model):
     uploaded_at = models.DateTimeField(auto_now_add=True)
     file_type = models.CharField(max_length=10, choices=[('csv', 'CSV'), ('xlsx', 'Excel')])
     total_records = models.IntegerField(default=0)
+    records_written = models.IntegerField(default=0)
     processed = models.BooleanField(default=False)
     is_encrypted = models.BooleanField(default=False)
     encrypted_metadata = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['uploaded_by', 'uploaded_at'], name='geneticdata_user_date_idx'),
+        ]
+
     def __str__(self):
         return f"Genetic Data - {self.uploaded_at}"
     
     def get_file_content(self):
-        if self.is_encrypted and self.file:
-            with open(self.file.path, 'rb') as f:
-                encrypted_content = f.read()
-            return encryption_manager.decrypt_file(encrypted_content)
-        elif self.file:
-            with open(self.file.path, 'rb') as f:
-                return f.read()
-        return None
+        if not self.file:
+            return None
+        return b''.join(self.iter_file_content())
+    
+    def iter_file_content(self, chunk_size=64 * 1024):
+        if not self.file:
+            return
+        with open(self.file.path, 'rb') as f:
+            if self.is_encrypted:
+                yield from encryption_manager.decrypt_stream(f)
+            else:
+                yield from iter(lambda: f.read(chunk_size), b'')
+    
+    def open_file_content(self, max_memory_size=8 * 1024 * 1024):
+        """Decrypt into a spooled temporary file that parsers can read from."""
+        spooled = tempfile.SpooledTemporaryFile(max_size=max_memory_size)
+        for chunk in self.iter_file_content():
+            spooled.write(chunk)
+        spooled.seek(0)
+        return spooled
 
 class GeneticRecord(models.Model):
     genetic_data = models.ForeignKey(GeneticData, on_delete=models.CASCADE, related_name='records')
@@ -114,6 +149,14 @@ class GeneticRecord(models.Model):
 
     class Meta:
         unique_together = ('genetic_data', 'record_number', 'f5_code')
+        # Backs the trait orderings/filters of GeneticRecordsDetailView; the
+        # unique_together index already covers (genetic_data, record_number).
+        indexes = [
+            models.Index(fields=['genetic_data', 'fruit_weight'], name='genrec_data_weight_idx'),
+            models.Index(fields=['genetic_data', 'fruit_length'], name='genrec_data_length_idx'),
+            models.Index(fields=['genetic_data', 'fruit_width'], name='genrec_data_width_idx'),
+            models.Index(fields=['genetic_data', 'brix_content'], name='genrec_data_brix_idx'),
+        ]
 
     def __str__(self):
         return f"Record {self.record_number} - {self.f5_code}"
@@ -135,3 +178,34 @@ class GeneticRecord(models.Model):
         if self.encrypted_breeding_data:
             return encryption_manager.decrypt_json(self.encrypted_breeding_data)
         return None
+
+class GeneticIngestJob(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    genetic_data = models.ForeignKey(GeneticData, on_delete=models.SET_NULL, null=True, blank=True, related_name='ingest_jobs')
+    uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='genetic_ingest_jobs')
+    original_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+    rows_total = models.IntegerField(default=0)
+    rows_processed = models.IntegerField(default=0)
+    rows_failed = models.IntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    error_message = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Lease held by the worker running the job; see genetic_ingest.claim_next_job
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    claim_token = models.UUIDField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Ingest job {self.id} - {self.status}"
@@ -0,0 +1,67 @@
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+
+
+def file_sha256(file_obj):
+    """Hash a Django ``File`` or field file in chunks."""
+    sha256 = hashlib.sha256()
+    file_obj.open('rb')
+    try:
+        file_obj.seek(0)
+        for chunk in file_obj.chunks(HASH_CHUNK_SIZE):
+            sha256.update(chunk)
+    finally:
+        file_obj.seek(0)
+    return sha256.hexdigest()
+
+
+def get_processed_cache():
+    alias = getattr(settings, 'PROCESSED_DATA_CACHE_ALIAS', 'processed_data')
+    try:
+        return caches[alias]
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def processed_data_key(file_id, data_hash):
+    return f'processed_data:{file_id}:{data_hash}'
+
+
+def ensure_data_hash(excel_file):
+    if not excel_file.data_hash:
+        excel_file.data_hash = file_sha256(excel_file.file)
+        excel_file.save(update_fields=['data_hash'])
+    return excel_file.data_hash
+
+
+def get_processed_data(excel_file):
+    """Return the cached rows for ``excel_file``, or None on a miss.
+
+    The key includes the content hash, so replacing the file changes the
+    key and old entries simply age out.
+    """
+    key = processed_data_key(excel_file.id, ensure_data_hash(excel_file))
+    return get_processed_cache().get(key)
+
+
+def set_processed_data(excel_file, data):
+    payload_size = len(json.dumps(data, default=str))
+    max_bytes = getattr(settings, 'PROCESSED_DATA_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+    if payload_size > max_bytes:
+        logger.info(f"Not caching processed data for file {excel_file.id}: {payload_size} bytes exceeds {max_bytes}")
+        return False
+
+    key = processed_data_key(excel_file.id, ensure_data_hash(excel_file))
+    get_processed_cache().set(key, data)
+    return True
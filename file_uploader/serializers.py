@@ -41,8 +41,8 @@ class ExcelFileSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = ExcelFile
-        fields = ['id', 'title', 'file', 'file_url', 'file_size_in_bytes', 'uploaded_by', 'uploaded_at', 'processed']
-        read_only_fields = ['id', 'uploaded_at', 'processed', 'uploaded_by', 'file_url', 'file_size_in_bytes']
+        fields = ['id', 'title', 'file', 'file_url', 'file_size_in_bytes', 'uploaded_by', 'uploaded_at', 'processed', 'file_format', 'metadata']
+        read_only_fields = ['id', 'uploaded_at', 'processed', 'uploaded_by', 'file_url', 'file_size_in_bytes', 'file_format', 'metadata']
     
     def get_file_url(self, obj):
         request = self.context.get('request')
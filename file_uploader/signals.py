@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .columnar_store import discard_store
+from .models import ExcelFile
+
+
+@receiver(post_delete, sender=ExcelFile)
+def discard_excel_file_store(sender, instance, **kwargs):
+    """Remove the columnar copy kept beside a deleted upload."""
+    if instance.file:
+        discard_store(instance.file.path)
@@ -0,0 +1,350 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+SCHEMA_FILE = 'schema.json'
+
+SCHEMA_VERSION = 1
+
+_evict_lock = threading.Lock()
+
+# One background parse at a time fills the cache after read_csv_page misses.
+_fill_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='table-cache-fill')
+
+_fill_lock = threading.Lock()
+
+# data_hash -> future of the fill in progress
+_filling = {}
+
+
+def column_type(series):
+    if pd.api.types.is_numeric_dtype(series):
+        return 'numeric'
+    elif pd.api.types.is_datetime64_dtype(series):
+        return 'datetime'
+    return 'text'
+
+
+def infer_column_types(df):
+    return {col: column_type(df[col]) for col in df.columns}
+
+
+def _column_storage(series):
+    """Pick how a column is stored: a raw ``.npy`` array or a JSON list."""
+    dtype = series.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in 'biufM':
+        return 'npy'
+    return 'json'
+
+
+def write_table(directory, df, source=None):
+    """Write ``df`` as one file per column plus a ``schema.json``.
+
+    Numeric, boolean and datetime columns are saved as ``.npy`` arrays that
+    can be memory-mapped; everything else is saved as a JSON list with
+    ``null`` for missing cells. ``source`` is stored verbatim in the schema.
+    """
+    os.makedirs(directory, exist_ok=True)
+    columns = []
+    for position, name in enumerate(df.columns):
+        series = df.iloc[:, position]
+        storage = _column_storage(series)
+        filename = f'col_{position}.{storage}'
+        path = os.path.join(directory, filename)
+        if storage == 'npy':
+            np.save(path, series.to_numpy(), allow_pickle=False)
+        else:
+            values = series.astype(object).where(series.notna(), None).tolist()
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump([v if v is None or isinstance(v, (str, int, float, bool)) else str(v) for v in values], f)
+        columns.append({
+            'name': name,
+            'file': filename,
+            'storage': storage,
+            'dtype': str(series.dtype),
+            'type': column_type(series),
+        })
+
+    schema = {
+        'version': SCHEMA_VERSION,
+        'row_count': len(df),
+        'columns': columns,
+        'source': source or {},
+    }
+    with open(os.path.join(directory, SCHEMA_FILE), 'w', encoding='utf-8') as f:
+        json.dump(schema, f)
+    return schema
+
+
+def read_schema(directory):
+    try:
+        with open(os.path.join(directory, SCHEMA_FILE), encoding='utf-8') as f:
+            schema = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if schema.get('version') != SCHEMA_VERSION:
+        return None
+    return schema
+
+
+def _restore_dtype(series, dtype):
+    series = series.where(series.notna(), np.nan)
+    if dtype == 'object':
+        return series
+    try:
+        return series.astype(pd.api.types.pandas_dtype(dtype))
+    except (TypeError, ValueError):
+        return series
+
+
+def read_table(directory, columns=None, nrows=None, schema=None, offset=0):
+    """Load a table written by ``write_table``.
+
+    Only the requested ``columns`` are read, and ``offset``/``nrows`` pick
+    which rows are materialised; ``.npy`` columns are memory-mapped so a
+    short page does not read the whole column.
+    """
+    schema = schema or read_schema(directory)
+    if schema is None:
+        return None
+
+    entries = schema['columns']
+    if columns is not None:
+        wanted = set(columns)
+        entries = [entry for entry in entries if entry['name'] in wanted]
+
+    stop = None if nrows is None else offset + nrows
+    row_count = len(range(schema['row_count'])[offset:stop])
+    index = pd.RangeIndex(offset, offset + row_count)
+    data = {}
+    for entry in entries:
+        path = os.path.join(directory, entry['file'])
+        if entry['storage'] == 'npy':
+            values = np.load(path, mmap_mode='r', allow_pickle=False)
+            values = np.array(values[offset:stop])
+        else:
+            with open(path, encoding='utf-8') as f:
+                values = json.load(f)
+            values = values[offset:stop]
+            values = _restore_dtype(pd.Series(values, dtype=object, index=index), entry['dtype'])
+        data[entry['name']] = values
+
+    return pd.DataFrame(data, index=index, columns=[entry['name'] for entry in entries])
+
+
+def get_cache_dir():
+    return getattr(settings, 'TABLE_CACHE_DIR', os.path.join(settings.BASE_DIR, 'table_cache'))
+
+
+def _entry_dir(data_hash):
+    return os.path.join(get_cache_dir(), data_hash)
+
+
+def source_signature(file_path):
+    stat = os.stat(file_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _directory_size(directory):
+    total = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def get_cached_schema(data_hash):
+    """Return the schema of a cached table, or None on a miss.
+
+    Entries are keyed by the content hash alone, so uploads with the same
+    content share one entry whatever their path. A replaced upload gets a
+    new ``data_hash`` and so a new entry.
+    """
+    if not data_hash:
+        return None
+    directory = _entry_dir(data_hash)
+    schema = read_schema(directory)
+    if schema is None:
+        return None
+    try:
+        # The directory mtime is the LRU clock.
+        os.utime(directory)
+    except OSError:
+        return None
+    return schema
+
+
+def load_cached_table(data_hash, columns=None, nrows=None, offset=0):
+    schema = get_cached_schema(data_hash)
+    if schema is None:
+        return None
+    try:
+        return read_table(_entry_dir(data_hash), columns=columns, nrows=nrows, schema=schema, offset=offset)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Discarding unreadable table cache entry {data_hash}: {str(e)}")
+        discard_table(data_hash)
+        return None
+
+
+def store_table(data_hash, df):
+    """Cache ``df`` under ``data_hash`` and evict old entries if needed."""
+    if not data_hash:
+        return None
+    cache_dir = get_cache_dir()
+    staging = os.path.join(cache_dir, f'.{data_hash}.{uuid.uuid4().hex}')
+    try:
+        schema = write_table(staging, df)
+        try:
+            os.replace(staging, _entry_dir(data_hash))
+        except OSError:
+            # Another request cached the same table first.
+            shutil.rmtree(staging, ignore_errors=True)
+    except Exception as e:
+        shutil.rmtree(staging, ignore_errors=True)
+        logger.warning(f"Could not cache table {data_hash}: {str(e)}")
+        return None
+
+    evict_tables()
+    return schema
+
+
+def discard_table(data_hash):
+    if data_hash:
+        shutil.rmtree(_entry_dir(data_hash), ignore_errors=True)
+
+
+def evict_tables(max_bytes=None):
+    """Remove least recently used entries until the cache fits ``max_bytes``."""
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'TABLE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+    cache_dir = get_cache_dir()
+
+    with _evict_lock:
+        try:
+            names = [name for name in os.listdir(cache_dir) if not name.startswith('.')]
+        except FileNotFoundError:
+            return 0
+
+        entries = []
+        for name in names:
+            path = os.path.join(cache_dir, name)
+            try:
+                entries.append((os.path.getmtime(path), _directory_size(path), path))
+            except OSError:
+                continue
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+
+    if removed:
+        logger.info(f"Evicted {removed} table cache entr{'y' if removed == 1 else 'ies'}")
+    return removed
+
+
+def read_csv_preview(file_path, data_hash, nrows, sep=',', column_types=None, row_count=None):
+    """Return ``(head, column_types, row_count)`` for a CSV.
+
+    A cache hit only reads the first ``nrows`` rows and the schema. When
+    the caller already knows the column types and row count, a miss only
+    parses the first ``nrows`` rows.
+    """
+    schema = get_cached_schema(data_hash)
+    if schema is not None:
+        head = load_cached_table(data_hash, nrows=nrows)
+        if head is not None:
+            column_types = {entry['name']: entry['type'] for entry in schema['columns']}
+            return head, column_types, schema['row_count']
+
+    if column_types and row_count is not None:
+        return pd.read_csv(file_path, sep=sep, nrows=nrows), column_types, row_count
+
+    df = pd.read_csv(file_path, sep=sep)
+    store_table(data_hash, df)
+    return df.head(nrows), infer_column_types(df), len(df)
+
+
+def read_csv_cached(file_path, data_hash, columns=None, nrows=None, sep=','):
+    """Read a CSV through the table cache.
+
+    On a miss the whole file is parsed once with ``pd.read_csv`` and stored;
+    the requested ``columns``/``nrows`` are then taken from that frame.
+    """
+    df = load_cached_table(data_hash, columns=columns, nrows=nrows)
+    if df is not None:
+        return df
+
+    df = pd.read_csv(file_path, sep=sep)
+    store_table(data_hash, df)
+    if columns is not None:
+        df = df[[col for col in df.columns if col in set(columns)]]
+    if nrows is not None:
+        df = df.head(nrows)
+    return df
+
+
+def _fill_table(file_path, data_hash, sep):
+    try:
+        if get_cached_schema(data_hash) is None:
+            store_table(data_hash, pd.read_csv(file_path, sep=sep))
+    except Exception as e:
+        logger.warning(f"Could not fill table cache entry {data_hash}: {str(e)}")
+    finally:
+        with _fill_lock:
+            _filling.pop(data_hash, None)
+
+
+def fill_table_cache(file_path, data_hash, sep=','):
+    """Parse a whole CSV and cache it on a background thread.
+
+    At most one fill runs per ``data_hash``; the running fill's future is
+    returned to callers that ask again while it is in progress.
+    """
+    if not data_hash:
+        return None
+    with _fill_lock:
+        future = _filling.get(data_hash)
+        if future is None:
+            future = _fill_executor.submit(_fill_table, file_path, data_hash, sep)
+            _filling[data_hash] = future
+    return future
+
+
+def read_csv_page(file_path, data_hash, columns=None, offset=0, limit=None, dtypes=None, sep=','):
+    """Return ``(page, total_rows)`` for a slice of a CSV's rows.
+
+    A cache hit reads just the requested columns and rows. On a miss only
+    the requested ``columns`` are parsed, using ``dtypes`` as hints, and the
+    full table is cached by ``fill_table_cache`` off the request path, so
+    later pages hit the cache.
+    """
+    schema = get_cached_schema(data_hash)
+    if schema is not None:
+        page = load_cached_table(data_hash, columns=columns, nrows=limit, offset=offset)
+        if page is not None:
+            return page, schema['row_count']
+
+    df = pd.read_csv(file_path, sep=sep, usecols=columns, dtype=dtypes or None)
+    fill_table_cache(file_path, data_hash, sep=sep)
+    stop = None if limit is None else offset + limit
+    return df.iloc[offset:stop], len(df)
@@ -1,11 +1,31 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
+from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APIClient
 from rest_framework import status
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.db.models import F
+from unittest import mock
+import hashlib
 import os
+import re
+import tempfile
+from datetime import timedelta
 import pandas as pd
-from io import BytesIO
-from .models import ExcelFile
+from io import BytesIO, StringIO
+from .models import ExcelFile, CsvFile, CropImage, ImageMetadata, GeneticData, GeneticRecord, GeneticIngestJob
+from .genetic_ingest import claim_next_job, run_ingest_job, write_genetic_records
+from django.utils import timezone
+from .excel_utils import iter_excel_chunks, process_excel_file
+from .columnar_store import STORE_SUFFIX, build_store, get_store_schema, read_store
+from .file_summary import SAMPLE_ROWS as SUMMARY_SAMPLE_ROWS
+from .file_formats import OLE2_SIGNATURE, UnsupportedFormatError, detect_format
+from .processed_cache import get_processed_cache, get_processed_data
+from .views import PROCESSED_DATA_MAX_ROWS
+from .table_cache import discard_table, evict_tables, fill_table_cache, get_cached_schema, read_csv_cached
+from django.conf import settings
 from django.contrib.auth.models import User
 
 class FileUploadTest(TestCase):
@@ -78,3 +98,849 @@ class CropImageTest(TestCase):
         url = reverse('cropimage-list')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(),
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'processed_data': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'processed-data-tests'},
+    }
+)
+class ProcessedDataCacheTest(TestCase):
+    """Test case for the shared processed data cache."""
+    
+    def setUp(self):
+        """Set up test environment."""
+        self.client = APIClient()
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword'
+        )
+        self.client.force_authenticate(user=self.user)
+        get_processed_cache().clear()
+    
+    def _upload(self, content):
+        return self._upload_file(SimpleUploadedFile('trial.csv', content, content_type='text/csv'))
+    
+    def _upload_file(self, upload):
+        response = self.client.post(reverse('excelfile-list'), {
+            'title': 'Trial',
+            'file': upload
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return ExcelFile.objects.get(id=response.data['id'])
+    
+    def test_rows_are_cached_by_file_and_content_hash(self):
+        """Test repeat reads hit the shared cache and a new file misses it."""
+        excel_file = self._upload(b'Name,Age\nJohn,30\nJane,\n')
+        self.assertEqual(excel_file.data_hash, hashlib.sha256(b'Name,Age\nJohn,30\nJane,\n').hexdigest())
+        ExcelFile.objects.filter(id=excel_file.id).update(processed=True)
+        url = reverse('processed_data_by_file')
+        
+        first = self.client.get(url, {'file_id': excel_file.id})
+        self.assertEqual(first.data, [{'Name': 'John', 'Age': 30.0}, {'Name': 'Jane', 'Age': None}])
+        
+        with mock.patch('file_uploader.views.pd.read_csv', side_effect=AssertionError('parsed again')):
+            second = self.client.get(url, {'file_id': excel_file.id})
+        self.assertEqual(second.data, first.data)
+        self.assertFalse(any(key.startswith('processed_data') for key in self.client.session.keys()))
+        
+        response = self.client.patch(reverse('excelfile-detail', args=[excel_file.id]), {
+            'file': SimpleUploadedFile('trial.csv', b'Name,Age\nBob,40\nAnn,22\n', content_type='text/csv')
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        third = self.client.get(url, {'file_id': excel_file.id})
+        self.assertEqual(third.data, [{'Name': 'Bob', 'Age': 40}, {'Name': 'Ann', 'Age': 22}])
+        
+        with override_settings(PROCESSED_DATA_CACHE_MAX_BYTES=10):
+            get_processed_cache().clear()
+            self.client.get(url, {'file_id': excel_file.id})
+            self.assertIsNone(get_processed_data(ExcelFile.objects.get(id=excel_file.id)))
+    
+    def test_large_workbooks_are_streamed(self):
+        """Test workbooks are read in bounded chunks and stop at the row cap."""
+        df = pd.DataFrame({'No.': range(1, 2501), 'Weight': [1.5] * 2500})
+        workbook = BytesIO()
+        df.to_excel(workbook, index=False)
+        path = os.path.join(tempfile.mkdtemp(), 'trial.xlsx')
+        with open(path, 'wb') as f:
+            f.write(workbook.getvalue())
+        
+        self.assertEqual([len(chunk) for chunk in iter_excel_chunks(path, chunk_rows=1000)], [1000, 1000, 500])
+        self.assertEqual([len(chunk) for chunk in iter_excel_chunks(path, chunk_rows=400, max_rows=1000)], [400, 400, 200])
+        
+        workbook.seek(0)
+        excel_file = self._upload_file(SimpleUploadedFile('trial.xlsx', workbook.getvalue()))
+        ExcelFile.objects.filter(id=excel_file.id).update(processed=True)
+        with mock.patch('file_uploader.excel_utils.pd.read_excel', side_effect=AssertionError('not streamed')), \
+                mock.patch('file_uploader.columnar_store.build_store', side_effect=AssertionError('parsed in full')):
+            response = self.client.get(reverse('processed_data_by_file'), {'file_id': excel_file.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1000)
+        self.assertEqual(response.data[-1], {'No.': 1000, 'Weight': 1.5})
+        self.assertIsNone(get_store_schema(excel_file))
+
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(),
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'processed_data': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'columnar-store-tests'},
+    }
+)
+class ColumnarStoreTest(TestCase):
+    """Test case for the columnar copy kept beside each upload."""
+    
+    def setUp(self):
+        """Set up test environment."""
+        self.client = APIClient()
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword'
+        )
+        self.client.force_authenticate(user=self.user)
+        get_processed_cache().clear()
+        
+        workbook = BytesIO()
+        pd.DataFrame({
+            'Plot': range(1, 1501),
+            'Variety': ['IR64', None, 'Jasmine'] * 500,
+            'Yield': [4.5, None, 3.25] * 500,
+        }).to_excel(workbook, index=False)
+        response = self.client.post(reverse('excelfile-list'), {
+            'title': 'Trial',
+            'file': SimpleUploadedFile('trial.xlsx', workbook.getvalue())
+        }, format='multipart')
+        self.excel_file = ExcelFile.objects.get(id=response.data['id'])
+    
+    def test_processing_writes_a_memory_mappable_store(self):
+        """Test processing keeps per-column files beside the upload and reads reuse them."""
+        rows = process_excel_file(self.excel_file)
+        self.assertEqual(len(rows), 1500)
+        self.assertEqual(rows[1], {'Plot': 2, 'Variety': None, 'Yield': None})
+        
+        directory = self.excel_file.file.path + STORE_SUFFIX
+        schema = get_store_schema(self.excel_file)
+        self.assertEqual(schema['row_count'], 1500)
+        self.assertEqual([entry['storage'] for entry in schema['columns']], ['npy', 'json', 'npy'])
+        self.assertTrue(os.path.exists(os.path.join(directory, 'col_0.npy')))
+        
+        with mock.patch('file_uploader.excel_utils.load_workbook', side_effect=AssertionError('parsed again')):
+            preview = self.client.get(reverse('excelfile-preview', args=[self.excel_file.id]))
+            data = self.client.get(reverse('processed_data_by_file'), {'file_id': self.excel_file.id})
+            page = read_store(self.excel_file, columns=['Yield'], offset=1497)
+        self.assertEqual(preview.data['preview'][0], {'Plot': 1, 'Variety': 'IR64', 'Yield': 4.5})
+        self.assertEqual(len(data.data), PROCESSED_DATA_MAX_ROWS)
+        self.assertEqual(data.data[2], {'Plot': 3, 'Variety': 'Jasmine', 'Yield': 3.25})
+        self.assertEqual(list(page.index), [1497, 1498, 1499])
+        self.assertEqual(page['Yield'].tolist()[0], 4.5)
+    
+    def test_process_skips_store_and_delete_removes_it(self):
+        """Test processing leaves the full parse to readers and deleting the upload discards the store."""
+        directory = self.excel_file.file.path + STORE_SUFFIX
+        with mock.patch('file_uploader.columnar_store.build_store', side_effect=AssertionError('parsed in full')):
+            response = self.client.post(reverse('process_file', args=[self.excel_file.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(get_store_schema(self.excel_file))
+        
+        self.assertEqual(len(read_store(self.excel_file)), 1500)
+        self.assertTrue(os.path.exists(directory))
+        
+        self.client.delete(reverse('excelfile-detail', args=[self.excel_file.id]))
+        self.assertFalse(ExcelFile.objects.filter(id=self.excel_file.id).exists())
+        self.assertFalse(os.path.exists(directory))
+    
+    def test_replaced_file_gets_a_new_store(self):
+        """Test a store is not reused once the upload changes."""
+        build_store(self.excel_file)
+        old_directory = self.excel_file.file.path + STORE_SUFFIX
+        
+        response = self.client.patch(reverse('excelfile-detail', args=[self.excel_file.id]), {
+            'file': SimpleUploadedFile('trial.csv', b'Name,Age\nBob,40\nAnn,22\n', content_type='text/csv')
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(os.path.exists(old_directory))
+        
+        excel_file = ExcelFile.objects.get(id=self.excel_file.id)
+        self.assertIsNone(get_store_schema(excel_file))
+        self.assertEqual(read_store(excel_file)['Name'].tolist(), ['Bob', 'Ann'])
+        
+        with open(excel_file.file.path, 'ab') as f:
+            f.write(b'Cat,3\n')
+        self.assertIsNone(get_store_schema(excel_file))
+        self.assertEqual(read_store(excel_file)['Name'].tolist(), ['Bob', 'Ann', 'Cat'])
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class FileFormatTest(TestCase):
+    """Test case for content-based format detection."""
+    
+    def setUp(self):
+        """Set up test environment."""
+        self.client = APIClient()
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        workbook = BytesIO()
+        pd.DataFrame({'Name': ['John', 'Jane'], 'Age': [30, 25]}).to_excel(workbook, index=False)
+        self.workbook = workbook.getvalue()
+    
+    def _write(self, content):
+        path = os.path.join(tempfile.mkdtemp(), 'upload.bin')
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+    
+    def test_detect_format_from_content(self):
+        """Test formats come from signatures and text sniffing, not names."""
+        self.assertEqual(detect_format(self._write(self.workbook)), 'xlsx')
+        self.assertEqual(detect_format(self._write(b'Name,Age\nJohn,30\n')), 'csv')
+        self.assertEqual(detect_format(self._write(OLE2_SIGNATURE + b'\x00' * 504)), 'xls')
+        with self.assertRaises(UnsupportedFormatError):
+            detect_format(self._write(b'PK\x03\x04not really a zip'))
+        with self.assertRaises(UnsupportedFormatError):
+            detect_format(self._write(b''))
+    
+    def test_misnamed_workbook_is_read_once_with_its_engine(self):
+        """Test a workbook named .csv is processed with openpyxl only and the format is stored."""
+        response = self.client.post(reverse('excelfile-list'), {
+            'title': 'Misnamed',
+            'file': SimpleUploadedFile('trial.csv', self.workbook)
+        }, format='multipart')
+        excel_file = ExcelFile.objects.get(id=response.data['id'])
+        self.assertEqual(excel_file.file_format, 'xlsx')
+        
+        with mock.patch('file_uploader.excel_utils.pd.read_excel') as read_excel, \
+                mock.patch('file_uploader.excel_utils.pd.read_csv') as read_csv, \
+                mock.patch('file_uploader.views.detect_format') as detect:
+            response = self.client.post(reverse('process_file', args=[excel_file.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        read_excel.assert_not_called()
+        read_csv.assert_not_called()
+        detect.assert_not_called()
+        
+        excel_file.refresh_from_db()
+        self.assertTrue(excel_file.processed)
+        
+        bad = self.client.post(reverse('excelfile-list'), {
+            'title': 'Binary',
+            'file': SimpleUploadedFile('trial.xlsx', b'\x00\x01\x02\x03' * 64)
+        }, format='multipart')
+        response = self.client.post(reverse('process_file', args=[bad.data['id']]))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Unsupported file format', response.data['error'])
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class FileSummaryTest(TestCase):
+    """Test case for the validate-only process step."""
+    
+    def setUp(self):
+        """Set up test environment."""
+        self.client = APIClient()
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword'
+        )
+        self.client.force_authenticate(user=self.user)
+    
+    def _process(self, name, content):
+        response = self.client.post(reverse('excelfile-list'), {
+            'title': name,
+            'file': SimpleUploadedFile(name, content)
+        }, format='multipart')
+        with mock.patch('file_uploader.excel_utils.iter_excel_chunks') as iter_chunks:
+            response = self.client.post(reverse('process_file', args=[response.data['id']]))
+        # Only the five-row preview may stream the workbook.
+        for call in iter_chunks.call_args_list:
+            self.assertIsNotNone(call.kwargs['max_rows'])
+        return response
+    
+    def test_workbook_metadata_comes_from_dimension_and_header(self):
+        """Test a workbook is validated from its dimension and first rows only."""
+        workbook = BytesIO()
+        with pd.ExcelWriter(workbook) as writer:
+            pd.DataFrame({'Plot': range(3000), 'Yield': [1.5] * 3000}).to_excel(writer, sheet_name='Trial', index=False)
+            pd.DataFrame({'Note': ['x']}).to_excel(writer, sheet_name='Notes', index=False)
+        
+        response = self._process('trial.xlsx', workbook.getvalue())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        metadata = response.data['metadata']
+        self.assertEqual(metadata['sheet_names'], ['Trial', 'Notes'])
+        self.assertEqual(metadata['columns'], ['Plot', 'Yield'])
+        self.assertEqual(metadata['column_count'], 2)
+        self.assertEqual(metadata['row_count'], 3000)
+        self.assertFalse(metadata['row_count_exact'])
+        self.assertEqual(metadata['sampled_rows'], SUMMARY_SAMPLE_ROWS)
+        
+        excel_file = ExcelFile.objects.get(title='trial.xlsx')
+        self.assertTrue(excel_file.processed)
+        self.assertEqual(excel_file.metadata, metadata)
+    
+    def test_csv_rows_are_counted_or_estimated(self):
+        """Test small CSVs are counted exactly and large ones estimated from the first chunk."""
+        response = self._process('small.csv', b'Name,Age\nJohn,30\nJane,25\n')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['metadata']['row_count'], 2)
+        self.assertTrue(response.data['metadata']['row_count_exact'])
+        
+        rows = ''.join(f'{i},sample-{i:06d},{i * 0.5}\n' for i in range(20000))
+        response = self._process('large.csv', f'id,sample,value\n{rows}'.encode())
+        metadata = response.data['metadata']
+        self.assertEqual(metadata['columns'], ['id', 'sample', 'value'])
+        self.assertFalse(metadata['row_count_exact'])
+        self.assertAlmostEqual(metadata['row_count'], 20000, delta=2000)
+        
+        response = self._process('header.csv', b'Name,Age\n')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], 'File contains no data')
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), TABLE_CACHE_DIR=tempfile.mkdtemp())
+class CsvProcessTest(TestCase):
+    """Test case for merging CSV rows into crop image metadata."""
+    
+    def setUp(self):
+        """Set up test environment."""
+        self.client = APIClient()
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        self.images = [
+            CropImage.objects.create(image='crop_images/a.jpg', sample_id=sample_id, uploaded_by=self.user)
+            for sample_id in ('S1', 'S1', 'S2')
+        ]
+        ImageMetadata.objects.create(image=self.images[0], label='Color', value='Green')
+        
+        content = b'sample_id,Color,Weight\nS1,Red,1.50\nS2,Green,\nS3,Red,2\n,Red,3\nS1,Blue,\n'
+        self.csv_file = CsvFile.objects.create(
+            name='samples.csv',
+            file=SimpleUploadedFile('samples.csv', content, content_type='text/csv'),
+            uploaded_by=self.user
+        )
+    
+    def test_process_merges_metadata_in_bulk(self):
+        """Test counts match per-row upserts while the query count stays flat."""
+        url = reverse('csvfile-process', args=[self.csv_file.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 4)
+        self.assertEqual(response.data['updated'], 6)
+        self.assertEqual(response.data['rows_processed'], 4)
+        self.assertLess(len(queries), 20)
+        
+        values = {
+            (meta.image_id, meta.label): meta.value for meta in ImageMetadata.objects.all()
+        }
+        first, second, third = self.images
+        self.assertEqual(values, {
+            (first.id, 'Color'): 'Blue', (first.id, 'Weight'): '1.5',
+            (second.id, 'Color'): 'Blue', (second.id, 'Weight'): '1.5',
+            (third.id, 'Color'): 'Green',
+        })
+        self.assertEqual(CropImage.objects.filter(csv_file=self.csv_file).count(), 3)
+        
+        again = self.client.post(url)
+        self.assertEqual((again.data['created'], again.data['updated']), (0, 7))
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), TABLE_CACHE_DIR=tempfile.mkdtemp())
+class TableCacheTest(TestCase):
+    """Test case for the parsed CSV table cache."""
+    
+    def setUp(self):
+        """Set up test environment."""
+        self.client = APIClient()
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword'
+        )
+        self.client.force_authenticate(user=self.user)
+    
+    def test_upload_profile_and_cached_reads(self):
+        """Test the upload profile is persisted and later reads skip full parses."""
+        content = b'sample_id;Weight;Color;Picked\nS1;1.5;Red;True\n\nS2;;"Green\nish";False\nS3;2.25;;True\n'
+        response = self.client.post(reverse('csvfile-list'), {
+            'name': 'samples.csv',
+            'file': SimpleUploadedFile('samples.csv', content, content_type='text/csv')
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        csv_file = CsvFile.objects.get(id=response.data['id'])
+        
+        self.assertEqual(csv_file.data_hash, hashlib.sha256(content).hexdigest())
+        self.assertEqual(csv_file.columns, ['sample_id', 'Weight', 'Color', 'Picked'])
+        self.assertEqual(csv_file.row_count, 3)
+        self.assertEqual(csv_file.profile['delimiter'], ';')
+        column_types = {'sample_id': 'text', 'Weight': 'numeric', 'Color': 'text', 'Picked': 'numeric'}
+        self.assertEqual(csv_file.column_types, column_types)
+        
+        with mock.patch('file_uploader.table_cache.pd.read_csv', wraps=pd.read_csv) as read_csv:
+            preview = self.client.get(reverse('csvfile-preview', args=[csv_file.id]))
+        self.assertEqual(preview.status_code, status.HTTP_200_OK)
+        self.assertEqual(preview.data['total_rows'], 3)
+        self.assertEqual(preview.data['column_types'], column_types)
+        self.assertEqual(preview.data['preview'][1]['Color'], 'Green\nish')
+        self.assertEqual(read_csv.call_args.kwargs['nrows'], 5)
+        
+        with mock.patch('file_uploader.views.profile_csv') as profile_csv:
+            process = self.client.post(reverse('csvfile-process', args=[csv_file.id]))
+        self.assertEqual(process.status_code, status.HTTP_200_OK)
+        self.assertFalse(process.data['is_update'])
+        profile_csv.assert_not_called()
+        
+        with mock.patch('file_uploader.table_cache.pd.read_csv', side_effect=AssertionError('parsed again')):
+            cached = read_csv_cached(csv_file.file.path, csv_file.data_hash)
+        pd.testing.assert_frame_equal(cached, pd.read_csv(csv_file.file.path, sep=';'))
+    
+    def test_csv_data_projection_and_pages(self):
+        """Test column projection, offset/limit and the column-oriented shape."""
+        content = b'sample_id,Weight,Color\nS1,1.5,Red\nS2,,Green\nS3,2.25,Blue\n'
+        response = self.client.post(reverse('csvfile-list'), {
+            'name': 'samples.csv',
+            'file': SimpleUploadedFile('samples.csv', content, content_type='text/csv')
+        }, format='multipart')
+        csv_file = CsvFile.objects.get(id=response.data['id'])
+        csv_file.processed = True
+        csv_file.save()
+        
+        params = {'file_id': csv_file.id, 'columns[]': ['Weight', 'Missing'], 'offset': 1, 'limit': 2, 'orient': 'columns'}
+        expected = {'Weight': [None, 2.25], 'sample_id': ['S2', 'S3']}
+        
+        response = self.client.get(reverse('csv_data'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data'], expected)
+        self.assertEqual(response.data['total_rows'], 3)
+        self.assertEqual(response.data['column_types'], {'Weight': 'numeric', 'sample_id': 'text'})
+        
+        # Let any background fill finish before dropping the entry.
+        fill_table_cache(csv_file.file.path, csv_file.data_hash).result()
+        discard_table(csv_file.data_hash)
+        with mock.patch('file_uploader.table_cache.pd.read_csv', wraps=pd.read_csv) as read_csv:
+            response = self.client.get(reverse('csv_data'), params)
+            fill_table_cache(csv_file.file.path, csv_file.data_hash).result()
+        self.assertEqual(response.data['data'], expected)
+        page_read, fill_read = read_csv.call_args_list
+        self.assertEqual(page_read.kwargs['usecols'], ['Weight', 'sample_id'])
+        self.assertEqual(page_read.kwargs['dtype'], {'sample_id': str})
+        self.assertNotIn('usecols', fill_read.kwargs)
+        
+        # The miss filled the cache in the background, so the next page is not parsed again.
+        with mock.patch('file_uploader.table_cache.pd.read_csv', side_effect=AssertionError('parsed again')):
+            response = self.client.get(reverse('csv_data'), params)
+        self.assertEqual(response.data['data'], expected)
+        
+        records = self.client.get(reverse('csv_data'), {'file_id': csv_file.id, 'limit': 1})
+        self.assertEqual(records.data['rows'], [{'sample_id': 'S1', 'Weight': 1.5, 'Color': 'Red'}])
+        
+        bad = self.client.get(reverse('csv_data'), {'file_id': csv_file.id, 'limit': 0})
+        self.assertEqual(bad.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_shared_entries_and_eviction(self):
+        """Test identical uploads share one entry and old entries are evicted."""
+        paths = [os.path.join(tempfile.mkdtemp(), 'data.csv') for _ in range(2)]
+        for path in paths:
+            with open(path, 'w') as f:
+                f.write('a,b\n1,x\n2,y\n')
+        self.assertEqual(list(read_csv_cached(paths[0], 'hash-1')['a']), [1, 2])
+        
+        # A second upload of the same content, written later, reuses the entry.
+        os.utime(paths[1], (2 ** 31, 2 ** 31))
+        with mock.patch('file_uploader.table_cache.pd.read_csv', side_effect=AssertionError('parsed again')):
+            self.assertEqual(list(read_csv_cached(paths[1], 'hash-1')['a']), [1, 2])
+            self.assertEqual(list(read_csv_cached(paths[0], 'hash-1')['a']), [1, 2])
+        self.assertIsNotNone(get_cached_schema('hash-1'))
+        
+        os.utime(os.path.join(settings.TABLE_CACHE_DIR, 'hash-1'), (1, 1))
+        read_csv_cached(path, 'hash-2')
+        evict_tables(max_bytes=1)
+        self.assertEqual(os.listdir(settings.TABLE_CACHE_DIR), [])
+        
+        read_csv_cached(path, 'hash-3')
+        os.utime(os.path.join(settings.TABLE_CACHE_DIR, 'hash-3'), (1, 1))
+        read_csv_cached(path, 'hash-4')
+        size = sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, files in os.walk(os.path.join(settings.TABLE_CACHE_DIR, 'hash-4')) for name in files)
+        evict_tables(max_bytes=size)
+        self.assertEqual(os.listdir(settings.TABLE_CACHE_DIR), ['hash-4'])
+
+class GeneticSchemaTest(TestCase):
+    """Test case for the column-to-field mapping engine."""
+    
+    def test_map_genetic_records(self):
+        """Test whole-column casting and bulk cast error reporting."""
+        from .genetic_schema import map_genetic_records
+        
+        df = pd.DataFrame({
+            'No.': [1, 2, 'x'],
+            'F5 Code': ['A1', 'A2', 'A3'],
+            'Fruit Weight (Kg)': ['1.5', 'heavy', None],
+            'Seeds Quantity': [10, 12.0, None],
+            'Polli.Date(2024)': ['2024-01-02', None, '2024-02-01']
+        })
+        
+        records, errors = map_genetic_records(df)
+        
+        # Row 'x' has no usable record number and is dropped
+        self.assertEqual([index for index, _ in records], [0, 1])
+        self.assertEqual(records[0][1]['fruit_weight'], 1.5)
+        self.assertEqual(records[0][1]['seeds_quantity'], 10)
+        self.assertEqual(str(records[0][1]['pollination_date']), '2024-01-02')
+        self.assertNotIn('fruit_weight', records[1][1])
+        
+        failed = {(error['row'], error['field']) for error in errors}
+        self.assertEqual(failed, {(2, 'record_number'), (1, 'fruit_weight')})
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), GENETIC_INGEST_BATCH_SIZE=2)
+class GeneticDataUploadTest(TestCase):
+    """Test case for genetic data upload functionality."""
+    
+    def setUp(self):
+        """Set up test environment."""
+        self.client = APIClient()
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        self.csv_content = (
+            'No.,F5 Code,F6 Full Name,Fruit Weight (Kg),Seeds Quantity\n'
+            '1,A1,Melon A,1.5,10\n'
+            '2,A2,Melon B,2.1,12\n'
+            '3,A3,Melon C,heavy,9\n'
+            '4,A4,Melon D,1.8,\n'
+            '5,A5,Melon E,2.4,7\n'
+        ).encode()
+    
+    def _upload(self):
+        upload = SimpleUploadedFile('trial.csv', self.csv_content, content_type='text/csv')
+        return self.client.post(reverse('genetic-data-upload'), {'file': upload}, format='multipart')
+    
+    def _job_status(self, job_id):
+        return self.client.get(reverse('genetic-ingest-job-detail', args=[job_id]))
+    
+    def test_upload_is_queued(self):
+        """Test the upload returns immediately with a queued job."""
+        response = self._upload()
+        
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(GeneticRecord.objects.count(), 0)
+        
+        job_response = self._job_status(response.data['job_id'])
+        self.assertEqual(job_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(job_response.data['status'], GeneticIngestJob.STATUS_QUEUED)
+    
+    def test_batched_ingest_job(self):
+        """Test the worker writes records in batches and reports progress."""
+        response = self._upload()
+        call_command('run_genetic_ingest_worker', once=True, workers=1, stdout=StringIO())
+        
+        job = self._job_status(response.data['job_id']).data
+        self.assertEqual(job['status'], GeneticIngestJob.STATUS_COMPLETED)
+        self.assertEqual(job['rows_total'], 5)
+        self.assertEqual(job['rows_processed'], 5)
+        self.assertEqual(job['rows_failed'], 1)
+        self.assertEqual(job['errors'][0]['field'], 'fruit_weight')
+        
+        genetic_data = GeneticData.objects.get(id=response.data['id'])
+        self.assertTrue(genetic_data.processed)
+        self.assertEqual(genetic_data.records_written, 5)
+        self.assertEqual(genetic_data.records.count(), 5)
+        self.assertIsNone(genetic_data.records.get(record_number=3).fruit_weight)
+    
+    @override_settings(GENETIC_INGEST_LEASE_SECONDS=60)
+    def test_crashed_worker_job_is_claimed_again(self):
+        """Test a running job whose heartbeat stopped is re-run by another worker."""
+        response = self._upload()
+        now = timezone.now()
+        crashed = claim_next_job(now=now)
+        
+        self.assertIsNone(claim_next_job(now=now + timedelta(seconds=59)))
+        job = claim_next_job(now=now + timedelta(seconds=61))
+        self.assertEqual(job.pk, crashed.pk)
+        self.assertNotEqual(job.claim_token, crashed.claim_token)
+        
+        run_ingest_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, GeneticIngestJob.STATUS_COMPLETED)
+        self.assertEqual(GeneticRecord.objects.count(), 5)
+        
+        # A worker that wakes up after losing its lease leaves the data alone.
+        run_ingest_job(crashed)
+        self.assertEqual(GeneticIngestJob.objects.get(pk=job.pk).status, GeneticIngestJob.STATUS_COMPLETED)
+        self.assertEqual(GeneticData.objects.get(id=response.data['id']).records.count(), 5)
+    
+    def test_streaming_download_with_range(self):
+        """Test encrypted downloads stream and honour Range requests."""
+        response = self._upload()
+        url = reverse('secure-file-download', args=[response.data['id']])
+        size = len(self.csv_content)
+        
+        full = self.client.get(url)
+        self.assertEqual(full.status_code, status.HTTP_200_OK)
+        self.assertTrue(full.streaming)
+        self.assertEqual(full['Content-Length'], str(size))
+        self.assertEqual(b''.join(full.streaming_content), self.csv_content)
+        
+        partial = self.client.get(url, HTTP_RANGE='bytes=10-29')
+        self.assertEqual(partial.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(partial['Content-Range'], f'bytes 10-29/{size}')
+        self.assertEqual(b''.join(partial.streaming_content), self.csv_content[10:30])
+        
+        suffix = self.client.get(url, HTTP_RANGE='bytes=-7')
+        self.assertEqual(b''.join(suffix.streaming_content), self.csv_content[-7:])
+        
+        unsatisfiable = self.client.get(url, HTTP_RANGE=f'bytes={size}-')
+        self.assertEqual(unsatisfiable.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), GENETIC_INGEST_BATCH_SIZE=2)
+class GeneticIngestRollbackTest(TransactionTestCase):
+    """Test case for ingest failures, with every write really committed."""
+    
+    def _upload(self):
+        user = User.objects.create_user(username='testuser', password='testpassword')
+        client = APIClient()
+        client.force_authenticate(user=user)
+        upload = SimpleUploadedFile('trial.csv', b'No.,F5 Code\n1,A1\n2,A2\n3,A3\n4,A4\n5,A5\n', content_type='text/csv')
+        return client.post(reverse('genetic-data-upload'), {'file': upload}, format='multipart').data
+    
+    def test_failed_batch_rolls_back(self):
+        """Test a failure part-way through rolls the records back before the dataset is discarded."""
+        job_id = self._upload()['job_id']
+        original_bulk_create = GeneticRecord.objects.bulk_create
+        original_delete = GeneticData.delete
+        calls = []
+        records_at_cleanup = []
+        
+        def failing_bulk_create(records, **kwargs):
+            calls.append(len(records))
+            if len(calls) == 2:
+                raise RuntimeError('database went away')
+            return original_bulk_create(records, **kwargs)
+        
+        def observed_delete(genetic_data, *args, **kwargs):
+            records_at_cleanup.append(GeneticRecord.objects.count())
+            return original_delete(genetic_data, *args, **kwargs)
+        
+        with mock.patch.object(GeneticRecord.objects, 'bulk_create', side_effect=failing_bulk_create), \
+                mock.patch.object(GeneticData, 'delete', observed_delete):
+            run_ingest_job(claim_next_job())
+        
+        job = GeneticIngestJob.objects.get(id=job_id)
+        self.assertEqual(job.status, GeneticIngestJob.STATUS_FAILED)
+        self.assertIn('database went away', job.error_message)
+        self.assertEqual(records_at_cleanup, [0])
+        self.assertEqual(GeneticData.objects.count(), 0)
+    
+    def test_failed_write_commits_no_records(self):
+        """Test records written before a failure are never committed."""
+        genetic_data = GeneticData.objects.get(id=self._upload()['id'])
+        mapped = [(row, {'record_number': row + 1, 'f5_code': f'A{row + 1}'}) for row in range(5)]
+        
+        def failing_progress(count):
+            if count == 4:
+                raise RuntimeError('lease lost')
+        
+        with self.assertRaises(RuntimeError):
+            write_genetic_records(genetic_data, mapped, progress_callback=failing_progress)
+        
+        self.assertEqual(GeneticRecord.objects.count(), 0)
+        self.assertEqual(GeneticData.objects.get(id=genetic_data.id).records_written, 0)
+
+class GeneticRecordsDetailTest(TestCase):
+    """Test case for paginated genetic record reads."""
+    
+    def setUp(self):
+        """Set up test environment."""
+        self.client = APIClient()
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        self.genetic_data = GeneticData.objects.create(uploaded_by=self.user, file_type='csv')
+        weights = [2.5, None, 1.0, 3.0, 2.5, None, 0.5]
+        GeneticRecord.objects.bulk_create([
+            GeneticRecord(genetic_data=self.genetic_data, record_number=i + 1, f5_code=f'A{i + 1}', fruit_weight=weight)
+            for i, weight in enumerate(weights)
+        ])
+        self.url = reverse('genetic-records-detail', args=[self.genetic_data.id])
+    
+    def _collect(self, params):
+        results = []
+        cursor = None
+        while True:
+            query = dict(params, **({'cursor': cursor} if cursor else {}))
+            response = self.client.get(self.url, query)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            results.extend(response.data['results'])
+            cursor = response.data['next_cursor']
+            if not cursor:
+                return results
+    
+    def test_keyset_pagination(self):
+        """Test pages follow record_number and cover every record once."""
+        records = self._collect({'limit': 3})
+        self.assertEqual([r['record_number'] for r in records], [1, 2, 3, 4, 5, 6, 7])
+        self.assertIn('image', records[0])
+    
+    def test_ordering_projection_and_filters(self):
+        """Test trait ordering with nulls last, field projection and range filters."""
+        records = self._collect({'limit': 2, 'ordering': '-fruit_weight', 'fields': 'record_number,fruit_weight'})
+        self.assertEqual([r['record_number'] for r in records], [4, 1, 5, 3, 7, 2, 6])
+        self.assertEqual(set(records[0]), {'id', 'record_number', 'fruit_weight'})
+        
+        filtered = self._collect({'fruit_weight_min': '1', 'fruit_weight_max': '2.5', 'fields': 'record_number'})
+        self.assertEqual([r['record_number'] for r in filtered], [1, 3, 5])
+        
+        response = self.client.get(self.url, {'seeds_quantity_min': '3'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        response = self.client.get(self.url, {'fields': 'password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class QueryPlanTest(TestCase):
+    """Test that the hot lookups in views.py are served by an index."""
+    
+    FULL_SCAN_PATTERNS = {
+        # SQLite reports index lookups as SEARCH; SCAN walks a whole table or index.
+        'sqlite': re.compile(r'\bSCAN (?!CONSTANT ROW)(\S+)'),
+        'postgresql': re.compile(r'Seq Scan on (\S+)'),
+    }
+    
+    def setUp(self):
+        """Set up test environment."""
+        if connection.vendor not in self.FULL_SCAN_PATTERNS:
+            self.skipTest(f'No query plan check for {connection.vendor}')
+        if connection.vendor == 'postgresql':
+            # Tiny test tables make a sequential scan cheapest; only allow it
+            # when no index applies.
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.genetic_data = GeneticData.objects.create(uploaded_by=self.user, file_type='csv')
+        self.image = CropImage.objects.create(
+            image='crop_images/test.jpg', sample_id='S1', uploaded_by=self.user
+        )
+    
+    def hot_queries(self):
+        user, genetic_data = self.user, self.genetic_data
+        records = GeneticRecord.objects.filter(genetic_data=genetic_data)
+        return {
+            'excel files by user': ExcelFile.objects.filter(uploaded_by=user).order_by('-uploaded_at'),
+            'csv files by user': CsvFile.objects.filter(uploaded_by=user).order_by('-uploaded_at'),
+            'crop images by user': CropImage.objects.filter(uploaded_by=user).order_by('-uploaded_at'),
+            'crop images by sample': CropImage.objects.filter(sample_id='S1', uploaded_by=user),
+            'image metadata by label': ImageMetadata.objects.filter(image=self.image, label='Color'),
+            'metadata labels': ImageMetadata.objects.filter(
+                image__uploaded_by=user
+            ).values_list('label', flat=True).distinct(),
+            'genetic data by user': GeneticData.objects.filter(uploaded_by=user).order_by('-uploaded_at'),
+            'genetic data by id': GeneticData.objects.filter(id=genetic_data.id, uploaded_by=user),
+            'records by number': records.filter(record_number__gt=10).order_by('record_number', 'id'),
+            'records by weight': records.filter(
+                fruit_weight__gte=1.0
+            ).order_by(F('fruit_weight').desc(nulls_last=True), 'id'),
+            'records by brix': records.order_by(F('brix_content').asc(nulls_last=True), 'id'),
+            'records by length range': records.filter(
+                fruit_length__gte=10.0, fruit_length__lte=20.0
+            ).order_by('record_number', 'id'),
+            'records by user': GeneticRecord.objects.filter(genetic_data__uploaded_by=user),
+            'queued ingest jobs': GeneticIngestJob.objects.filter(
+                status=GeneticIngestJob.STATUS_QUEUED
+            ).order_by('created_at', 'id'),
+        }
+    
+    def test_hot_queries_use_indexes(self):
+        """Test no hot query falls back to a full table scan."""
+        pattern = self.FULL_SCAN_PATTERNS[connection.vendor]
+        for name, queryset in self.hot_queries().items():
+            with self.subTest(query=name):
+                plan = queryset.explain()
+                scans = [line for line in plan.splitlines() if pattern.search(line)]
+                self.assertEqual(scans, [], f'{name} scans a whole table:\n{plan}')
+
+class EncryptionManagerTest(TestCase):
+    """Test case for the encryption helpers."""
+    
+    def test_encrypt_json_many_round_trip(self):
+        """Test batch encryption in both token formats and with a pool."""
+        from .encryption_utils import encryption_manager
+        
+        payloads = [{'f5_code': f'A{i}', 'weight': i * 0.5} for i in range(6)] + [None]
+        
+        compact = encryption_manager.encrypt_json_many(payloads, max_workers=3)
+        legacy = encryption_manager.encrypt_json_many(payloads, compact=False)
+        
+        self.assertTrue(compact[0].startswith('gAAAAA'))
+        self.assertIsNone(compact[-1])
+        self.assertEqual(encryption_manager.decrypt_json_many(compact, max_workers=3), payloads)
+        self.assertEqual(encryption_manager.decrypt_json_many(legacy), payloads)
+        
+        # Values written by the single-value API keep decoding too
+        self.assertEqual(encryption_manager.decrypt_json(encryption_manager.encrypt_json(payloads[0])), payloads[0])
+        self.assertEqual(encryption_manager.decrypt_json(compact[1]), payloads[1])
+    
+    def test_key_is_derived_lazily(self):
+        """Test construction is free and a configured key skips PBKDF2."""
+        from cryptography.fernet import Fernet
+        from .encryption_utils import EncryptionManager
+        
+        with mock.patch('file_uploader.encryption_utils.derive_key') as derive:
+            manager = EncryptionManager()
+            derive.assert_not_called()
+            
+            key = Fernet.generate_key()
+            with override_settings(ENCRYPTION_KEY=key.decode()):
+                token = manager.encrypt_text('secret')
+            derive.assert_not_called()
+        
+        self.assertEqual(manager.key, key)
+        self.assertEqual(EncryptionManager(key=key).decrypt_text(token), 'secret')
+    
+    def test_stream_encryption_round_trip(self):
+        """Test the segmented file format, legacy files and tamper detection."""
+        from .encryption_utils import encryption_manager, StreamDecryptionError
+        
+        content = os.urandom(10000)
+        for chunk_size in (1000, 4096, 10000, 20000):
+            upload_chunks = [content[i:i + 777] for i in range(0, len(content), 777)]
+            encrypted = b''.join(encryption_manager.encrypt_stream(upload_chunks, chunk_size=chunk_size))
+            self.assertEqual(b''.join(encryption_manager.decrypt_stream(BytesIO(encrypted))), content)
+        
+        empty = b''.join(encryption_manager.encrypt_stream([], chunk_size=1000))
+        self.assertEqual(b''.join(encryption_manager.decrypt_stream(BytesIO(empty))), b'')
+        
+        legacy = encryption_manager.encrypt_file(content)
+        self.assertEqual(b''.join(encryption_manager.decrypt_stream(BytesIO(legacy))), content)
+        
+        encrypted = b''.join(encryption_manager.encrypt_stream([content], chunk_size=1000))
+        segment = 4 + 1000 + 16
+        with self.assertRaises(StreamDecryptionError):
+            list(encryption_manager.decrypt_stream(BytesIO(encrypted[:16 + 5 * segment])))
+        
+        for start, end in ((0, 9999), (999, 1000), (2500, 7321), (9990, 9999)):
+            piece = b''.join(encryption_manager.decrypt_range(BytesIO(encrypted), start, end))
+            self.assertEqual(piece, content[start:end + 1])
+
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ExcelFileViewSet, CropImageViewSet, CsvFileViewSet, ProcessFileView, ExcelFileDetailView, GeneticDataUploadView, GeneticDataPreviewView, GeneticImageMatchView, GeneticDataListView, GeneticRecordsDetailView, GeneticDataDeleteView, SecureFileDownloadView, EncryptionStatusView
+from .views import ExcelFileViewSet, CropImageViewSet, CsvFileViewSet, ProcessFileView, ExcelFileDetailView, GeneticDataUploadView, GeneticDataPreviewView, GeneticImageMatchView, GeneticDataListView, GeneticRecordsDetailView, GeneticDataDeleteView, SecureFileDownloadView, EncryptionStatusView, GeneticIngestJobDetailView
 
 router = DefaultRouter()
 router.register(r'excel-files', ExcelFileViewSet)
@@ -14,6 +14,7 @@ urlpatterns = [
     path('genetic-data/', GeneticDataListView.as_view(), name='genetic-data-list'),
     path('genetic-data/preview/', GeneticDataPreviewView.as_view(), name='genetic-data-preview'),
     path('genetic-data/upload/', GeneticDataUploadView.as_view(), name='genetic-data-upload'),
+    path('genetic-data/jobs/<int:job_id>/', GeneticIngestJobDetailView.as_view(), name='genetic-ingest-job-detail'),
     path('genetic-data/<int:genetic_data_id>/records/', GeneticRecordsDetailView.as_view(), name='genetic-records-detail'),
     path('genetic-data/<int:genetic_data_id>/', GeneticDataDeleteView.as_view(), name='genetic-data-delete'),
     path('genetic-data/<int:genetic_data_id>/download/', SecureFileDownloadView.as_view(), name='secure-file-download'),
@@ -1,21 +1,35 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from .models import ExcelFile, CropImage, ImageMetadata, CsvFile, GeneticData, GeneticRecord
+from .models import ExcelFile, CropImage, ImageMetadata, CsvFile, GeneticData, GeneticRecord, GeneticIngestJob
 from .serializers import ExcelFileSerializer, CropImageSerializer, ImageMetadataSerializer, CsvFileSerializer
-from .excel_utils import process_excel_file
-from .encryption_utils import encryption_manager
+from .file_summary import summarize_excel_file
+from .columnar_store import discard_store, read_head
+from .file_formats import UnsupportedFormatError, detect_format
+from .encryption_utils import encryption_manager, is_stream_encrypted, read_stream_header, stream_plaintext_size, STREAM_HEADER
+from .genetic_schema import missing_required_columns
+from .metadata_merge import merge_csv_metadata
+from .processed_cache import file_sha256, get_processed_data, set_processed_data
+from .csv_profile import apply_profile, get_delimiter, profile_csv, profile_is_current
+from kafka_producer.outbox import enqueue_event
+from .table_cache import column_type, discard_table, infer_column_types, read_csv_cached, read_csv_page, read_csv_preview
 import pandas as pd
+import base64
 import json
 import os
 from django.conf import settings
 from django.contrib.auth.models import User
 from rest_framework.views import APIView
 import numpy as np
-from django.core.files.base import ContentFile
+from django.core.files.base import File
+from django.db import transaction
+from django.db.models import F, Q
 import tempfile
+import logging
+
+logger = logging.getLogger(__name__)
 
 class ExcelFileViewSet(viewsets.ModelViewSet):
     queryset = ExcelFile.objects.all().order_by('-uploaded_at')
@@ -23,7 +37,33 @@ class ExcelFileViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     def perform_create(self, serializer):
-        serializer.save(uploaded_by=self.request.user)
+        with transaction.atomic():
+            instance = serializer.save(uploaded_by=self.request.user)
+            self._store_file_details(instance)
+            enqueue_event('excel_file.uploaded', f'excel_file:{instance.id}', {
+                'file_id': instance.id,
+                'title': instance.title,
+                'uploaded_by': instance.uploaded_by_id,
+                'data_hash': instance.data_hash,
+                'file_format': instance.file_format,
+            })
+    
+    def perform_update(self, serializer):
+        old_path = serializer.instance.file.path if serializer.instance.file else None
+        instance = serializer.save()
+        if 'file' in serializer.validated_data:
+            if old_path:
+                discard_store(old_path)
+            self._store_file_details(instance)
+    
+    def _store_file_details(self, excel_file):
+        excel_file.data_hash = file_sha256(excel_file.file)
+        try:
+            excel_file.file_format = detect_format(excel_file.file.path)
+        except UnsupportedFormatError:
+            excel_file.file_format = None
+        excel_file.metadata = {}
+        excel_file.save(update_fields=['data_hash', 'file_format', 'metadata'])
     
     def get_queryset(self):
 
@@ -35,11 +75,17 @@ class ExcelFileViewSet(viewsets.ModelViewSet):
         
         try:
     
-            processed_data = process_excel_file(excel_file)
+            metadata = summarize_excel_file(excel_file)
+            if not metadata['sampled_rows']:
+                return Response({
+                    'error': 'File contains no data'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            preview = read_head(excel_file, 5)
             
             return Response({
                 'message': 'File processed successfully',
-                'preview': processed_data[:5] if len(processed_data) > 5 else processed_data
+                'preview': json.loads(preview.to_json(orient='records')),
+                'metadata': metadata
             })
         except Exception as e:
             return Response({
@@ -51,16 +97,8 @@ class ExcelFileViewSet(viewsets.ModelViewSet):
         excel_file = self.get_object()
         
         try:
-            file_path = excel_file.file.path
-            file_ext = os.path.splitext(file_path)[1].lower()
-            
-            if file_ext == '.csv':
-                df = pd.read_csv(file_path)
-            else:
-                df = pd.read_excel(file_path)
-            
-
-            preview_data = df.head(5).to_dict('records')
+            df = read_head(excel_file, 5)
+            preview_data = json.loads(df.to_json(orient='records'))
             
             return Response({
                 'preview': preview_data
@@ -111,64 +149,31 @@ class ProcessFileView(APIView):
                 }, status=status.HTTP_400_BAD_REQUEST)
                 
             file_path = excel_file.file.path
-            file_ext = os.path.splitext(file_path)[1].lower()
             
 
             try:
-
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        sample = f.read(1024)
-
-                        if ',' in sample and '\n' in sample:
-                            df = pd.read_csv(file_path)
-                            print(f"Successfully read as CSV: {file_path}")
-                            return_early = True
-                        else:
-                            return_early = False
-                except UnicodeDecodeError:
-
-                    return_early = False
+                # Only the header, the first rows and the declared size are
+                # read; consumers parse the data when they need it.
+                metadata = summarize_excel_file(excel_file)
                 
-                if not return_early:
 
-                    excel_engines = ['openpyxl', 'xlrd', None]  
-                    last_error = None
-                    
-                    for engine in excel_engines:
-                        try:
-                            engine_arg = {} if engine is None else {'engine': engine}
-                            df = pd.read_excel(file_path, **engine_arg)
-                            break
-                        except Exception as e:
-                            last_error = e
-                            continue
-                    else:
-
-                        try:
-                            df = pd.read_csv(file_path)
-                        except Exception:
-
-                            raise last_error
-                    
-
-                if df.empty:
+                if not metadata['sampled_rows']:
                     return Response({
                         'error': 'File contains no data'
                     }, status=status.HTTP_400_BAD_REQUEST)
-                    
-
-                excel_file.processed = True
-                excel_file.save()
                 
-
                 file_size = os.path.getsize(file_path)
                 
                 return Response({
                     'message': 'File processed successfully',
                     'file_id': excel_file.id,
-                    'file_size_in_bytes': file_size
+                    'file_size_in_bytes': file_size,
+                    'metadata': metadata
                 })
+            except UnsupportedFormatError as e:
+                return Response({
+                    'error': str(e)
+                }, status=status.HTTP_400_BAD_REQUEST)
             except pd.errors.EmptyDataError:
                 return Response({
                     'error': 'The file is empty or contains no data'
@@ -297,23 +302,12 @@ class CsvFileViewSet(viewsets.ModelViewSet):
         return CsvFile.objects.filter(uploaded_by=self.request.user).order_by('-uploaded_at')
     
     def _extract_columns(self, csv_file):
-        import hashlib
-        
         try:
-            file_path = csv_file.file.path
-
-            df = pd.read_csv(file_path)
-            
-
-            with open(file_path, 'rb') as f:
-                file_hash = hashlib.sha256(f.read()).hexdigest()
-            
-
-            csv_file.columns = list(df.columns)
-            csv_file.data_hash = file_hash
+            profile = profile_csv(csv_file.file.path)
+            apply_profile(csv_file, profile)
             csv_file.save()
             
-            return df
+            return profile
         except Exception as e:
 
             print(f"Error extracting columns: {str(e)}")
@@ -326,26 +320,23 @@ class CsvFileViewSet(viewsets.ModelViewSet):
         try:
             file_path = csv_file.file.path
 
-            df = pd.read_csv(file_path)
-            
-
-            preview_data = df.head(5).to_dict('records')
+            head, column_types, total_rows = read_csv_preview(
+                file_path,
+                csv_file.data_hash,
+                5,
+                sep=get_delimiter(csv_file),
+                column_types=csv_file.column_types,
+                row_count=csv_file.row_count
+            )
             
 
-            column_types = {}
-            for col in df.columns:
-                if pd.api.types.is_numeric_dtype(df[col]):
-                    column_types[col] = 'numeric'
-                elif pd.api.types.is_datetime64_dtype(df[col]):
-                    column_types[col] = 'datetime'
-                else:
-                    column_types[col] = 'text'
+            preview_data = head.replace({np.nan: None}).to_dict('records')
             
             return Response({
                 'preview': preview_data,
                 'columns': csv_file.columns,
                 'column_types': column_types,
-                'total_rows': len(df)
+                'total_rows': total_rows
             })
         except Exception as e:
             return Response({
@@ -355,7 +346,6 @@ class CsvFileViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def process(self, request, pk=None):
         csv_file = self.get_object()
-        import hashlib
         
         try:
             file_path = csv_file.file.path
@@ -366,15 +356,14 @@ class CsvFileViewSet(viewsets.ModelViewSet):
                 }, status=status.HTTP_400_BAD_REQUEST)
             
 
-            with open(file_path, 'rb') as f:
-                current_hash = hashlib.sha256(f.read()).hexdigest()
-            
-
-            is_update = csv_file.data_hash and csv_file.data_hash != current_hash
+            previous_hash = csv_file.data_hash
             
 
             try:
-                df = pd.read_csv(file_path)
+                # The upload-time profile is reused unless the file changed.
+                if not profile_is_current(csv_file, file_path):
+                    apply_profile(csv_file, profile_csv(file_path))
+                df = read_csv_cached(file_path, csv_file.data_hash, sep=get_delimiter(csv_file))
             except pd.errors.EmptyDataError:
                 return Response({
                     'error': 'The CSV file is empty'
@@ -385,59 +374,22 @@ class CsvFileViewSet(viewsets.ModelViewSet):
                 }, status=status.HTTP_400_BAD_REQUEST)
             
 
-            created = 0
-            updated = 0
-            rows_processed = 0
-
-
             if 'sample_id' not in df.columns:
                 return Response({
                     'error': "CSV must contain a 'sample_id' column"
                 }, status=status.HTTP_400_BAD_REQUEST)
             
+            is_update = bool(previous_hash) and previous_hash != csv_file.data_hash
+            if is_update:
+                discard_table(previous_hash)
             csv_file.columns = list(df.columns)
-            csv_file.data_hash = current_hash
+            csv_file.column_types = infer_column_types(df)
+            csv_file.row_count = len(df)
             
-            for _, row in df.iterrows():
-                sample_id = row.get('sample_id')
-                if not sample_id or pd.isna(sample_id):
-                    continue  
-                    
-                rows_processed += 1
-                    
-                matching_images = CropImage.objects.filter(
-                    sample_id=str(sample_id),  
-                    uploaded_by=request.user
-                )
-                
-                for image in matching_images:
-                    if image.csv_file != csv_file:
-                        image.csv_file = csv_file
-                        image.save()
-                        updated += 1
-                
-                for image in matching_images:
-                    for column in df.columns:
-                        if column != 'sample_id' and not pd.isna(row[column]):
-                            value = row[column]
-                            if isinstance(value, (int, float)) and pd.notna(value):
-                                value = str(value).rstrip('0').rstrip('.') if '.' in str(value) else str(value)
-                            else:
-                                value = str(value)
-                                
-                            _, created_new = ImageMetadata.objects.update_or_create(
-                                image=image,
-                                label=column,
-                                defaults={'value': value}
-                            )
-                            
-                            if created_new:
-                                created += 1
-                            else:
-                                updated += 1
-            
-            csv_file.processed = True
-            csv_file.save()
+            with transaction.atomic():
+                created, updated, rows_processed = merge_csv_metadata(csv_file, df, request.user)
+                csv_file.processed = True
+                csv_file.save()
             
             return Response({
                 'message': 'CSV file processed successfully',
@@ -455,16 +407,40 @@ class CsvFileViewSet(viewsets.ModelViewSet):
                 'error': str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
 
+CSV_DATA_DEFAULT_LIMIT = 1000
+
+CSV_DATA_MAX_LIMIT = 10000
+
+CSV_DATA_ORIENTS = ('records', 'columns')
+
+
+def column_values(series):
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
 class CsvDataView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
         file_id = request.query_params.get('file_id')
         columns = request.query_params.getlist('columns[]', [])
+        orient = request.query_params.get('orient', 'records')
         
         if not file_id:
             return Response({"error": "Missing file_id parameter"}, status=status.HTTP_400_BAD_REQUEST)
         
+        if orient not in CSV_DATA_ORIENTS:
+            return Response({"error": f"orient must be one of: {', '.join(CSV_DATA_ORIENTS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            offset = int(request.query_params.get('offset', 0))
+            limit = int(request.query_params.get('limit', CSV_DATA_DEFAULT_LIMIT))
+        except ValueError:
+            return Response({"error": "offset and limit must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if offset < 0 or limit < 1:
+            return Response({"error": "offset must be >= 0 and limit must be >= 1"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, CSV_DATA_MAX_LIMIT)
+        
         try:
             csv_file = get_object_or_404(CsvFile, id=file_id, uploaded_by=request.user)
             
@@ -474,38 +450,55 @@ class CsvDataView(APIView):
             if not os.path.exists(csv_file.file.path):
                 return Response({"error": "File not found on server"}, status=status.HTTP_404_NOT_FOUND)
             
-
-            try:
-                df = pd.read_csv(csv_file.file.path)
-            except Exception as e:
-                return Response({"error": f"Error reading CSV file: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
-            
+            valid_columns = None
             if columns:
-                if 'sample_id' in df.columns and 'sample_id' not in columns:
+                if 'sample_id' in csv_file.columns and 'sample_id' not in columns:
                     columns.append('sample_id')
                     
-                valid_columns = [col for col in columns if col in df.columns]
+                valid_columns = [col for col in columns if col in csv_file.columns]
                 if not valid_columns:
                     return Response({"error": "None of the requested columns exist in the CSV file"}, status=status.HTTP_400_BAD_REQUEST)
-                
-                df = df[valid_columns]
             
-            df = df.replace({np.nan: None})
+            # Text columns are read as strings so pandas skips type inference
+            # for them on a cache miss.
+            dtypes = {
+                col: str for col, kind in csv_file.column_types.items()
+                if kind == 'text' and (valid_columns is None or col in valid_columns)
+            }
+            
+
+            try:
+                df, total_rows = read_csv_page(
+                    csv_file.file.path,
+                    csv_file.data_hash,
+                    columns=valid_columns,
+                    offset=offset,
+                    limit=limit,
+                    dtypes=dtypes,
+                    sep=get_delimiter(csv_file)
+                )
+            except Exception as e:
+                return Response({"error": f"Error reading CSV file: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
+            
+            if valid_columns:
+                df = df[[col for col in valid_columns if col in df.columns]]
+            
+            column_types = {
+                col: csv_file.column_types.get(col) or column_type(df[col]) for col in df.columns
+            }
             
             data = {
                 'columns': list(df.columns),
-                'rows': df.to_dict('records'),
-                'total_rows': len(df),
-                'column_types': {}
+                'total_rows': total_rows,
+                'offset': offset,
+                'limit': limit,
+                'column_types': column_types
             }
             
-            for col in df.columns:
-                if pd.api.types.is_numeric_dtype(df[col]):
-                    data['column_types'][col] = 'numeric'
-                elif pd.api.types.is_datetime64_dtype(df[col]):
-                    data['column_types'][col] = 'datetime'
-                else:
-                    data['column_types'][col] = 'text'
+            if orient == 'columns':
+                data['data'] = {col: column_values(df[col]) for col in df.columns}
+            else:
+                data['rows'] = df.replace({np.nan: None}).to_dict('records')
             
             return Response(data)
             
@@ -514,6 +507,9 @@ class CsvDataView(APIView):
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+PROCESSED_DATA_MAX_ROWS = 1000
+
+
 class ProcessedDataView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
@@ -528,10 +524,9 @@ class ProcessedDataView(APIView):
             if not excel_file.processed:
                 return Response([])
             
-            cache_key = f'processed_data_{file_id}'
-            processed_data = request.session.get(cache_key)
+            processed_data = get_processed_data(excel_file)
             
-            if processed_data:
+            if processed_data is not None:
                 return Response(processed_data)
             
             file_path = excel_file.file.path
@@ -539,27 +534,9 @@ class ProcessedDataView(APIView):
                 if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
                     return Response({"error": "File is empty or invalid"}, status=status.HTTP_400_BAD_REQUEST)
                 
-                file_ext = os.path.splitext(file_path)[1].lower()
-                file_size = os.path.getsize(file_path)
-                
-                if file_ext == '.csv':
-                    if file_size > 10 * 1024 * 1024:  
-                        chunks = pd.read_csv(file_path, chunksize=1000)
-                        all_data = []
-                        for chunk in chunks:
-                            all_data.append(chunk)
-                        df = pd.concat(all_data)
-                    else:
-                        df = pd.read_csv(file_path)
-                else:
-                    if file_size > 10 * 1024 * 1024:  
-                        chunks = pd.read_excel(file_path, chunksize=1000)
-                        all_data = []
-                        for chunk in chunks:
-                            all_data.append(chunk)
-                        df = pd.concat(all_data)
-                    else:
-                        df = pd.read_excel(file_path, engine='openpyxl')
+                # Memory-map the first PROCESSED_DATA_MAX_ROWS rows of the
+                # columnar store, or stream just those rows when there is none.
+                df = read_head(excel_file, PROCESSED_DATA_MAX_ROWS)
                 
                 if df.empty:
                     return Response({"error": "File contains no data"}, status=status.HTTP_400_BAD_REQUEST)
@@ -568,9 +545,6 @@ class ProcessedDataView(APIView):
                 elif len(df.columns) <= 1:
                     return Response({"error": "File contains only one column of data, which is insufficient for analysis"}, status=status.HTTP_400_BAD_REQUEST)
                 
-                if len(df) > 1000:
-                    df = df.head(1000)
-                    
                 processed_data = df.replace({np.nan: None}).to_dict('records')
                 
                 for record in processed_data:
@@ -580,7 +554,7 @@ class ProcessedDataView(APIView):
                         elif not isinstance(value, (str, int, float, bool, type(None))):
                             record[key] = str(value)
                 
-                request.session[cache_key] = processed_data
+                set_processed_data(excel_file, processed_data)
                 
                 return Response(processed_data)
             except pd.errors.EmptyDataError:
@@ -609,157 +583,76 @@ class GeneticDataUploadView(APIView):
                 return Response({'error': 'Invalid file type. Please upload CSV or Excel file'}, 
                               status=status.HTTP_400_BAD_REQUEST)
             
-            file.seek(0)
-            original_content = file.read()
-            encrypted_content = encryption_manager.encrypt_file(original_content)
-            
-            encrypted_file = ContentFile(encrypted_content, name=file.name)
-            
             file_metadata = {
                 'original_name': file.name,
-                'original_size': len(original_content),
+                'original_size': file.size,
                 'content_type': file.content_type,
                 'encryption_timestamp': str(pd.Timestamp.now())
             }
             
-            genetic_data = GeneticData.objects.create(
-                file=encrypted_file,
-                uploaded_by=request.user,
-                file_type=file_type,
-                is_encrypted=True,
-                encrypted_metadata=encryption_manager.encrypt_json(file_metadata)
-            )
-            
-            try:
-                if file_type == 'csv':
-                    df = pd.read_csv(pd.io.common.BytesIO(original_content))
-                else:
-                    df = pd.read_excel(pd.io.common.BytesIO(original_content))
-                
-                if df.empty:
-                    genetic_data.delete()
-                    return Response({'error': 'The uploaded file is empty'}, status=status.HTTP_400_BAD_REQUEST)
-                
-                required_columns = ['No.', 'F5 Code']
-                missing_columns = [col for col in required_columns if col not in df.columns]
-                if missing_columns:
-                    genetic_data.delete()
-                    return Response({
-                        'error': f'Missing required columns: {", ".join(missing_columns)}. Found columns: {", ".join(list(df.columns))}'
-                    }, status=status.HTTP_400_BAD_REQUEST)
+            with tempfile.TemporaryFile() as encrypted_upload:
+                for encrypted_chunk in encryption_manager.encrypt_stream(file.chunks()):
+                    encrypted_upload.write(encrypted_chunk)
+                encrypted_upload.seek(0)
                 
-                records = []
-                for index, row in df.iterrows():
-                    try:
-                        record_data = {
-                            'genetic_data': genetic_data,
-                            'record_number': int(row['No.']),
-                            'f5_code': str(row['F5 Code'])
-                        }
-                        
-                        optional_fields = {
-                            'location': '6th Location',
-                            'f5_fruit_number': 'F5 Fruit #',
-                            'f6_full_name': 'F6 Full Name',
-                            'sixth_code': '6th Code',
-                            'fruit_number': 'Fruit No.',
-                            'pollination_date': 'Polli.Date(2024)',
-                            'harvest_date': 'Har.Date(2024)',
-                            'pedicel_length': 'Pedicel Length (cm)',
-                            'pedicel_width': 'Pedicel Width (mm)',
-                            'insertion_peduncle_size': 'Size of Insertion Peduncle (mm)',
-                            'fruit_weight': 'Fruit Weight (Kg)',
-                            'fruit_length': 'Fruit Length (cm)',
-                            'fruit_width': 'Fruit Width (cm)',
-                            'rind_thickness': 'Rind Thickness (mm)',
-                            'rind_hardness': 'Rind Hardness (Kpa)',
-                            'apex_size': 'Size of Apex (mm)',
-                            'rind_stripe': 'Rind Stripe',
-                            'flesh_hardness': 'Flesh Hardness',
-                            'flesh_color': 'Flesh Color',
-                            'brix_content': 'Flesh sugar content Brix (%)',
-                            'seeds_quantity': 'Seeds Quantity',
-                            'remained_seeds': 'Remained Seeds'
-                        }
-                        
-                        for field, column in optional_fields.items():
-                            if column in df.columns and pd.notna(row[column]):
-                                try:
-                                    if field in ['pollination_date', 'harvest_date']:
-                                        record_data[field] = pd.to_datetime(row[column]).date()
-                                    elif field in ['pedicel_length', 'pedicel_width', 'insertion_peduncle_size', 
-                                                'fruit_weight', 'fruit_length', 'fruit_width', 'rind_thickness',
-                                                'rind_hardness', 'apex_size', 'brix_content']:
-                                        record_data[field] = float(row[column])
-                                    elif field in ['seeds_quantity', 'remained_seeds']:
-                                        record_data[field] = int(row[column])
-                                    else:
-                                        record_data[field] = str(row[column])
-                                except (ValueError, TypeError):
-                                    continue
-                        
-                        genetic_record = GeneticRecord(**record_data)
-                        
-                        genetic_signature = {
-                            'f5_code': genetic_record.f5_code,
-                            'f6_full_name': genetic_record.f6_full_name,
-                            'location': genetic_record.location,
-                            'breeding_cycle': 'F5-F6'
-                        }
-                        
-                        breeding_data = {
-                            'pollination_date': str(genetic_record.pollination_date) if genetic_record.pollination_date else None,
-                            'harvest_date': str(genetic_record.harvest_date) if genetic_record.harvest_date else None,
-                            'genetic_traits': {
-                                'fruit_weight': genetic_record.fruit_weight,
-                                'fruit_dimensions': {
-                                    'length': genetic_record.fruit_length,
-                                    'width': genetic_record.fruit_width
-                                },
-                                'quality_metrics': {
-                                    'brix_content': genetic_record.brix_content,
-                                    'flesh_color': genetic_record.flesh_color,
-                                    'flesh_hardness': genetic_record.flesh_hardness
-                                }
-                            }
-                        }
-                        
-                        genetic_record.set_encrypted_genetic_signature(genetic_signature)
-                        genetic_record.set_encrypted_breeding_data(breeding_data)
-                        
-                        records.append(genetic_record)
-                    except Exception as e:
-                        print(f"Error processing row {index}: {e}")
-                        continue
-                
-                if not records:
-                    genetic_data.delete()
-                    return Response({'error': 'No valid records found in the file'}, status=status.HTTP_400_BAD_REQUEST)
-                
-                GeneticRecord.objects.bulk_create(records)
-                
-                genetic_data.total_records = len(records)
-                genetic_data.processed = True
-                genetic_data.save()
-                
-                return Response({
-                    'message': 'Genetic data uploaded and processed successfully',
-                    'total_records': len(records),
-                    'id': genetic_data.id
-                }, status=status.HTTP_201_CREATED)
-                
-            except Exception as e:
-                genetic_data.delete()
-                return Response({
-                    'error': f'Error processing file: {str(e)}'
-                }, status=status.HTTP_400_BAD_REQUEST)
+                with transaction.atomic():
+                    genetic_data = GeneticData.objects.create(
+                        file=File(encrypted_upload, name=file.name),
+                        uploaded_by=request.user,
+                        file_type=file_type,
+                        is_encrypted=True,
+                        encrypted_metadata=encryption_manager.encrypt_json(file_metadata)
+                    )
+                    
+                    job = GeneticIngestJob.objects.create(
+                        genetic_data=genetic_data,
+                        uploaded_by=request.user,
+                        original_name=file.name
+                    )
+            
+            return Response({
+                'message': 'Genetic data uploaded and queued for processing',
+                'id': genetic_data.id,
+                'job_id': job.id,
+                'status': job.status
+            }, status=status.HTTP_202_ACCEPTED)
             
         except Exception as e:
-            print(f"Unexpected error: {e}")
+            logger.error(f"Unexpected error uploading genetic data: {str(e)}")
             return Response({
                 'error': f'Unexpected error: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class GeneticIngestJobDetailView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request, job_id):
+        try:
+            job = GeneticIngestJob.objects.get(id=job_id, uploaded_by=request.user)
+            
+            return Response({
+                'id': job.id,
+                'genetic_data_id': job.genetic_data_id,
+                'original_name': job.original_name,
+                'status': job.status,
+                'rows_total': job.rows_total,
+                'rows_processed': job.rows_processed,
+                'rows_failed': job.rows_failed,
+                'errors': job.errors,
+                'error_message': job.error_message,
+                'created_at': job.created_at,
+                'started_at': job.started_at,
+                'finished_at': job.finished_at
+            }, status=status.HTTP_200_OK)
+        except GeneticIngestJob.DoesNotExist:
+            return Response({
+                'error': 'Ingest job not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return Response({
+                'error': f'Error fetching ingest job: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 class GeneticDataPreviewView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
@@ -785,8 +678,7 @@ class GeneticDataPreviewView(APIView):
                 if df.empty:
                     return Response({'error': 'The uploaded file is empty'}, status=status.HTTP_400_BAD_REQUEST)
                 
-                required_columns = ['No.', 'F5 Code']
-                missing_columns = [col for col in required_columns if col not in df.columns]
+                missing_columns = missing_required_columns(df)
                 if missing_columns:
                     return Response({
                         'error': f'Missing required columns: {", ".join(missing_columns)}. Found columns: {", ".join(list(df.columns))}'
@@ -904,7 +796,39 @@ class GeneticDataListView(APIView):
                 'error': f'Error fetching genetic data: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+GENETIC_RECORD_FIELDS = (
+    'id', 'record_number', 'f5_code', 'location', 'f5_fruit_number', 'f6_full_name',
+    'sixth_code', 'fruit_number', 'pollination_date', 'harvest_date', 'pedicel_length',
+    'pedicel_width', 'insertion_peduncle_size', 'fruit_weight', 'fruit_length', 'fruit_width',
+    'rind_thickness', 'rind_hardness', 'apex_size', 'rind_stripe', 'flesh_hardness',
+    'flesh_color', 'brix_content', 'seeds_quantity', 'remained_seeds'
+)
+GENETIC_RECORD_IMAGE_FIELDS = ('id', 'sample_id', 'image', 'description', 'uploaded_at')
+# Range filters and orderings are limited to columns with a (genetic_data, <column>) index
+GENETIC_FILTER_TRAITS = ('fruit_weight', 'fruit_length', 'fruit_width', 'brix_content')
+GENETIC_RECORD_ORDERINGS = ('record_number',) + GENETIC_FILTER_TRAITS
+GENETIC_RECORDS_DEFAULT_LIMIT = 100
+GENETIC_RECORDS_MAX_LIMIT = 1000
+
+def encode_cursor(value, record_id):
+    payload = json.dumps({'v': value, 'id': record_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        return payload['v'], int(payload['id'])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError('Invalid cursor')
+
 class GeneticRecordsDetailView(APIView):
+    """Keyset-paginated records of one dataset.
+    
+    Query parameters: ``limit``, ``cursor`` (from ``next_cursor``),
+    ``fields`` (comma separated, ``image`` included), ``ordering`` (one of
+    ``GENETIC_RECORD_ORDERINGS``, ``-`` for descending) and
+    ``<trait>_min`` / ``<trait>_max`` for the traits in ``GENETIC_FILTER_TRAITS``.
+    """
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request, genetic_data_id):
@@ -914,49 +838,107 @@ class GeneticRecordsDetailView(APIView):
                 uploaded_by=request.user
             )
             
-            records = GeneticRecord.objects.filter(
-                genetic_data=genetic_data
-            ).order_by('record_number').select_related('image')
+            try:
+                limit = int(request.query_params.get('limit', GENETIC_RECORDS_DEFAULT_LIMIT))
+            except ValueError:
+                return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+            limit = max(1, min(limit, GENETIC_RECORDS_MAX_LIMIT))
+            
+            requested_fields = [f.strip() for f in request.query_params.get('fields', '').split(',') if f.strip()]
+            unknown_fields = [f for f in requested_fields if f not in GENETIC_RECORD_FIELDS and f != 'image']
+            if unknown_fields:
+                return Response({
+                    'error': f'Unknown fields: {", ".join(unknown_fields)}'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            if requested_fields:
+                fields = ['id'] + [f for f in GENETIC_RECORD_FIELDS if f in requested_fields and f != 'id']
+                include_image = 'image' in requested_fields
+            else:
+                fields = list(GENETIC_RECORD_FIELDS)
+                include_image = True
+            
+            ordering = request.query_params.get('ordering', 'record_number')
+            descending = ordering.startswith('-')
+            order_field = ordering.lstrip('-')
+            if order_field not in GENETIC_RECORD_ORDERINGS:
+                return Response({
+                    'error': f'ordering must be one of: {", ".join(GENETIC_RECORD_ORDERINGS)}'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            unindexed_filters = [
+                param for param in request.query_params
+                if param.endswith(('_min', '_max')) and param[:-4] in GENETIC_RECORD_FIELDS
+                and param[:-4] not in GENETIC_FILTER_TRAITS
+            ]
+            if unindexed_filters:
+                return Response({
+                    'error': f'Range filters are limited to: {", ".join(GENETIC_FILTER_TRAITS)}'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            records = GeneticRecord.objects.filter(genetic_data=genetic_data)
+            
+            try:
+                for trait in GENETIC_FILTER_TRAITS:
+                    minimum = request.query_params.get(f'{trait}_min')
+                    maximum = request.query_params.get(f'{trait}_max')
+                    if minimum is not None:
+                        records = records.filter(**{f'{trait}__gte': float(minimum)})
+                    if maximum is not None:
+                        records = records.filter(**{f'{trait}__lte': float(maximum)})
+            except ValueError:
+                return Response({'error': 'Trait filters must be numeric'}, status=status.HTTP_400_BAD_REQUEST)
+            
+            cursor = request.query_params.get('cursor')
+            if cursor:
+                try:
+                    last_value, last_id = decode_cursor(cursor)
+                except ValueError:
+                    return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+                
+                if last_value is None:
+                    records = records.filter(**{f'{order_field}__isnull': True, 'id__gt': last_id})
+                else:
+                    beyond = f'{order_field}__lt' if descending else f'{order_field}__gt'
+                    records = records.filter(
+                        Q(**{beyond: last_value}) |
+                        Q(**{order_field: last_value, 'id__gt': last_id}) |
+                        Q(**{f'{order_field}__isnull': True})
+                    )
             
+            order_expression = F(order_field).desc(nulls_last=True) if descending else F(order_field).asc(nulls_last=True)
+            columns = list(fields)
+            if order_field not in columns:
+                columns.append(order_field)
+            if include_image:
+                columns += [f'image__{f}' for f in GENETIC_RECORD_IMAGE_FIELDS]
+            
+            rows = list(records.order_by(order_expression, 'id').values(*columns)[:limit + 1])
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            
+            image_storage = CropImage._meta.get_field('image').storage
             data = []
-            for record in records:
-                record_data = {
-                    'id': record.id,
-                    'record_number': record.record_number,
-                    'f5_code': record.f5_code,
-                    'location': record.location,
-                    'f5_fruit_number': record.f5_fruit_number,
-                    'f6_full_name': record.f6_full_name,
-                    'sixth_code': record.sixth_code,
-                    'fruit_number': record.fruit_number,
-                    'pollination_date': record.pollination_date,
-                    'harvest_date': record.harvest_date,
-                    'pedicel_length': record.pedicel_length,
-                    'pedicel_width': record.pedicel_width,
-                    'insertion_peduncle_size': record.insertion_peduncle_size,
-                    'fruit_weight': record.fruit_weight,
-                    'fruit_length': record.fruit_length,
-                    'fruit_width': record.fruit_width,
-                    'rind_thickness': record.rind_thickness,
-                    'rind_hardness': record.rind_hardness,
-                    'apex_size': record.apex_size,
-                    'rind_stripe': record.rind_stripe,
-                    'flesh_hardness': record.flesh_hardness,
-                    'flesh_color': record.flesh_color,
-                    'brix_content': record.brix_content,
-                    'seeds_quantity': record.seeds_quantity,
-                    'remained_seeds': record.remained_seeds,
-                    'image': {
-                        'id': record.image.id,
-                        'sample_id': record.image.sample_id,
-                        'image': record.image.image.url,
-                        'description': record.image.description,
-                        'uploaded_at': record.image.uploaded_at
-                    } if record.image else None
-                }
+            for row in rows:
+                record_data = {field: row[field] for field in fields}
+                if include_image:
+                    record_data['image'] = {
+                        'id': row['image__id'],
+                        'sample_id': row['image__sample_id'],
+                        'image': image_storage.url(row['image__image']) if row['image__image'] else None,
+                        'description': row['image__description'],
+                        'uploaded_at': row['image__uploaded_at']
+                    } if row['image__id'] else None
                 data.append(record_data)
             
-            return Response(data, status=status.HTTP_200_OK)
+            next_cursor = None
+            if has_more and rows:
+                next_cursor = encode_cursor(rows[-1][order_field], rows[-1]['id'])
+            
+            return Response({
+                'results': data,
+                'next_cursor': next_cursor,
+                'limit': limit
+            }, status=status.HTTP_200_OK)
         except GeneticData.DoesNotExist:
             return Response({
                 'error': 'Genetic data not found'
@@ -1008,6 +990,34 @@ class GeneticDataDeleteView(APIView):
                 'error': f'Error deleting genetic data: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def parse_byte_range(range_header, size):
+    """Parse a single ``bytes=`` range into inclusive ``(start, end)``.
+    
+    Returns ``None`` when the whole body should be sent (no header, a
+    multi-range request or another unit) and raises ``ValueError`` when the
+    range cannot be satisfied.
+    """
+    if not range_header or not range_header.startswith('bytes=') or ',' in range_header:
+        return None
+    
+    first, _, last = range_header[len('bytes='):].strip().partition('-')
+    try:
+        if not first:
+            length = int(last)
+            if length <= 0:
+                raise ValueError('Empty suffix range')
+            start, end = max(0, size - length), size - 1
+        else:
+            start = int(first)
+            end = int(last) if last else size - 1
+    except ValueError:
+        raise ValueError(f'Malformed range: {range_header}')
+    
+    end = min(end, size - 1)
+    if start >= size or start > end:
+        raise ValueError(f'Range not satisfiable: {range_header}')
+    return start, end
+
 class SecureFileDownloadView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
@@ -1024,20 +1034,56 @@ class SecureFileDownloadView(APIView):
                 }, status=status.HTTP_404_NOT_FOUND)
             
             if genetic_data.is_encrypted:
-                decrypted_content = genetic_data.get_file_content()
-                
-                metadata = None
+                metadata = {}
                 if genetic_data.encrypted_metadata:
                     try:
-                        metadata = encryption_manager.decrypt_json(genetic_data.encrypted_metadata)
+                        metadata = encryption_manager.decrypt_json(genetic_data.encrypted_metadata) or {}
                     except:
                         metadata = {}
                 
-                from django.http import HttpResponse
-                response = HttpResponse(
-                    decrypted_content,
-                    content_type=metadata.get('content_type', 'application/octet-stream')
-                )
+                file_path = genetic_data.file.path
+                with open(file_path, 'rb') as f:
+                    head = f.read(STREAM_HEADER.size)
+                
+                decrypted_content = None
+                if is_stream_encrypted(head):
+                    _, _, chunk_size, _ = read_stream_header(head)
+                    size = metadata.get('original_size')
+                    if size is None:
+                        size = stream_plaintext_size(os.path.getsize(file_path), chunk_size)
+                else:
+                    # Files stored as a single token have to be decrypted in full
+                    decrypted_content = genetic_data.get_file_content()
+                    size = len(decrypted_content)
+                
+                try:
+                    byte_range = parse_byte_range(request.META.get('HTTP_RANGE'), size)
+                except ValueError:
+                    response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+                    response['Content-Range'] = f'bytes */{size}'
+                    return response
+                
+                start, end = byte_range if byte_range else (0, size - 1)
+                response_status = status.HTTP_206_PARTIAL_CONTENT if byte_range else status.HTTP_200_OK
+                content_type = metadata.get('content_type', 'application/octet-stream')
+                
+                if decrypted_content is None:
+                    response = StreamingHttpResponse(
+                        self._iter_decrypted(file_path, start, end),
+                        status=response_status,
+                        content_type=content_type
+                    )
+                else:
+                    response = HttpResponse(
+                        decrypted_content[start:end + 1],
+                        status=response_status,
+                        content_type=content_type
+                    )
+                
+                response['Content-Length'] = str(max(0, end - start + 1))
+                if byte_range:
+                    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+                response['Accept-Ranges'] = 'bytes'
                 response['Content-Disposition'] = f'attachment; filename="{metadata.get("original_name", "genetic_data.csv")}"'
                 return response
             else:
@@ -1056,6 +1102,12 @@ class SecureFileDownloadView(APIView):
             return Response({
                 'error': f'Error downloading file: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    def _iter_decrypted(self, file_path, start, end):
+        if end < start:
+            return
+        with open(file_path, 'rb') as f:
+            yield from encryption_manager.decrypt_range(f, start, end)
 
 class EncryptionStatusView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -1,3 +1,8 @@
 from django.contrib import admin
+from .models import OutboxEvent
 
-# Register your models here.
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ('event_type', 'key', 'created_at', 'attempts', 'published_at')
+    list_filter = ('event_type', 'published_at')
+    search_fields = ('key', 'event_id')
@@ -0,0 +1,197 @@
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+from kafka import ConsumerRebalanceListener
+from kafka.errors import CommitFailedError
+from kafka.structs import OffsetAndMetadata
+
+from .events import decode_record
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_RECORDS = 500
+
+DEFAULT_RETRIES = 3
+
+DEFAULT_RETRY_BACKOFF = 1.0
+
+DEFAULT_POLL_TIMEOUT_MS = 1000
+
+
+class BatchFailed(Exception):
+    pass
+
+
+def run_handler(handler_path, records, retries=DEFAULT_RETRIES, backoff=DEFAULT_RETRY_BACKOFF):
+    """Call the handler at ``handler_path`` with one batch of records.
+
+    Runs in a pool worker, so the handler is looked up by path and works in
+    a thread or a process pool alike. Record values arrive as raw bytes and
+    are decoded here according to their ``content-encoding`` header, so the
+    handler sees the event dicts. A failing batch is retried up to
+    ``retries`` times after the first attempt, with exponential backoff,
+    before the error is passed back to the runner.
+    """
+    handler = import_string(handler_path)
+    records = [decode_record(record) for record in records]
+    attempt = 0
+    while True:
+        close_old_connections()
+        try:
+            handler(records)
+            return len(records)
+        except Exception as e:
+            attempt += 1
+            if attempt > retries:
+                raise
+            delay = backoff * 2 ** (attempt - 1)
+            logger.warning(f"Batch of {len(records)} record(s) failed ({str(e)}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+class _RebalanceListener(ConsumerRebalanceListener):
+
+    def __init__(self, runner):
+        self.runner = runner
+
+    def on_partitions_revoked(self, revoked):
+        self.runner._on_partitions_revoked(revoked)
+
+    def on_partitions_assigned(self, assigned):
+        logger.info(f"Assigned {len(assigned)} partition(s)")
+
+
+class BatchConsumerRunner:
+    """Poll a consumer in batches and hand them to an executor.
+
+    Each poll yields at most one batch per partition, which is submitted to
+    the pool as a list of records. A partition has at most one batch in
+    flight: it is paused while its batch runs, so its batches are handled
+    in order. Offsets are committed manually once a batch succeeds, so a
+    crash re-delivers unfinished work (at-least-once). At most
+    ``max_in_flight`` batches wait on the pool; batches polled beyond that
+    are rewound with ``seek()``, and while the pool is full every assigned
+    partition is paused. The consumer keeps polling, so it stays in its
+    group, but fetches nothing until the pool catches up.
+
+    Subscribe through ``subscribe()``: when a rebalance revokes partitions,
+    their batches are finished and committed before the partitions go, and
+    nothing is committed for them afterwards.
+    """
+
+    def __init__(self, consumer, handler_path, executor, max_records=DEFAULT_MAX_RECORDS, max_in_flight=4,
+                 retries=DEFAULT_RETRIES, backoff=DEFAULT_RETRY_BACKOFF, poll_timeout_ms=DEFAULT_POLL_TIMEOUT_MS):
+        self.consumer = consumer
+        self.handler_path = handler_path
+        self.executor = executor
+        self.max_records = max_records
+        self.max_in_flight = max(1, max_in_flight)
+        self.retries = retries
+        self.backoff = backoff
+        self.poll_timeout_ms = poll_timeout_ms
+        self.stop_event = threading.Event()
+        self.stats = {'batches': 0, 'records': 0, 'committed_batches': 0}
+        # Partition -> (offset after its batch, future) for the batch in flight
+        self._pending = {}
+        self._error = None
+
+    def subscribe(self, topics):
+        self.consumer.subscribe(topics=topics, listener=_RebalanceListener(self))
+
+    def _in_flight(self):
+        return [future for _, future in self._pending.values() if not future.done()]
+
+    def _dispatch(self, records, slots):
+        for partition, batch in records.items():
+            if slots <= 0 or partition in self._pending:
+                # Fetch this batch again once a slot, or the partition, frees up.
+                self.consumer.seek(partition, batch[0].offset)
+                continue
+            slots -= 1
+            future = self.executor.submit(run_handler, self.handler_path, batch, self.retries, self.backoff)
+            self._pending[partition] = (batch[-1].offset + 1, future)
+            self.stats['batches'] += 1
+            self.stats['records'] += len(batch)
+
+    def _commit_finished(self, partitions=None):
+        offsets = {}
+        for partition in list(self._pending if partitions is None else partitions):
+            if partition not in self._pending:
+                continue
+            next_offset, future = self._pending[partition]
+            if not future.done():
+                continue
+            error = future.exception()
+            if error is not None:
+                # Left pending, so the partition stays paused until we stop.
+                self._error = self._error or error
+                continue
+            del self._pending[partition]
+            offsets[partition] = OffsetAndMetadata(next_offset, '', -1)
+            self.stats['committed_batches'] += 1
+        if not offsets:
+            return
+        try:
+            self.consumer.commit(offsets)
+        except CommitFailedError as e:
+            # The group moved on; these batches will be delivered again.
+            logger.warning(f"Could not commit {len(offsets)} partition offset(s): {str(e)}")
+
+    def _on_partitions_revoked(self, revoked):
+        revoked = [partition for partition in revoked if partition in self._pending]
+        wait([self._pending[partition][1] for partition in revoked])
+        self._commit_finished(revoked)
+        for partition in revoked:
+            self._pending.pop(partition, None)
+
+    def _sync_pauses(self, in_flight):
+        assigned = set(self.consumer.assignment())
+        if len(in_flight) >= self.max_in_flight:
+            wanted = assigned
+        else:
+            wanted = assigned & set(self._pending)
+        paused = set(self.consumer.paused())
+        if wanted - paused:
+            self.consumer.pause(*(wanted - paused))
+        if paused - wanted:
+            self.consumer.resume(*(paused - wanted))
+
+    def run(self, once=False):
+        """Consume until stopped, a batch fails for good, or, with ``once``,
+        until a poll comes back empty with nothing left in flight."""
+        try:
+            while not self.stop_event.is_set():
+                self._commit_finished()
+                if self._error is not None:
+                    break
+
+                in_flight = self._in_flight()
+                self._sync_pauses(in_flight)
+                # Polling also keeps the group session alive while batches run.
+                records = self.consumer.poll(
+                    timeout_ms=0 if in_flight else self.poll_timeout_ms, max_records=self.max_records
+                )
+                if records:
+                    self._dispatch(records, self.max_in_flight - len(self._in_flight()))
+                elif in_flight:
+                    wait(in_flight, timeout=self.poll_timeout_ms / 1000, return_when=FIRST_COMPLETED)
+                elif once:
+                    break
+        finally:
+            self.drain()
+
+        if self._error is not None:
+            raise BatchFailed(f'Stopped after a batch failed: {str(self._error)}') from self._error
+        return self.stats
+
+    def drain(self):
+        """Wait for every submitted batch and commit what succeeded."""
+        wait([future for _, future in self._pending.values()])
+        self._commit_finished()
+
+    def stop(self):
+        self.stop_event.set()
@@ -0,0 +1,85 @@
+import gzip
+import json
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - listed in requirements.txt
+    msgpack = None
+
+# Kafka header telling consumers how the message value is encoded
+ENCODING_HEADER = 'content-encoding'
+
+# Values sent without the header, e.g. outbox events, are plain JSON
+DEFAULT_ENCODING = 'json'
+
+SERIALIZERS = ('json', 'msgpack')
+
+
+def get_event_encoding(compression_type=None):
+    """
+    Content encoding for event values.
+
+    ``KAFKA_EVENT_SERIALIZER`` ('json' or 'msgpack'), with '+gzip' appended
+    when the producer does not compress batches itself, e.g. 'json+gzip'.
+
+    Args:
+        compression_type (str, optional): The producer's compression_type
+
+    Returns:
+        str: The encoding, sent in the ENCODING_HEADER header
+    """
+    serializer = getattr(settings, 'KAFKA_EVENT_SERIALIZER', 'json')
+    if serializer not in SERIALIZERS:
+        raise ImproperlyConfigured(f"KAFKA_EVENT_SERIALIZER must be one of {', '.join(SERIALIZERS)}")
+    if serializer == 'msgpack' and msgpack is None:
+        raise ImproperlyConfigured('KAFKA_EVENT_SERIALIZER is msgpack but the msgpack package is not installed')
+    return serializer if compression_type else f'{serializer}+gzip'
+
+
+def encode_event(event, encoding):
+    """
+    Serialize an event for the message value.
+
+    Args:
+        event (dict): The event
+        encoding (str): An encoding from get_event_encoding
+
+    Returns:
+        bytes: The encoded event
+    """
+    serializer, _, compression = encoding.partition('+')
+    if serializer == 'msgpack':
+        value = msgpack.packb(event, use_bin_type=True)
+    else:
+        value = json.dumps(event, separators=(',', ':')).encode('utf-8')
+    return gzip.compress(value) if compression == 'gzip' else value
+
+
+def decode_event(value, encoding=DEFAULT_ENCODING):
+    """Inverse of encode_event."""
+    serializer, _, compression = encoding.partition('+')
+    if compression == 'gzip':
+        value = gzip.decompress(value)
+    if serializer == 'msgpack':
+        if msgpack is None:
+            raise ImproperlyConfigured('Received a msgpack event but the msgpack package is not installed')
+        return msgpack.unpackb(value, raw=False)
+    return json.loads(value.decode('utf-8'))
+
+
+def record_encoding(record):
+    """The ENCODING_HEADER value of a consumed record, or DEFAULT_ENCODING."""
+    for key, value in record.headers or ():
+        if key == ENCODING_HEADER:
+            return value.decode('utf-8')
+    return DEFAULT_ENCODING
+
+
+def decode_record(record):
+    """Return ``record`` with its raw value decoded according to its headers."""
+    if record.value is None:
+        return record
+    return record._replace(value=decode_event(record.value, record_encoding(record)))
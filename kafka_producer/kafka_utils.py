@@ -1,47 +1,245 @@
+import atexit
 import json
 import logging
+import os
+import threading
+import time
+import weakref
 from kafka import KafkaProducer, KafkaConsumer
+from kafka.errors import KafkaTimeoutError
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
-class KafkaClient:
-    def __init__(self):
-        self.enabled = settings.KAFKA_ENABLED
+# Every client in this process, so fork and exit hooks can reach them.
+_clients = weakref.WeakSet()
+
+
+def _serialize_value(value):
+    # Pre-encoded values (e.g. the backend's row-chunk events) go out as they are.
+    if isinstance(value, bytes):
+        return value
+    return json.dumps(value).encode('utf-8')
+
+
+class KafkaProducerClient:
+    """The process-wide Kafka publisher.
+
+    Producers are created lazily on first publish, one per distinct
+    producer configuration, so topics that share a configuration share
+    their batches and broker connections. A process forked from one that
+    already connected (e.g. a gunicorn worker with ``--preload``) drops the
+    inherited producers and connects again on its own, and live producers
+    are flushed and closed at interpreter exit. The main project and the
+    backend deployable both publish through this class.
+    """
+
+    def __init__(self, producer_factory=KafkaProducer):
         self.bootstrap_servers = settings.KAFKA_BOOTSTRAP_SERVERS
         self.topic = settings.KAFKA_TOPIC
-        self.producer = None
-        self.consumer = None
-        
-        if self.enabled:
+        self.kafka_enabled = settings.KAFKA_ENABLED
+        self.producer_factory = producer_factory
+        self._producers = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._reset_metrics()
+        _clients.add(self)
+
+    def _reset_metrics(self):
+        self.metrics = {'sent': 0, 'delivered': 0, 'failed': 0}
+        self._in_flight = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._metrics_lock = threading.Lock()
+
+    def producer_config(self, topic=None):
+        """Producer settings for ``topic``: the global ``KAFKA_*`` values
+        updated with its entry in ``KAFKA_TOPIC_CONFIGS``."""
+        config = {
+            'linger_ms': getattr(settings, 'KAFKA_LINGER_MS', 20),
+            'batch_size': getattr(settings, 'KAFKA_BATCH_SIZE', 64 * 1024),
+            'compression_type': getattr(settings, 'KAFKA_COMPRESSION_TYPE', 'gzip'),
+            'acks': getattr(settings, 'KAFKA_ACKS', 'all'),
+            'retries': getattr(settings, 'KAFKA_RETRIES', 3),
+        }
+        config.update(getattr(settings, 'KAFKA_TOPIC_CONFIGS', {}).get(topic or self.topic, {}))
+        return config
+
+    def _pool_key(self, topic):
+        return tuple(sorted(self.producer_config(topic).items()))
+
+    def _get_producer(self, topic=None):
+        if not self.kafka_enabled:
+            logger.info("Kafka is disabled. Skipping connection.")
+            return None
+
+        if os.getpid() != self._pid:
+            self._reset_after_fork()
+
+        key = self._pool_key(topic)
+        with self._lock:
+            producer = self._producers.get(key)
+            if producer is not None:
+                return producer
             try:
-                self.init_producer()
-                logger.info(f"Kafka producer initialized with servers: {self.bootstrap_servers}")
+                producer = self.producer_factory(
+                    bootstrap_servers=self.bootstrap_servers,
+                    value_serializer=_serialize_value,
+                    **dict(key)
+                )
             except Exception as e:
-                logger.error(f"Failed to initialize Kafka producer: {str(e)}")
-    
-    def init_producer(self):
-        """Initialize the Kafka producer"""
-        if not self.enabled:
+                logger.warning(f"Failed to connect to Kafka broker: {str(e)}")
+                return None
+            self._producers[key] = producer
+            logger.info(f"Connected to Kafka broker at {self.bootstrap_servers} (pid {self._pid})")
+            return producer
+
+    @property
+    def producer(self):
+        """The producer used for ``KAFKA_TOPIC``, if it has connected."""
+        return self._producers.get(self._pool_key(None))
+
+    def _reset_after_fork(self):
+        # The inherited producers' sender threads do not exist in this
+        # process, and their buffers belong to the parent; drop them.
+        self._producers = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._reset_metrics()
+
+    def _on_success(self, callback, started, record_metadata):
+        latency = time.monotonic() - started
+        with self._metrics_lock:
+            self.metrics['delivered'] += 1
+            self._in_flight -= 1
+            self._latency_total += latency
+            self._latency_max = max(self._latency_max, latency)
+        if callback:
+            callback(record_metadata)
+
+    def _on_error(self, callback, exception):
+        with self._metrics_lock:
+            self.metrics['failed'] += 1
+            self._in_flight -= 1
+        logger.error(f"Failed to deliver message to Kafka: {str(exception)}")
+        if callback:
+            callback(exception)
+
+    def publish_data(self, data, key=None, on_success=None, on_error=None, topic=None, headers=None):
+        """Queue ``data`` for the topic without waiting for the broker.
+
+        The producer batches queued messages according to
+        ``producer_config(topic)`` and sends them from its own thread.
+        ``on_success`` receives the record metadata and ``on_error`` the
+        exception once delivery is known; call ``flush()`` to wait for
+        everything queued so far. ``topic`` overrides ``KAFKA_TOPIC`` for
+        this message. ``data`` is sent as JSON unless it is already bytes;
+        ``headers`` are Kafka headers as ``(str, bytes)`` pairs.
+        """
+        if not self.kafka_enabled:
+            logger.info("Kafka is disabled. Skipping publish.")
+            return True
+
+        producer = self._get_producer(topic)
+        if producer is None:
+            logger.error("Kafka producer not initialized")
+            return False
+
+        try:
+            key_bytes = key.encode('utf-8') if key else None
+            started = time.monotonic()
+            future = producer.send(topic or self.topic, value=data, key=key_bytes, headers=headers)
+            with self._metrics_lock:
+                self.metrics['sent'] += 1
+                self._in_flight += 1
+            future.add_callback(self._on_success, on_success, started)
+            future.add_errback(self._on_error, on_error)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to publish data to Kafka: {str(e)}")
+            with self._metrics_lock:
+                self.metrics['failed'] += 1
+            return False
+
+    def flush(self, timeout=None):
+        """Block until every queued message is delivered or has failed.
+
+        Returns False if a producer could not drain within ``timeout``
+        seconds.
+        """
+        drained = True
+        for producer in list(self._producers.values()):
+            try:
+                producer.flush(timeout=timeout)
+            except KafkaTimeoutError as e:
+                logger.error(f"Timed out flushing Kafka producer: {str(e)}")
+                drained = False
+        return drained
+
+    def stats(self):
+        """Snapshot of this process's producer metrics."""
+        with self._metrics_lock:
+            delivered = self.metrics['delivered']
+            failed = self.metrics['failed']
+            finished = delivered + failed
+            return {
+                **self.metrics,
+                'queue_depth': self._in_flight,
+                'error_rate': failed / finished if finished else 0.0,
+                'avg_latency_ms': 1000 * self._latency_total / delivered if delivered else 0.0,
+                'max_latency_ms': 1000 * self._latency_max,
+                'producers': len(self._producers),
+            }
+
+    def close(self, timeout=None):
+        if os.getpid() != self._pid:
             return
-            
+        producers, self._producers = list(self._producers.values()), {}
+        for producer in producers:
+            producer.close(timeout=timeout)
+        if producers:
+            logger.info("Kafka producer closed")
+
+
+def _reset_clients_after_fork():
+    for client in list(_clients):
+        client._reset_after_fork()
+
+
+def _close_clients():
+    timeout = getattr(settings, 'KAFKA_CLOSE_TIMEOUT', 10)
+    for client in list(_clients):
         try:
-            self.producer = KafkaProducer(
-                bootstrap_servers=self.bootstrap_servers,
-                value_serializer=lambda v: json.dumps(v).encode('utf-8'),
-                acks='all',  # Wait for all replicas to acknowledge
-                retries=3,   # Retry up to 3 times
-                retry_backoff_ms=100  # 100ms backoff between retries
-            )
+            client.close(timeout=timeout)
         except Exception as e:
-            logger.error(f"Error initializing Kafka producer: {str(e)}")
-            raise
-    
+            logger.warning(f"Error closing Kafka producer at exit: {str(e)}")
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_clients_after_fork)
+atexit.register(_close_clients)
+
+# The shared publisher for this process
+kafka_producer = KafkaProducerClient()
+
+
+def send_message(topic, message):
+    """Queue ``message`` for ``topic`` on the shared producer."""
+    return kafka_producer.publish_data(message, topic=topic)
+
+
+class KafkaClient:
+    def __init__(self):
+        self.enabled = settings.KAFKA_ENABLED
+        self.bootstrap_servers = settings.KAFKA_BOOTSTRAP_SERVERS
+        self.topic = settings.KAFKA_TOPIC
+        self.consumer = None
+
     def init_consumer(self, group_id='aquagreen-consumer', auto_offset_reset='earliest'):
         """Initialize the Kafka consumer"""
         if not self.enabled:
             return
-            
+
         try:
             self.consumer = KafkaConsumer(
                 self.topic,
@@ -54,60 +252,42 @@ class KafkaClient:
         except Exception as e:
             logger.error(f"Error initializing Kafka consumer: {str(e)}")
             raise
-    
+
     def publish_data(self, data):
-        """Publish data to Kafka topic"""
+        """Publish data to Kafka topic through the shared producer"""
         if not self.enabled:
             logger.warning("Kafka publishing disabled. Message not sent.")
             return False
-            
-        if not self.producer:
-            try:
-                self.init_producer()
-            except Exception as e:
-                logger.error(f"Failed to initialize Kafka producer for message publishing: {str(e)}")
-                return False
-        
-        try:
-            future = self.producer.send(self.topic, data)
-            # Block until the message is sent (or timeout after 10 seconds)
-            record_metadata = future.get(timeout=10)
-            logger.info(f"Message published to Kafka topic: {self.topic}, "  
-                       f"partition: {record_metadata.partition}, "  
-                       f"offset: {record_metadata.offset}")
-            return True
-        except Exception as e:
-            logger.error(f"Error publishing to Kafka: {str(e)}")
-            return False
-    
+        return kafka_producer.publish_data(data)
+
     def consume_messages(self, handler_func, timeout_ms=1000):
-        """Consume messages from Kafka topic"""
+        """Consume messages from Kafka topic one at a time.
+
+        For batched, parallel consumption with manual offset commits use the
+        ``run_kafka_consumer`` management command instead.
+        """
         if not self.enabled:
             logger.warning("Kafka consumption disabled.")
             return
-            
+
         if not self.consumer:
             try:
                 self.init_consumer()
             except Exception as e:
                 logger.error(f"Failed to initialize Kafka consumer for message consumption: {str(e)}")
                 return
-        
+
         try:
-            for message in self.consumer:  
+            for message in self.consumer:
                 try:
                     handler_func(message.value)
                 except Exception as e:
                     logger.error(f"Error processing Kafka message: {str(e)}")
         except Exception as e:
             logger.error(f"Error consuming from Kafka: {str(e)}")
-    
+
     def close(self):
         """Close Kafka connections"""
-        if self.producer:
-            self.producer.close()
-            logger.info("Kafka producer closed")
-        
         if self.consumer:
             self.consumer.close()
             logger.info("Kafka consumer closed")
@@ -0,0 +1,63 @@
+import logging
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from kafka_producer.kafka_utils import kafka_producer
+from kafka_producer.outbox import prune_published, relay_batch
+
+logger = logging.getLogger(__name__)
+
+# Seconds between retention passes while the relay is idle
+PRUNE_INTERVAL = 300
+
+
+class Command(BaseCommand):
+    help = 'Publish pending outbox events to Kafka in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Events claimed per batch')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when nothing is due')
+        parser.add_argument('--once', action='store_true', help='Relay the due events and exit instead of polling forever')
+        parser.add_argument('--retention-hours', type=float, default=None,
+                            help='Delete events published longer ago than this; defaults to OUTBOX_RETENTION_HOURS')
+
+    def handle(self, *args, **options):
+        if not kafka_producer.kafka_enabled:
+            raise CommandError('Kafka is disabled; set KAFKA_ENABLED=true to relay outbox events')
+
+        stop_event = threading.Event()
+        self.stdout.write('Starting outbox relay')
+        try:
+            published = self._relay(
+                stop_event, options['batch_size'], options['poll_interval'], options['once'], options['retention_hours']
+            )
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping outbox relay')
+            return
+        finally:
+            kafka_producer.flush()
+        self.stdout.write(f'Published {published} outbox event(s)')
+
+    def _relay(self, stop_event, batch_size, poll_interval, once, retention_hours):
+        total = 0
+        last_pruned = None
+        while not stop_event.is_set():
+            close_old_connections()
+            published, failed = relay_batch(kafka_producer, batch_size=batch_size)
+            total += published
+            if published or failed:
+                logger.info(f"Relayed outbox batch: {published} published, {failed} failed")
+            # Drain back-to-back batches; rest when nothing is due or the
+            # whole batch failed, so a broker outage is not hammered.
+            if published:
+                continue
+            if last_pruned is None or time.monotonic() - last_pruned >= PRUNE_INTERVAL:
+                prune_published(retention_hours)
+                last_pruned = time.monotonic()
+            if once:
+                return total
+            stop_event.wait(poll_interval)
+        return total
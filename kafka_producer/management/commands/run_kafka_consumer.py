@@ -0,0 +1,83 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils.module_loading import import_string
+from kafka import KafkaConsumer
+
+from kafka_producer.consumer import BatchConsumerRunner, BatchFailed
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Consume Kafka messages in batches and hand them to a pool of workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--topic', action='append', dest='topics', help='Topic to consume (repeatable); defaults to KAFKA_TOPIC')
+        parser.add_argument('--group-id', default=None, help='Consumer group; defaults to KAFKA_CONSUMER_GROUP')
+        parser.add_argument('--handler', default=None,
+                            help='Dotted path to a callable taking a list of records; defaults to KAFKA_CONSUMER_HANDLER')
+        parser.add_argument('--max-records', type=int, default=None, help='Records fetched per poll')
+        parser.add_argument('--workers', type=int, default=None, help='Number of pool workers')
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread', help='Run handlers in threads or processes')
+        parser.add_argument('--max-in-flight', type=int, default=None, help='Batches allowed to wait on the pool before polling pauses')
+        parser.add_argument('--retries', type=int, default=3, help='Retries per failing batch, after the first attempt, before the consumer stops')
+        parser.add_argument('--once', action='store_true', help='Consume what is available and exit instead of polling forever')
+
+    def handle(self, *args, **options):
+        if not settings.KAFKA_ENABLED:
+            raise CommandError('Kafka is disabled; set KAFKA_ENABLED=true to consume messages')
+
+        handler = options['handler'] or getattr(settings, 'KAFKA_CONSUMER_HANDLER', '')
+        if not handler:
+            raise CommandError('No handler given; pass --handler or set KAFKA_CONSUMER_HANDLER')
+        try:
+            import_string(handler)
+        except ImportError as e:
+            raise CommandError(f'Cannot import handler {handler}: {str(e)}')
+
+        topics = options['topics'] or [settings.KAFKA_TOPIC]
+        max_records = options['max_records'] or getattr(settings, 'KAFKA_CONSUMER_MAX_RECORDS', 500)
+        workers = max(1, options['workers'] or getattr(settings, 'KAFKA_CONSUMER_WORKERS', 4))
+        max_in_flight = options['max_in_flight'] or getattr(settings, 'KAFKA_CONSUMER_MAX_IN_FLIGHT', workers * 2)
+
+        consumer = KafkaConsumer(
+            bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
+            group_id=options['group_id'] or getattr(settings, 'KAFKA_CONSUMER_GROUP', 'aquagreen-consumer'),
+            auto_offset_reset='earliest',
+            enable_auto_commit=False,
+            # Values stay bytes; the runner decodes them by their content-encoding header.
+            max_poll_records=max_records
+        )
+
+        if options['pool'] == 'process':
+            # Children must not share this process's database sockets.
+            connections.close_all()
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=django.setup)
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='kafka-consumer')
+
+        runner = BatchConsumerRunner(
+            consumer, handler, executor,
+            max_records=max_records,
+            max_in_flight=max_in_flight,
+            retries=options['retries']
+        )
+        runner.subscribe(topics)
+
+        self.stdout.write(f"Consuming {', '.join(topics)} with {workers} {options['pool']} worker(s)")
+        try:
+            stats = runner.run(once=options['once'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping Kafka consumer after the batches in flight')
+            return
+        except BatchFailed as e:
+            raise CommandError(str(e))
+        finally:
+            executor.shutdown(wait=True)
+            consumer.close()
+        self.stdout.write(f"Processed {stats['records']} record(s) in {stats['batches']} batch(es)")
@@ -1,3 +1,39 @@
+import uuid
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class OutboxEvent(models.Model):
+    """An event waiting to be relayed to Kafka.
+
+    Rows are written in the same transaction as the change they describe
+    and published later by the ``relay_outbox`` command.
+    """
+    event_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    event_type = models.CharField(max_length=100)
+    topic = models.CharField(max_length=255)
+    key = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    claim_token = models.UUIDField(null=True, blank=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['published_at', 'available_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.event_id}"
+
+    def message(self):
+        """The envelope sent to Kafka; consumers deduplicate on ``event_id``."""
+        return {
+            'event_id': str(self.event_id),
+            'event_type': self.event_type,
+            'occurred_at': self.created_at.isoformat(),
+            'payload': self.payload,
+        }
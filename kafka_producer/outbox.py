@@ -0,0 +1,145 @@
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+
+DEFAULT_RETRY_BASE_SECONDS = 1
+
+DEFAULT_RETRY_MAX_SECONDS = 300
+
+DEFAULT_CLAIM_SECONDS = 60
+
+DEFAULT_FLUSH_TIMEOUT = 30
+
+DEFAULT_RETENTION_HOURS = 168
+
+PRUNE_BATCH_SIZE = 1000
+
+
+def enqueue_event(event_type, key, payload, topic=None):
+    """Record an event to publish once the surrounding transaction commits.
+
+    Call this inside the ``transaction.atomic()`` block that makes the
+    change, so the event exists if and only if the change does. ``key`` is
+    the Kafka message key; events with the same key stay on one partition.
+    With Kafka disabled nothing could ever relay the event, so none is
+    written and None is returned.
+    """
+    if not settings.KAFKA_ENABLED:
+        return None
+    return OutboxEvent.objects.create(
+        event_type=event_type,
+        key=str(key),
+        payload=payload,
+        topic=topic or settings.KAFKA_TOPIC
+    )
+
+
+def retry_delay(attempts):
+    """Exponential backoff, capped at ``OUTBOX_RETRY_MAX_SECONDS``."""
+    base = getattr(settings, 'OUTBOX_RETRY_BASE_SECONDS', DEFAULT_RETRY_BASE_SECONDS)
+    ceiling = getattr(settings, 'OUTBOX_RETRY_MAX_SECONDS', DEFAULT_RETRY_MAX_SECONDS)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), ceiling))
+
+
+def claim_batch(batch_size=None, now=None):
+    """Claim up to ``batch_size`` due events for this relay.
+
+    The conditional UPDATE is the lock, as in ``claim_next_job``: only rows
+    that are still unpublished and due get the new claim token. Claimed
+    rows are pushed ``OUTBOX_CLAIM_SECONDS`` into the future, so events of
+    a relay that dies mid-batch become due again on their own.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    lease = timedelta(seconds=getattr(settings, 'OUTBOX_CLAIM_SECONDS', DEFAULT_CLAIM_SECONDS))
+
+    due = OutboxEvent.objects.filter(published_at__isnull=True, available_at__lte=now)
+    candidates = list(due.order_by('available_at', 'id').values_list('id', flat=True)[:batch_size])
+    if not candidates:
+        return []
+
+    token = uuid.uuid4()
+    due.filter(id__in=candidates).update(claim_token=token, available_at=now + lease)
+    return list(OutboxEvent.objects.filter(claim_token=token).order_by('id'))
+
+
+def relay_batch(client, batch_size=None, now=None, flush_timeout=DEFAULT_FLUSH_TIMEOUT):
+    """Publish one batch of due events and record the outcome of each.
+
+    Every event of the batch is queued on the producer, which is then
+    flushed once. Events the broker acknowledged are marked published;
+    the rest are rescheduled with backoff. An event is only marked after
+    its acknowledgement, so delivery is at-least-once.
+
+    Returns ``(published, failed)``.
+    """
+    if not client.kafka_enabled:
+        raise RuntimeError('Kafka is disabled; outbox events cannot be relayed')
+
+    now = now or timezone.now()
+    events = claim_batch(batch_size, now)
+    if not events:
+        return 0, 0
+
+    delivered = set()
+    errors = {}
+    for event in events:
+        queued = client.publish_data(
+            event.message(),
+            key=event.key,
+            topic=event.topic,
+            on_success=lambda metadata, event_id=event.id: delivered.add(event_id),
+            on_error=lambda exception, event_id=event.id: errors.__setitem__(event_id, str(exception))
+        )
+        if not queued:
+            errors[event.id] = 'Could not queue the message'
+    client.flush(timeout=flush_timeout)
+
+    published = [event.id for event in events if event.id in delivered]
+    OutboxEvent.objects.filter(id__in=published).update(
+        published_at=timezone.now(), claim_token=None, last_error=''
+    )
+
+    failed = [event for event in events if event.id not in delivered]
+    for event in failed:
+        OutboxEvent.objects.filter(id=event.id).update(
+            attempts=F('attempts') + 1,
+            available_at=now + retry_delay(event.attempts + 1),
+            last_error=errors.get(event.id, 'Delivery was not acknowledged before the flush timed out'),
+            claim_token=None
+        )
+    if failed:
+        logger.warning(f"{len(failed)} outbox event(s) failed and will be retried")
+    return len(published), len(failed)
+
+
+def prune_published(retention_hours=None, now=None):
+    """Delete events published more than ``OUTBOX_RETENTION_HOURS`` ago.
+
+    Rows are deleted in batches of ``PRUNE_BATCH_SIZE`` so a large backlog
+    does not hold one long transaction. Returns the number deleted.
+    """
+    if retention_hours is None:
+        retention_hours = getattr(settings, 'OUTBOX_RETENTION_HOURS', DEFAULT_RETENTION_HOURS)
+    cutoff = (now or timezone.now()) - timedelta(hours=retention_hours)
+    expired = OutboxEvent.objects.filter(published_at__lt=cutoff)
+
+    deleted = 0
+    while True:
+        ids = list(expired.values_list('id', flat=True)[:PRUNE_BATCH_SIZE])
+        if not ids:
+            break
+        deleted += OutboxEvent.objects.filter(id__in=ids).delete()[0]
+    if deleted:
+        logger.info(f"Pruned {deleted} published outbox event(s) older than {retention_hours}h")
+    return deleted
@@ -0,0 +1,166 @@
+import json
+import threading
+from kafka.consumer.fetcher import ConsumerRecord
+from kafka.errors import CommitFailedError
+from kafka.future import Future
+from kafka.producer.future import RecordMetadata
+from kafka.structs import TopicPartition
+
+
+class FakeKafkaProducer:
+    """In-memory stand-in for ``kafka.KafkaProducer``.
+
+    Accepts the same constructor arguments and keeps them in ``config``.
+    Sent records wait in a queue, as they would in a real batch, until
+    ``flush()`` delivers them; if ``fail_with`` is set, they fail with that
+    exception instead. Pass the class as ``producer_factory`` to
+    ``KafkaProducerClient`` to exercise publishing without a broker.
+    Headers of delivered records are kept in ``delivered_headers``.
+    """
+
+    def __init__(self, fail_with=None, **config):
+        self.config = config
+        self.fail_with = fail_with
+        self.delivered = []
+        self.delivered_headers = []
+        self.flush_count = 0
+        self.closed = False
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def send(self, topic, value=None, key=None, headers=None):
+        serializer = self.config.get('value_serializer')
+        payload = serializer(value) if serializer else value
+        future = Future()
+        with self._lock:
+            self._pending.append((topic, key, payload, headers or [], future))
+        return future
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def flush(self, timeout=None):
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self.flush_count += 1
+        for topic, key, payload, headers, future in pending:
+            if self.fail_with is not None:
+                future.failure(self.fail_with)
+                continue
+            self.delivered.append((topic, key, payload))
+            self.delivered_headers.append(headers)
+            future.success(RecordMetadata(
+                topic, 0, TopicPartition(topic, 0), len(self.delivered) - 1, -1, None,
+                len(key) if key else -1, len(payload), -1
+            ))
+
+    def close(self, timeout=None):
+        self.flush(timeout)
+        self.closed = True
+
+
+class FakeKafkaConsumer:
+    """In-memory stand-in for ``kafka.KafkaConsumer`` with manual commits.
+
+    Records added with ``add()`` are returned by ``poll()`` in offset order,
+    with raw bytes values as a broker delivers them (other values are sent
+    as JSON),
+    at most ``max_records`` per call across all partitions, skipping paused
+    partitions. ``commit()`` records the committed offsets in ``committed``
+    and every call in ``commits``; like a real group member it fails for
+    partitions that are not assigned, or with ``commit_error`` if set.
+    ``revoke()`` schedules a rebalance that the next ``poll()`` runs through
+    the listener given to ``subscribe()``.
+    """
+
+    def __init__(self):
+        self.committed = {}
+        self.commits = []
+        self.commit_error = None
+        self.closed = False
+        self.listener = None
+        self._revoking = set()
+        self._records = {}
+        self._positions = {}
+        self._paused = set()
+        self._lock = threading.Lock()
+
+    def add(self, topic, partition, value, key=None, headers=None):
+        tp = TopicPartition(topic, partition)
+        if not isinstance(value, bytes):
+            value = json.dumps(value).encode('utf-8')
+        with self._lock:
+            records = self._records.setdefault(tp, [])
+            self._positions.setdefault(tp, 0)
+            records.append(ConsumerRecord(
+                topic, partition, -1, len(records), 0, 0, key, value, headers or [], None, -1, -1, -1
+            ))
+
+    def subscribe(self, topics=(), pattern=None, listener=None):
+        self.listener = listener
+
+    def revoke(self, *partitions):
+        self._revoking.update(partitions)
+
+    def _rebalance(self):
+        revoked, self._revoking = self._revoking, set()
+        if self.listener:
+            self.listener.on_partitions_revoked(revoked)
+        with self._lock:
+            for tp in revoked:
+                del self._records[tp]
+                del self._positions[tp]
+        self._paused.difference_update(revoked)
+        if self.listener:
+            self.listener.on_partitions_assigned(self.assignment())
+
+    def assignment(self):
+        return set(self._records)
+
+    def poll(self, timeout_ms=0, max_records=None, update_offsets=True):
+        if self._revoking:
+            self._rebalance()
+        batches = {}
+        remaining = max_records
+        with self._lock:
+            for tp in sorted(self._records):
+                if tp in self._paused or remaining == 0:
+                    continue
+                position = self._positions[tp]
+                stop = len(self._records[tp]) if remaining is None else position + remaining
+                batch = self._records[tp][position:stop]
+                if not batch:
+                    continue
+                batches[tp] = batch
+                self._positions[tp] = position + len(batch)
+                if remaining is not None:
+                    remaining -= len(batch)
+        return batches
+
+    def seek(self, partition, offset):
+        with self._lock:
+            self._positions[partition] = offset
+
+    def pause(self, *partitions):
+        self._paused.update(partitions)
+
+    def resume(self, *partitions):
+        self._paused.difference_update(partitions)
+
+    def paused(self):
+        return set(self._paused)
+
+    def commit(self, offsets=None):
+        if self.commit_error is not None:
+            error, self.commit_error = self.commit_error, None
+            raise error
+        if set(offsets) - self.assignment():
+            raise CommitFailedError('Partitions are no longer assigned to this consumer')
+        with self._lock:
+            self.commits.append(dict(offsets))
+            for tp, offset in offsets.items():
+                self.committed[tp] = offset.offset
+
+    def close(self, autocommit=True, timeout_ms=None):
+        self.closed = True
@@ -1,3 +1,446 @@
-from django.test import TestCase
+import json
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from kafka.errors import CommitFailedError, KafkaTimeoutError
+from kafka.structs import TopicPartition
+from rest_framework.test import APIClient
+
+from file_uploader.models import ExcelFile
+
+from .consumer import BatchConsumerRunner, BatchFailed
+from .events import ENCODING_HEADER, encode_event
+from .kafka_utils import KafkaProducerClient, _reset_clients_after_fork
+from .models import OutboxEvent
+from .outbox import claim_batch, enqueue_event, prune_published, relay_batch
+from .testing import FakeKafkaConsumer, FakeKafkaProducer
+
+# Batches seen by the consumer test handlers below
+handled_batches = []
+release_batches = threading.Event()
+
+
+def store_batch(records):
+    handled_batches.append(records)
+    OutboxEvent.objects.bulk_create([
+        OutboxEvent(event_type='test.consumed', topic=record.topic, key=f'{record.partition}:{record.offset}',
+                    payload=record.value)
+        for record in records
+    ])
+
+
+def reject_poison(records):
+    handled_batches.append(records)
+    if any(record.value.get('poison') for record in records):
+        raise ValueError('poison record')
+
+
+def wait_for_release(records):
+    handled_batches.append(records)
+    release_batches.wait(timeout=5)
+
+
+def slow_batch(records):
+    handled_batches.append(('start', records[0].partition, records[0].offset))
+    time.sleep(0.05)
+    handled_batches.append(('end', records[0].partition, records[0].offset))
+
+
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(),
+    KAFKA_ENABLED=True,
+    KAFKA_TOPIC='excel_data',
+    OUTBOX_RETRY_BASE_SECONDS=2,
+    OUTBOX_RETRY_MAX_SECONDS=5,
+    OUTBOX_CLAIM_SECONDS=60
+)
+class OutboxRelayTest(TestCase):
+    """Test case for the transactional outbox and its relay."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.kafka = KafkaProducerClient(producer_factory=FakeKafkaProducer)
+
+    def _upload(self):
+        return self.client.post(reverse('excelfile-list'), {
+            'title': 'Trial',
+            'file': SimpleUploadedFile('trial.csv', b'Name,Age\nJohn,30\n', content_type='text/csv')
+        }, format='multipart')
+
+    def test_events_are_written_with_the_change(self):
+        """Test an upload writes its event in the same transaction, or not at all."""
+        response = self._upload()
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.event_type, 'excel_file.uploaded')
+        self.assertEqual(event.key, f"excel_file:{response.data['id']}")
+        self.assertEqual(event.payload['file_format'], 'csv')
+        self.assertIsNone(event.published_at)
+
+        with mock.patch('file_uploader.views.file_sha256', side_effect=RuntimeError('disk full')):
+            with self.assertRaises(RuntimeError):
+                self._upload()
+        self.assertEqual(ExcelFile.objects.count(), 1)
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                enqueue_event('test.event', 'key', {})
+                raise RuntimeError('rolled back')
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+
+    def test_nothing_is_written_without_kafka(self):
+        """Test no events pile up when Kafka is disabled and nothing would relay them."""
+        with override_settings(KAFKA_ENABLED=False):
+            self._upload()
+            self.assertIsNone(enqueue_event('test.event', 'key', {}))
+        self.assertEqual(ExcelFile.objects.count(), 1)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    @override_settings(OUTBOX_RETENTION_HOURS=24)
+    def test_published_events_are_pruned(self):
+        """Test only events published longer ago than the retention are deleted."""
+        now = timezone.now()
+        old = enqueue_event('test.event', 'item:1', {})
+        recent = enqueue_event('test.event', 'item:2', {})
+        pending = enqueue_event('test.event', 'item:3', {})
+        OutboxEvent.objects.filter(id=old.id).update(published_at=now - timedelta(hours=25))
+        OutboxEvent.objects.filter(id=recent.id).update(published_at=now - timedelta(hours=23))
+
+        self.assertEqual(prune_published(now=now), 1)
+        self.assertEqual(set(OutboxEvent.objects.values_list('id', flat=True)), {recent.id, pending.id})
+
+        self.assertEqual(prune_published(retention_hours=1, now=now), 1)
+        self.assertEqual(list(OutboxEvent.objects.values_list('id', flat=True)), [pending.id])
+
+    def test_relay_publishes_each_event_once(self):
+        """Test due events are published in one flush with their keys and ids."""
+        events = [enqueue_event('test.event', f'item:{i}', {'i': i}) for i in range(5)]
+
+        self.assertEqual(relay_batch(self.kafka, batch_size=3), (3, 0))
+        self.assertEqual(relay_batch(self.kafka, batch_size=3), (2, 0))
+        self.assertEqual(relay_batch(self.kafka, batch_size=3), (0, 0))
+
+        producer = self.kafka.producer
+        self.assertEqual(producer.flush_count, 2)
+        self.assertEqual([key for _, key, _ in producer.delivered], [f'item:{i}'.encode() for i in range(5)])
+        message = json.loads(producer.delivered[0][2])
+        self.assertEqual(message['event_id'], str(events[0].event_id))
+        self.assertEqual(message['payload'], {'i': 0})
+        self.assertFalse(OutboxEvent.objects.filter(published_at__isnull=True).exists())
+
+    def test_failed_events_back_off_and_retry(self):
+        """Test a broker outage reschedules events with exponential backoff."""
+        event = enqueue_event('test.event', 'item:1', {})
+        now = timezone.now()
+        self.kafka.producer_factory = lambda **config: FakeKafkaProducer(
+            fail_with=KafkaTimeoutError('broker down'), **config
+        )
+
+        self.assertEqual(relay_batch(self.kafka, now=now), (0, 1))
+        event.refresh_from_db()
+        self.assertEqual(event.attempts, 1)
+        self.assertEqual(event.available_at, now + timedelta(seconds=2))
+        self.assertIn('broker down', event.last_error)
+        self.assertIsNone(event.claim_token)
+
+        self.assertEqual(relay_batch(self.kafka, now=now + timedelta(seconds=1)), (0, 0))
+        self.assertEqual(relay_batch(self.kafka, now=now + timedelta(seconds=2)), (0, 1))
+        event.refresh_from_db()
+        self.assertEqual(event.available_at, now + timedelta(seconds=6))
+
+        self.kafka.producer.fail_with = None
+        self.assertEqual(relay_batch(self.kafka, now=now + timedelta(seconds=6)), (1, 0))
+        event.refresh_from_db()
+        self.assertIsNotNone(event.published_at)
+        self.assertEqual(len(self.kafka.producer.delivered), 1)
+
+    def test_claims_expire(self):
+        """Test a claimed batch is invisible to other relays until its lease ends."""
+        enqueue_event('test.event', 'item:1', {})
+        now = timezone.now()
+
+        self.assertEqual(len(claim_batch(now=now)), 1)
+        self.assertEqual(claim_batch(now=now + timedelta(seconds=59)), [])
+        self.assertEqual(len(claim_batch(now=now + timedelta(seconds=60))), 1)
+
+    def test_relay_command(self):
+        """Test the command drains the outbox and refuses to run without Kafka."""
+        for i in range(3):
+            enqueue_event('test.event', f'item:{i}', {})
+
+        out = StringIO()
+        with mock.patch('kafka_producer.management.commands.relay_outbox.kafka_producer', self.kafka):
+            call_command('relay_outbox', '--once', '--batch-size', '2', stdout=out)
+        self.assertIn('Published 3 outbox event(s)', out.getvalue())
+        self.assertEqual(len(self.kafka.producer.delivered), 3)
+
+        OutboxEvent.objects.update(published_at=timezone.now() - timedelta(hours=2))
+        with mock.patch('kafka_producer.management.commands.relay_outbox.kafka_producer', self.kafka):
+            call_command('relay_outbox', '--once', '--retention-hours', '1', stdout=StringIO())
+        self.assertFalse(OutboxEvent.objects.exists())
+
+        with override_settings(KAFKA_ENABLED=False):
+            with mock.patch(
+                'kafka_producer.management.commands.relay_outbox.kafka_producer',
+                KafkaProducerClient(producer_factory=FakeKafkaProducer)
+            ):
+                with self.assertRaises(CommandError):
+                    call_command('relay_outbox', '--once', stdout=StringIO())
+
+
+@override_settings(KAFKA_ENABLED=True, KAFKA_LINGER_MS=5, KAFKA_BATCH_SIZE=32768, KAFKA_COMPRESSION_TYPE='gzip')
+class KafkaPublishTest(TestCase):
+    """Test case for non-blocking Kafka publishing."""
+
+    def test_publish_queues_and_flush_delivers(self):
+        """Test publishing never waits on the broker and callbacks fire on flush."""
+        client = KafkaProducerClient(producer_factory=FakeKafkaProducer)
+        delivered = []
+
+        for i in range(5000):
+            self.assertTrue(client.publish_data({'row': i}, key=str(i), on_success=delivered.append))
+        producer = client.producer
+        self.assertEqual(producer.config['linger_ms'], 5)
+        self.assertEqual(producer.config['batch_size'], 32768)
+        self.assertEqual(producer.config['compression_type'], 'gzip')
+        self.assertEqual(producer.pending, 5000)
+        self.assertEqual(client.stats()['queue_depth'], 5000)
+        self.assertEqual(delivered, [])
+
+        self.assertTrue(client.flush())
+        self.assertEqual(producer.flush_count, 1)
+        self.assertEqual(len(delivered), 5000)
+        self.assertEqual(delivered[-1].offset, 4999)
+        self.assertEqual(producer.delivered[0], (settings.KAFKA_TOPIC, b'0', b'{"row": 0}'))
+        self.assertEqual(client.metrics, {'sent': 5000, 'delivered': 5000, 'failed': 0})
+        self.assertEqual(client.stats()['queue_depth'], 0)
+
+    def test_delivery_errors_reach_the_error_callback(self):
+        """Test failed deliveries are counted and reported."""
+        client = KafkaProducerClient(
+            producer_factory=lambda **config: FakeKafkaProducer(fail_with=KafkaTimeoutError('broker down'), **config)
+        )
+        errors = []
+        client.publish_data({'row': 1}, on_error=errors.append)
+        client.publish_data({'row': 2}, on_error=errors.append)
+        client.flush()
+
+        self.assertEqual([str(error) for error in errors], ['KafkaTimeoutError: broker down'] * 2)
+        self.assertEqual(client.metrics, {'sent': 2, 'delivered': 0, 'failed': 2})
+        self.assertEqual(client.stats()['error_rate'], 1.0)
+
+    @override_settings(KAFKA_TOPIC_CONFIGS={'genetic_data': {'linger_ms': 200, 'compression_type': None}})
+    def test_topics_share_producers_by_configuration(self):
+        """Test per-topic settings get their own producer and the rest share one."""
+        client = KafkaProducerClient(producer_factory=FakeKafkaProducer)
+        client.publish_data({'row': 1})
+        client.publish_data({'row': 2}, topic='crop_images')
+        client.publish_data({'row': 3}, topic='genetic_data')
+
+        self.assertEqual(client.stats()['producers'], 2)
+        self.assertEqual(client.producer.config['acks'], 'all')
+        self.assertEqual(client.producer.pending, 2)
+        genetic = client._get_producer('genetic_data')
+        self.assertEqual(genetic.config['linger_ms'], 200)
+        self.assertIsNone(genetic.config['compression_type'])
+
+        client.close()
+        self.assertTrue(genetic.closed)
+        self.assertEqual(len(genetic.delivered), 1)
+        self.assertEqual(client.stats()['producers'], 0)
+
+    def test_forked_process_connects_again(self):
+        """Test a child process drops inherited producers and metrics."""
+        client = KafkaProducerClient(producer_factory=FakeKafkaProducer)
+        client.publish_data({'row': 1})
+        inherited = client.producer
+
+        with mock.patch('kafka_producer.kafka_utils.os.getpid', return_value=client._pid + 1):
+            _reset_clients_after_fork()
+            self.assertIsNone(client.producer)
+            self.assertEqual(client.metrics, {'sent': 0, 'delivered': 0, 'failed': 0})
+            client.publish_data({'row': 2})
+            client.flush()
+            # The parent's producer is neither flushed nor closed by the child.
+            self.assertEqual(inherited.pending, 1)
+            self.assertFalse(inherited.closed)
+            self.assertIsNot(client.producer, inherited)
+            self.assertEqual(len(client.producer.delivered), 1)
+
+
+@override_settings(KAFKA_ENABLED=True, KAFKA_TOPIC='excel_data')
+class BatchConsumerTest(TransactionTestCase):
+    """Test case for the batch consumer runner and its command."""
+
+    def setUp(self):
+        """Set up test environment."""
+        handled_batches.clear()
+        release_batches.clear()
+        self.consumer = FakeKafkaConsumer()
+
+    def _runner(self, handler, workers=1, **kwargs):
+        executor = ThreadPoolExecutor(max_workers=workers)
+        self.addCleanup(executor.shutdown)
+        return BatchConsumerRunner(
+            self.consumer, f'kafka_producer.tests.{handler}', executor, poll_timeout_ms=50, **kwargs
+        )
+
+    def test_batches_are_bulk_written_then_committed(self):
+        """Test handlers get lists of records and offsets follow finished batches."""
+        for partition in range(2):
+            for i in range(5):
+                self.consumer.add('excel_data', partition, {'row': i})
+
+        stats = self._runner('store_batch', max_records=4).run(once=True)
+
+        self.assertEqual(stats['records'], 10)
+        self.assertTrue(all(len(batch) <= 4 for batch in handled_batches))
+        self.assertEqual(OutboxEvent.objects.filter(event_type='test.consumed').count(), 10)
+        self.assertEqual(self.consumer.committed, {
+            TopicPartition('excel_data', 0): 5,
+            TopicPartition('excel_data', 1): 5,
+        })
+
+    def test_failed_batch_is_not_committed(self):
+        """Test a batch that keeps failing stops the consumer before its offset."""
+        for i in range(6):
+            self.consumer.add('excel_data', 0, {'row': i, 'poison': i == 3})
+
+        with mock.patch('kafka_producer.consumer.time.sleep') as sleep:
+            with self.assertRaises(BatchFailed):
+                self._runner('reject_poison', max_records=2, retries=1).run(once=True)
+
+        self.assertEqual(self.consumer.committed, {TopicPartition('excel_data', 0): 2})
+        poisoned = [batch for batch in handled_batches if batch[0].offset == 2]
+        self.assertEqual(len(poisoned), 2)
+        sleep.assert_called_once_with(1.0)
+
+    def test_in_flight_batches_are_capped(self):
+        """Test polling pauses while the pool holds max_in_flight batches."""
+        for partition in range(4):
+            self.consumer.add('excel_data', partition, {'row': partition})
+        runner = self._runner('wait_for_release', workers=4, max_in_flight=2)
+        thread = threading.Thread(target=runner.run, kwargs={'once': True})
+        thread.start()
+
+        deadline = time.monotonic() + 5
+        while not self.consumer.paused() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.consumer.paused(), self.consumer.assignment())
+        time.sleep(0.1)
+        self.assertEqual(len(handled_batches), 2)
+
+        release_batches.set()
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(handled_batches), 4)
+        self.assertEqual(set(self.consumer.committed.values()), {1})
+        self.assertEqual(len(self.consumer.committed), 4)
+
+    def test_partition_batches_run_in_order(self):
+        """Test a partition's next batch waits until its previous batch finished."""
+        for i in range(6):
+            self.consumer.add('excel_data', 0, {'row': i})
+
+        self._runner('slow_batch', workers=4, max_records=2).run(once=True)
+
+        self.assertEqual(handled_batches, [
+            ('start', 0, 0), ('end', 0, 0), ('start', 0, 2), ('end', 0, 2), ('start', 0, 4), ('end', 0, 4),
+        ])
+        self.assertEqual(self.consumer.committed, {TopicPartition('excel_data', 0): 6})
+
+    def test_revoked_partitions_are_finished_before_they_go(self):
+        """Test a rebalance commits the revoked partition's batch and drops it."""
+        for partition in range(2):
+            for i in range(3):
+                self.consumer.add('excel_data', partition, {'row': i})
+        revoked = TopicPartition('excel_data', 1)
+        runner = self._runner('slow_batch', workers=2)
+        runner.subscribe(['excel_data'])
+        original_poll = self.consumer.poll
+
+        def poll(**kwargs):
+            records = original_poll(**kwargs)
+            if records:
+                # Rebalance on the poll after the batches were dispatched.
+                self.consumer.revoke(revoked)
+            return records
+
+        with mock.patch.object(self.consumer, 'poll', side_effect=poll):
+            runner.run(once=True)
+
+        self.assertEqual(self.consumer.assignment(), {TopicPartition('excel_data', 0)})
+        self.assertEqual(self.consumer.committed, {
+            TopicPartition('excel_data', 0): 3,
+            revoked: 3,
+        })
+
+    def test_failed_commit_does_not_stop_the_consumer(self):
+        """Test a commit rejected by the group is logged and consumption goes on."""
+        for i in range(4):
+            self.consumer.add('excel_data', 0, {'row': i})
+        self.consumer.commit_error = CommitFailedError('generation is stale')
+
+        stats = self._runner('store_batch', max_records=2).run(once=True)
+
+        self.assertEqual(stats['records'], 4)
+        self.assertEqual(self.consumer.committed, {TopicPartition('excel_data', 0): 4})
+
+    def test_encoded_events_are_decoded_for_the_handler(self):
+        """Test msgpack and json+gzip values are decoded by their content-encoding header."""
+        events = [
+            {'type': 'processed_data.chunk', 'rows': [{'Name': 'John', 'Age': 30}]},
+            {'type': 'processed_data.complete'},
+        ]
+        for encoding in ('msgpack', 'json+gzip'):
+            for event in events:
+                self.consumer.add('excel_data', 0, encode_event(event, encoding),
+                                  headers=[(ENCODING_HEADER, encoding.encode('utf-8'))])
+        self.consumer.add('excel_data', 0, {'row': 0})
+
+        self._runner('store_batch').run(once=True)
+
+        consumed = OutboxEvent.objects.filter(event_type='test.consumed').order_by('id')
+        self.assertEqual(list(consumed.values_list('payload', flat=True)), events + events + [{'row': 0}])
+        self.assertEqual(self.consumer.committed, {TopicPartition('excel_data', 0): 5})
+
+    def test_consumer_command(self):
+        """Test the command consumes with the given handler and needs one."""
+        for i in range(3):
+            self.consumer.add('excel_data', 0, {'row': i})
+
+        out = StringIO()
+        with mock.patch(
+            'kafka_producer.management.commands.run_kafka_consumer.KafkaConsumer', return_value=self.consumer
+        ) as factory:
+            call_command('run_kafka_consumer', '--handler', 'kafka_producer.tests.store_batch', '--workers', '1',
+                         '--once', stdout=out)
+            with override_settings(KAFKA_CONSUMER_HANDLER=''):
+                with self.assertRaises(CommandError):
+                    call_command('run_kafka_consumer', '--once', stdout=StringIO())
+
+        self.assertIn('Processed 3 record(s) in 1 batch(es)', out.getvalue())
+        self.assertFalse(factory.call_args.kwargs['enable_auto_commit'])
+        self.assertTrue(self.consumer.closed)
+        self.assertEqual(self.consumer.committed, {TopicPartition('excel_data', 0): 3})